@@ -1,6 +1,13 @@
+import click
+from click.core import ParameterSource
 from celery import Celery
-from celery.signals import worker_process_init
+from celery.signals import worker_init, worker_process_init
+from kombu import Queue
+from kombu.serialization import register
+from . import codec
 from .config import get_settings
+from .http_clients import init_clients
+from .scratch import start_sweeper
 
 settings = get_settings()
 
@@ -10,10 +17,50 @@ celery_app = Celery(
     backend=settings.REDIS_URL
 )
 
+# Results hold full transcriptions and descriptions; the codec stores them as
+# compressed msgpack, and its decoder still reads results written as JSON
+register(
+    codec.CELERY_SERIALIZER,
+    codec.dumps,
+    codec.loads,
+    content_type=codec.CELERY_CONTENT_TYPE,
+    content_encoding='binary'
+)
+
+VIDEO_TASKS = ('process_video_task', 'prepare_video_task', 'segment_video_task')
+
+QUEUE_CONCURRENCY = {
+    settings.VIDEO_QUEUE_INTERACTIVE: settings.CELERY_INTERACTIVE_CONCURRENCY,
+    settings.VIDEO_QUEUE_BULK: settings.CELERY_BULK_CONCURRENCY,
+    settings.VIDEO_QUEUE_IO: settings.CELERY_IO_CONCURRENCY,
+    settings.WEBHOOK_QUEUE: settings.CELERY_WEBHOOK_CONCURRENCY,
+}
+
+
+def video_queue(priority: str | None = None, content_length: int | None = None) -> str:
+    """Queue for a video job: client priority first, otherwise estimated cost by size"""
+    if priority == 'high':
+        return settings.VIDEO_QUEUE_INTERACTIVE
+    if priority == 'low':
+        return settings.VIDEO_QUEUE_BULK
+    if content_length and int(content_length) > settings.ROUTING_BULK_SIZE:
+        return settings.VIDEO_QUEUE_BULK
+    return settings.VIDEO_QUEUE_INTERACTIVE
+
+
+def route_video_task(name, args, kwargs, options, task=None, **kw):
+    """Celery router: pick the video queue from the routing headers set on submission"""
+    if name not in VIDEO_TASKS:
+        return None
+    headers = options.get('headers') or {}
+    return {'queue': video_queue(headers.get('priority'), headers.get('content_length'))}
+
+
 celery_app.conf.update(
     task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    accept_content=['json', codec.CELERY_SERIALIZER],
+    result_serializer=settings.CELERY_RESULT_SERIALIZER,
+    result_accept_content=['json', codec.CELERY_SERIALIZER],
     timezone='Europe/Kiev',
     enable_utc=True,
     
@@ -32,16 +79,72 @@ celery_app.conf.update(
     
     # Result settings
     task_ignore_result=False,  # We need results
-    result_expires=3600,  # Results expire after 1 hour
+    result_expires=settings.CELERY_RESULT_EXPIRES,  # Results expire after 1 hour
+    
+    # A worker started without -Q serves every queue; dedicated pools pick theirs with -Q
+    task_queues=[Queue(name) for name in QUEUE_CONCURRENCY],
+    task_default_queue=settings.VIDEO_QUEUE_INTERACTIVE,
+    task_routes=[
+        route_video_task,
+        {
+            # Second half of the split pipeline only waits on OpenAI
+            'describe_video_task': {'queue': settings.VIDEO_QUEUE_IO},
+            # Merging segment summaries is one text-only GPT request
+            'reduce_segments_task': {'queue': settings.VIDEO_QUEUE_IO},
+            # Webhooks go to their own queue, served by a lightweight worker
+            'deliver_webhook_task': {'queue': settings.WEBHOOK_QUEUE},
+            'flush_webhooks_task': {'queue': settings.WEBHOOK_QUEUE},
+        },
+    ],
     
     # Broker settings
     broker_connection_retry_on_startup=True,  # Enable connection retry on startup
     broker_connection_max_retries=None,  # Retry forever
 )
 
+
+def queue_depths() -> dict:
+    """Number of messages waiting in every queue"""
+    depths = {}
+    with celery_app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for name in QUEUE_CONCURRENCY:
+            try:
+                depths[name] = channel.queue_declare(queue=name, passive=True).message_count
+            except Exception:
+                # Queue that nobody has declared yet
+                depths[name] = 0
+    return depths
+
+
+def _concurrency_given() -> bool:
+    """Whether the worker being started got an explicit -c/--concurrency"""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        # Worker started from code, its concurrency is whatever the caller passed
+        return True
+    # The worker command fills a missing -c in from worker_concurrency, so only
+    # the parameter source tells an explicit -c 2 apart from the default
+    return ctx.get_parameter_source('concurrency') != ParameterSource.DEFAULT
+
+
+@worker_init.connect
+def configure_worker(sender=None, **kwargs):
+    """Start the scratch sweeper and size the pool for the queues this worker consumes, unless -c was given"""
+    # Runs in the main worker process, which outlives the children whose leftovers it removes
+    start_sweeper()
+    if sender is None or _concurrency_given():
+        return
+    # Set only by -Q/-X; a worker serving every queue keeps CELERY_WORKER_CONCURRENCY
+    queues = sender.app.amqp.queues._consume_from
+    if not queues:
+        return
+    sender.concurrency = sum(QUEUE_CONCURRENCY.get(name, settings.CELERY_WORKER_CONCURRENCY) for name in queues)
+
+
 @worker_process_init.connect
 def init_worker(**kwargs):
     """Initialize worker process"""
-    # Here you can add any initialization code that should run
-    # when a worker process starts
-    pass
+    # Connection pools live for the whole worker process, so OpenAI, webhook
+    # and video requests reuse keep-alive connections across tasks
+    init_clients()
@@ -0,0 +1,117 @@
+import datetime
+import decimal
+import gzip
+import json
+import uuid
+import zlib
+
+from .config import get_settings
+
+settings = get_settings()
+
+try:
+    import msgpack  # Compact binary serializer is optional, JSON is used without it
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard  # Faster and smaller than gzip when installed
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Encoded values start with MAGIC, a format version and one byte each for the
+# serializer and the compression; anything else is a legacy JSON entry
+MAGIC = b"VF"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+SERIALIZERS = {"json": 0, "msgpack": 1}
+COMPRESSIONS = {"none": 0, "gzip": 1, "zstd": 2}
+
+# Celery serializer name and content type registered in celery_app
+CELERY_SERIALIZER = "videoframer"
+CELERY_CONTENT_TYPE = "application/x-videoframer"
+
+
+def _default(value):
+    """Fallback for types neither JSON nor msgpack know (Celery result metadata)"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def serializer() -> str:
+    """Configured serializer, JSON when msgpack is not installed"""
+    if settings.CODEC_SERIALIZER == "msgpack" and MSGPACK_AVAILABLE:
+        return "msgpack"
+    return "json"
+
+
+def compression() -> str:
+    """Configured compression, gzip when zstandard is not installed"""
+    if settings.CODEC_COMPRESSION == "zstd" and not ZSTD_AVAILABLE:
+        return "gzip"
+    return settings.CODEC_COMPRESSION
+
+
+def _serialize(value, name: str) -> bytes:
+    if name == "msgpack":
+        return msgpack.packb(value, default=_default, use_bin_type=True)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _deserialize(data: bytes, name: str):
+    if name == "msgpack":
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return json.loads(data)
+
+
+def _compress(data: bytes, name: str) -> bytes:
+    if name == "zstd":
+        return zstandard.ZstdCompressor(level=settings.CODEC_ZSTD_LEVEL).compress(data)
+    if name == "gzip":
+        return gzip.compress(data, compresslevel=settings.CODEC_GZIP_LEVEL, mtime=0)
+    return data
+
+
+def _decompress(data: bytes, name: str) -> bytes:
+    if name == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if name == "gzip":
+        return gzip.decompress(data)
+    return data
+
+
+def dumps(value, serializer_name: str | None = None, compression_name: str | None = None) -> bytes:
+    """Encode value with a version header; small values are stored uncompressed"""
+    serializer_name = serializer_name or serializer()
+    compression_name = compression_name or compression()
+    data = _serialize(value, serializer_name)
+    if len(data) < settings.CODEC_COMPRESS_MIN_BYTES:
+        compression_name = "none"
+    header = MAGIC + bytes([VERSION, SERIALIZERS[serializer_name], COMPRESSIONS[compression_name]])
+    return header + _compress(data, compression_name)
+
+
+def loads(data: bytes | str):
+    """Decode a value written by dumps, or a legacy JSON / zlib-compressed JSON entry"""
+    if isinstance(data, str):
+        return json.loads(data)
+    if not data.startswith(MAGIC):
+        if data[:1] == b"\x78":
+            # zlib header, written by StageCache before the codec existed
+            return json.loads(zlib.decompress(data))
+        return json.loads(data)
+
+    version, serializer_id, compression_id = data[len(MAGIC):HEADER_SIZE]
+    if version != VERSION:
+        raise ValueError(f"Unsupported codec version {version}")
+    serializer_name = next(name for name, code in SERIALIZERS.items() if code == serializer_id)
+    compression_name = next(name for name, code in COMPRESSIONS.items() if code == compression_id)
+    return _deserialize(_decompress(data[HEADER_SIZE:], compression_name), serializer_name)
@@ -13,26 +13,163 @@ class Settings(BaseSettings):
     MIN_DURATION: float = 5.0
     MIN_WORDS: int = 5
     MAX_IMAGE_SIZE: int = 512
-    JPEG_QUALITY: int = 70
+    JPEG_QUALITY: int = 70  # Encoder quality for frames, JPEG or WebP
+    FRAME_FORMAT: str = "jpeg"  # "jpeg" or "webp" (needs Pillow built with WebP)
     SHORT_VIDEO_THRESHOLD: int = 30
     MEDIUM_VIDEO_THRESHOLD: int = 60
     SHORT_VIDEO_INTERVAL: int = 5
     MEDIUM_VIDEO_INTERVAL: int = 10
     LONG_VIDEO_INTERVAL: int = 20
+    FRAME_SELECTION_MODE: str = "interval"  # "interval" or "scene" (most distinct keyframes)
+    FRAME_HASH_THRESHOLD: int = 10  # Min perceptual hash distance (of 64 bits) between scene frames
+    FRAME_ACCURATE_SEEK: bool = True  # Decode up to the exact timestamp; false snaps to the nearest distinct keyframes
+    # "frames": one image per frame; "contact_sheet": frames tiled into a few grid images with
+    # timestamp overlays, tile count and size chosen to fit an image token budget based on duration
+    FRAME_PACKING: str = "frames"
+    CONTACT_SHEET_FRAME_INTERVAL: float = 2.5  # seconds of video per tile
+    CONTACT_SHEET_MAX_FRAMES: int = 36
+    CONTACT_SHEET_TOKENS_PER_MINUTE: int = 1500  # image tokens (gpt-4o units) per minute of video
+    CONTACT_SHEET_MIN_TOKENS: int = 765
+    CONTACT_SHEET_MAX_TOKENS: int = 3000
+    CONTACT_SHEET_MIN_CELL: int = 128  # px, smallest tile side
+    # Early rejection: probe only the container header (range requests) before downloading
+    EARLY_PROBE_ENABLED: bool = True
+    EARLY_PROBE_HEAD_BYTES: int = 1024 * 1024  # First request, holds the whole header of most files
+    EARLY_PROBE_MAX_BYTES: int = 8 * 1024 * 1024  # Larger headers are not fetched, the video is downloaded
+    REQUIRE_AUDIO: bool = True  # Reject videos without an audio stream
+    SUPPORTED_VIDEO_CODECS: list = ["h264", "hevc", "vp8", "vp9", "av1", "mpeg4", "mjpeg", "prores"]  # Empty: any
+    SUPPORTED_AUDIO_CODECS: list = []  # Empty: any codec ffmpeg can decode
+    # Local voice activity check before Whisper, rejects audio without speech
+    VAD_ENABLED: bool = False
+    VAD_MIN_SPEECH_SECONDS: float = 1.0
+    VAD_THRESHOLD_DB: float = -45.0  # Frames louder than this (dBFS) and 10dB above the noise floor count as speech
+    PARALLEL_STAGES: bool = True  # Extract frames while audio is extracted and transcribed
+    # Audio profile for transcription
+    AUDIO_CODEC: str = "opus"  # "opus" (ogg) or "mp3"
+    AUDIO_BITRATE: str = "24k"
+    AUDIO_SAMPLE_RATE: int = 16000
+    AUDIO_CHANNELS: int = 1
+    AUDIO_MAX_DURATION: float = 0  # seconds, 0 = whole soundtrack
+    AUDIO_TRIM_SILENCE: bool = False
+    AUDIO_CHUNK_DURATION: int = 600  # Longer audio is transcribed in chunks
+    AUDIO_CHUNK_OVERLAP: float = 2.0  # seconds shared by neighbouring chunks
+    AUDIO_MAX_UPLOAD_BYTES: int = 24 * 1024 * 1024  # Whisper rejects files over 25MB
+    TRANSCRIPTION_CONCURRENCY: int = 4  # Parallel Whisper calls for chunked audio
+    # Per-job scratch directories, removed as a whole when the job ends
+    SCRATCH_DIR: str = ""  # Base directory for job files, the system temp dir if empty
+    SCRATCH_RAM_DIR: str = ""  # e.g. "/dev/shm": RAM disk used for small clips, disabled if empty
+    SCRATCH_RAM_MAX_BYTES: int = 20 * 1024 * 1024  # Videos up to this size go to the RAM disk
+    SCRATCH_RAM_MIN_FREE_BYTES: int = 256 * 1024 * 1024  # RAM disk space that must stay free
+    SCRATCH_MIN_FREE_BYTES: int = 512 * 1024 * 1024  # Disk space that must stay free, checked before download
+    SCRATCH_SWEEP_INTERVAL: int = 300  # seconds between sweeps for directories of killed workers
+    SCRATCH_SWEEP_MAX_AGE: int = 1800  # seconds, older job directories are removed even if their owner runs
     # Cache settings
     CACHE_EXPIRE_TIME: int = 3600 * 24  # 24 hours
     CACHE_ENABLED: bool = True
+    URL_INDEX_TTL: int = 3600  # Exact URL -> media fingerprint, lets repeated requests skip the HEAD request
+    STAGE_CACHE_MAX_ENTRY_BYTES: int = 2 * 1024 * 1024  # Larger compressed entries are not cached
+    # Encoding of cached values and Celery results (entries written as plain JSON stay readable)
+    CODEC_SERIALIZER: str = "msgpack"  # "msgpack" or "json"; JSON is used when msgpack is not installed
+    CODEC_COMPRESSION: str = "zstd"  # "zstd", "gzip" or "none"; gzip is used when zstandard is not installed
+    CODEC_ZSTD_LEVEL: int = 3
+    CODEC_GZIP_LEVEL: int = 6
+    CODEC_COMPRESS_MIN_BYTES: int = 256  # Smaller values are stored uncompressed
+    PROBE_CACHE_TTL: int = 3600 * 24 * 7  # 7 days
+    FRAMES_CACHE_TTL: int = 3600 * 24  # 24 hours
+    AUDIO_CACHE_TTL: int = 3600  # 1 hour, only needed to resume a failed transcription
+    TRANSCRIPTION_CACHE_TTL: int = 3600 * 24 * 7  # 7 days
+    DESCRIPTION_CACHE_TTL: int = 3600 * 24  # 24 hours
+    # Duplicate in-flight jobs wait for the first one instead of repeating the work
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_WAIT_TIMEOUT: int = 100  # seconds, keep below CELERY_TASK_SOFT_TIME_LIMIT
+    SINGLE_FLIGHT_RESULT_TTL: int = 300  # seconds the leader's result stays available to followers
     # Celery settings
     CELERY_TASK_TIME_LIMIT: int = 120  # 2 minutes
     CELERY_TASK_SOFT_TIME_LIMIT: int = 110  # 1.8 minutes
     CELERY_MAX_TASKS_PER_CHILD: int = 50  # Restart worker after 50 tasks
     CELERY_WORKER_CONCURRENCY: int = 2  # Number of concurrent tasks
     CELERY_WORKER_PREFETCH_MULTIPLIER: int = 1  # Process one task at a time per worker
+    CELERY_RESULT_EXPIRES: int = 3600  # Results (and batch manifests) expire after 1 hour
+    CELERY_RESULT_SERIALIZER: str = "videoframer"  # Compact codec above, or "json"
+    # Queue routing: short/interactive and long/bulk work are served by separate worker pools
+    VIDEO_QUEUE_INTERACTIVE: str = "video_interactive"
+    VIDEO_QUEUE_BULK: str = "video_bulk"
+    ROUTING_BULK_SIZE: int = 20 * 1024 * 1024  # Larger videos (by content-length) go to the bulk queue
+    ROUTING_HEAD_CHECK: bool = True  # HEAD the URL on submission when the client gives no priority
+    ROUTING_HEAD_TIMEOUT: float = 5.0  # seconds
+    # "single": one task per video; "split": fetch + ffmpeg on the video queues (prefork),
+    # then Whisper + GPT on VIDEO_QUEUE_IO (threads pool), artifacts passed through Redis
+    PIPELINE_MODE: str = "single"
+    VIDEO_QUEUE_IO: str = "video_io"
+    ARTIFACT_TTL: int = 3600  # seconds prepared frames/audio wait for the second task
+    # Segmented mode: long range-readable videos are split into time segments processed
+    # by separate tasks (frames + transcription + a short summary each), then the
+    # summaries are merged into the description, so no task handles the whole video
+    SEGMENTED_ENABLED: bool = False
+    SEGMENT_MIN_DURATION: float = 300.0  # seconds, shorter videos are processed in one task
+    SEGMENT_DURATION: float = 120.0  # seconds of video per segment task
+    SEGMENT_FRAMES: int = 4  # frames per segment
+    SEGMENT_SUMMARY_MAX_TOKENS: int = 512
+    # Worker concurrency per queue, used by workers started with -Q but without -c;
+    # a worker consuming several queues gets the sum
+    CELERY_INTERACTIVE_CONCURRENCY: int = 2
+    CELERY_BULK_CONCURRENCY: int = 1
+    CELERY_IO_CONCURRENCY: int = 50
+    CELERY_WEBHOOK_CONCURRENCY: int = 20
+    # Execution backend of POST /process: "celery" queues jobs for the Celery workers, "async"
+    # runs them on the API process's event loop (asyncio ffmpeg, async HTTP/OpenAI clients),
+    # which skips the broker round trip and worker start-up for short clips. Results, progress
+    # events and webhooks are the same; batches still go through Celery
+    EXECUTION_BACKEND: str = "celery"
+    ASYNC_MAX_CONCURRENCY: int = 4  # Jobs running at once per API process
+    ASYNC_QUEUE_SIZE: int = 100  # Jobs waiting for a slot, POST /process answers 503 beyond that
+    ASYNC_JOB_TIME_LIMIT: int = 120  # seconds, a job running longer fails like a Celery time limit
+    ASYNC_SEGMENT_CONCURRENCY: int = 4  # Segments of one long video processed at once in segmented mode
+    ASYNC_SHUTDOWN_TIMEOUT: float = 30.0  # seconds running jobs get to finish when the API stops
+    # Job progress events for GET /task/{id}/events (SSE), /task/{id}/wait (long poll) and
+    # the /task/{id}/ws WebSocket, published by the workers through Redis pub/sub
+    PROGRESS_ENABLED: bool = True
+    PROGRESS_STREAM_TOKENS: bool = True  # Stream description tokens with the OpenAI streaming API
+    PROGRESS_TOKEN_INTERVAL: float = 0.1  # seconds, tokens are sent in one event per interval
+    PROGRESS_TTL: int = 3600  # seconds the event log of a job is kept for late subscribers
+    PROGRESS_STREAM_IDLE_TIMEOUT: float = 300.0  # seconds without events before a stream is closed
+    PROGRESS_LONG_POLL_TIMEOUT: float = 30.0  # seconds a long poll waits for the next event
+    # Webhook delivery
+    WEBHOOK_ASYNC: bool = True  # Deliver from the webhook queue instead of blocking the video worker
+    WEBHOOK_QUEUE: str = "webhooks"
+    WEBHOOK_MAX_RETRIES: int = 8
+    WEBHOOK_RETRY_BACKOFF: float = 2.0  # seconds, doubled on every retry
+    WEBHOOK_RETRY_BACKOFF_MAX: float = 600.0  # seconds
+    WEBHOOK_DEAD_LETTER_MAX: int = 10000  # Undeliverable payloads kept in Redis
+    WEBHOOK_COALESCE: bool = False  # Send results as {"count", "results": [...]} in one POST
+    WEBHOOK_COALESCE_WINDOW: float = 5.0  # seconds to collect results before a coalesced POST
+    WEBHOOK_COALESCE_MAX: int = 50  # results per coalesced POST
+    WEBHOOK_LOG_MAX_CHARS: int = 500  # Payloads and responses are cut to this length in logs
+    # Batch submission
+    BATCH_MAX_SIZE: int = 1000  # Max videos per POST /process/batch
     # Network settings
     MAX_VIDEO_SIZE: int = 50 * 1024 * 1024  # 50MB in bytes
     ALLOWED_VIDEO_FORMATS: list = ["video/mp4", "video/quicktime", "video/x-msvideo"]
     REQUEST_TIMEOUT: int = 30  # seconds
+    DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024  # Read buffer for video downloads
+    VIDEO_INPUT_MODE: str = "download"  # "download" to a temp file or "stream" (ffmpeg reads the URL via range requests)
     ENABLE_GZIP: bool = True
+    # Connection pool settings (per worker process)
+    HTTP_POOL_MAX_CONNECTIONS: int = 20
+    HTTP_POOL_MAX_KEEPALIVE: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0  # seconds
+    HTTP2_ENABLED: bool = True  # Used when the optional h2 package is installed
+    OPENAI_TIMEOUT: float = 60.0  # seconds
+    # OpenAI call layer: retries with backoff and a rate limit shared by all workers through Redis
+    OPENAI_MAX_RETRIES: int = 5
+    OPENAI_RETRY_BACKOFF: float = 1.0  # seconds, doubled on every retry, Retry-After wins if longer
+    OPENAI_RETRY_BACKOFF_MAX: float = 60.0  # seconds
+    OPENAI_RATE_LIMIT_ENABLED: bool = True
+    OPENAI_CHAT_RPM: int = 500  # Account limits per minute, 0 disables a bucket
+    OPENAI_CHAT_TPM: int = 200000
+    OPENAI_AUDIO_RPM: int = 500
+    OPENAI_RATE_LIMIT_MAX_WAIT: float = 60.0  # seconds to wait for the shared limiter before sending anyway
+    OPENAI_MAX_CONCURRENCY: int = 8  # Concurrent OpenAI requests per worker process
 
 @lru_cache()
 def get_settings():
@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import logging
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from openai import AsyncOpenAI, OpenAI
+
+from .config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  # HTTP/2 support for httpx is optional
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_clients: dict = {}
+_lock = threading.Lock()
+# asyncio clients belong to the loop that opened their connections: {loop: {name: client}}
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class ConnectionStats:
+    """Counts requests and newly opened connections for one pooled client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reuse_ratio': round(reused / self.requests, 3) if self.requests else 0.0,
+            }
+
+
+_httpx_stats: dict[str, ConnectionStats] = {}
+
+
+def _build_httpx_client(name: str, timeout: float) -> httpx.Client:
+    """httpx client with shared pool limits, keep-alive and reuse accounting"""
+    stats = _httpx_stats.setdefault(name, ConnectionStats())
+
+    def trace(event_name: str, info: dict):
+        if event_name in ("connection.connect_tcp.complete", "connection.connect_unix_socket.complete"):
+            stats.record_connection()
+
+    def on_request(request: httpx.Request):
+        stats.record_request()
+        request.extensions["trace"] = trace
+
+    return httpx.Client(
+        timeout=timeout,
+        http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        event_hooks={"request": [on_request]},
+    )
+
+
+def _build_async_httpx_client(name: str, timeout: float) -> httpx.AsyncClient:
+    """_build_httpx_client for the event loop, counted in the same stats"""
+    stats = _httpx_stats.setdefault(name, ConnectionStats())
+
+    async def trace(event_name: str, info: dict):
+        if event_name in ("connection.connect_tcp.complete", "connection.connect_unix_socket.complete"):
+            stats.record_connection()
+
+    async def on_request(request: httpx.Request):
+        stats.record_request()
+        request.extensions["trace"] = trace
+
+    return httpx.AsyncClient(
+        timeout=timeout,
+        http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        event_hooks={"request": [on_request]},
+    )
+
+
+def _build_http_session() -> requests.Session:
+    """requests session for video HEAD/GET with a connection pool per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAX_KEEPALIVE,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def get_http_session() -> requests.Session:
+    """Pooled session for fetching videos"""
+    return _get("video", _build_http_session)
+
+
+def get_webhook_client() -> httpx.Client:
+    """Pooled httpx client for webhook delivery"""
+    return _get("webhook", lambda: _build_httpx_client("webhook", settings.REQUEST_TIMEOUT))
+
+
+def get_openai_client() -> OpenAI:
+    """OpenAI client backed by a pooled httpx client"""
+    return _get("openai", lambda: OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        # Retries are done by services.openai_calls, which also honours the shared rate limit
+        max_retries=0,
+        http_client=_build_httpx_client("openai", settings.OPENAI_TIMEOUT),
+    ))
+
+
+def _get_async(name: str, factory):
+    # Only the loop's own thread gets here, no lock needed
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(name)
+    if client is None:
+        client = clients[name] = factory()
+    return client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pooled httpx client for fetching videos from the running event loop"""
+    return _get_async("video", lambda: _build_async_httpx_client("video_async", settings.REQUEST_TIMEOUT))
+
+
+def get_async_webhook_client() -> httpx.AsyncClient:
+    """Pooled httpx client for webhook delivery from the running event loop"""
+    return _get_async("webhook", lambda: _build_async_httpx_client("webhook_async", settings.REQUEST_TIMEOUT))
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """AsyncOpenAI client of the running event loop, backed by a pooled httpx client"""
+    return _get_async("openai", lambda: AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        max_retries=0,
+        http_client=_build_async_httpx_client("openai_async", settings.OPENAI_TIMEOUT),
+    ))
+
+
+async def close_async_clients():
+    """Close the async clients of the running event loop"""
+    for client in _async_clients.pop(asyncio.get_running_loop(), {}).values():
+        try:
+            await (client.aclose() if isinstance(client, httpx.AsyncClient) else client.close())
+        except Exception:
+            pass
+
+
+def init_clients():
+    """Create fresh clients for the current process.
+
+    Connections must not be shared across fork, so every worker process
+    calls this from worker_process_init.
+    """
+    with _lock:
+        _clients.clear()
+        _httpx_stats.clear()
+    get_http_session()
+    get_webhook_client()
+    get_openai_client()
+    logger.info(f"HTTP clients initialized (http2={settings.HTTP2_ENABLED and HTTP2_AVAILABLE})")
+
+
+def close_clients():
+    """Close all pooled clients"""
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
+
+
+def connection_stats() -> dict:
+    """Request and new-connection counters per pooled client"""
+    stats = {name: s.snapshot() for name, s in _httpx_stats.items()}
+
+    session = _clients.get("video")
+    if session is not None:
+        requests_count = 0
+        connections = 0
+        # The same adapter is mounted for http:// and https://
+        for adapter in {id(a): a for a in session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    requests_count += pool.num_requests
+                    connections += pool.num_connections
+        reused = max(requests_count - connections, 0)
+        stats["video"] = {
+            'requests': requests_count,
+            'new_connections': connections,
+            'reuse_ratio': round(reused / requests_count, 3) if requests_count else 0.0,
+        }
+    return stats
@@ -0,0 +1,105 @@
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Client priority -> queue order, lower first
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+
+class JobQueue:
+    """Admission control for jobs run on the event loop.
+
+    Submitted jobs wait in a bounded priority queue; a dispatcher starts the
+    next one as a task whenever the bounded semaphore has a free slot, so at
+    most `concurrency` jobs run and at most `max_size` wait. Background work
+    handed off by a job (webhook retries) is tracked so shutdown can wait
+    for it too.
+    """
+
+    def __init__(self, handler: Callable[..., Awaitable], concurrency: int, max_size: int):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._slots: Optional[asyncio.BoundedSemaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self._background: set = set()
+        # Keeps submission order within a priority
+        self._order = itertools.count()
+
+    def start(self):
+        """Start dispatching jobs on the running event loop"""
+        self._queue = asyncio.PriorityQueue(self.max_size)
+        self._slots = asyncio.BoundedSemaphore(self.concurrency)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def submit(self, priority: Optional[str], *args) -> bool:
+        """Queue handler(*args), False if the queue is full or not started"""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait((PRIORITIES.get(priority, PRIORITIES['normal']), next(self._order), args))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            _, _, args = await self._queue.get()
+            self._track(self._running, self._run(args))
+
+    async def _run(self, args: tuple):
+        try:
+            await self.handler(*args)
+        except Exception as e:
+            logger.error(f"Async job failed: {str(e)}", exc_info=True)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _track(tasks: set, coro) -> asyncio.Task:
+        # The loop keeps only weak references to tasks
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Run coro in the background, outside the job slots"""
+        return self._track(self._background, coro)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'running': len(self._running),
+            'concurrency': self.concurrency,
+            'max_size': self.max_size,
+        }
+
+    async def stop(self, timeout: float) -> List[tuple]:
+        """Stop starting jobs, give running jobs and background work up to timeout seconds,
+        then cancel them; returns the args of jobs that never started"""
+        if self._dispatcher is None:
+            return []
+        self._dispatcher.cancel()
+        await asyncio.gather(self._dispatcher, return_exceptions=True)
+        self._dispatcher = None
+
+        pending = self._running | self._background
+        if pending:
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        dropped = []
+        while not self._queue.empty():
+            _, _, args = self._queue.get_nowait()
+            dropped.append(args)
+        self._queue = None
+        return dropped
@@ -0,0 +1,310 @@
+import asyncio
+import contextvars
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from .redis_client import DeadLetters, redis_client
+
+# Histogram buckets
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RSS_MB_BUCKETS = (16, 32, 64, 128, 256, 512, 1024)
+
+METRICS_PREFIX = "metrics"
+
+# (JobMetrics, stage) the current thread is running, so helpers deep in the
+# call stack (downloads, subprocesses) can attribute work without a handle
+_current_stage = contextvars.ContextVar('current_stage', default=None)
+
+
+class JobMetrics:
+    """Per-job stage measurements: wall time, bytes, subprocess CPU/RSS, cache hits"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: dict[str, dict] = {}
+
+    def _entry(self, stage: str) -> dict:
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = {
+                'seconds': 0.0,
+                'bytes': 0,
+                'cpu_seconds': 0.0,
+                'max_rss_mb': 0.0,
+            }
+        return entry
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Measure a stage; stages may nest (e.g. audio inside transcription)"""
+        token = _current_stage.set((self, stage))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_stage.reset(token)
+            with self._lock:
+                self._entry(stage)['seconds'] += elapsed
+
+    def add_seconds(self, stage: str, seconds: float):
+        """Record time measured outside a stage block, e.g. queue wait"""
+        with self._lock:
+            self._entry(stage)['seconds'] += seconds
+
+    def add_bytes(self, stage: str, size: int):
+        with self._lock:
+            self._entry(stage)['bytes'] += size
+
+    def add_process(self, stage: str, cpu_seconds: float, max_rss_mb: float):
+        with self._lock:
+            entry = self._entry(stage)
+            entry['cpu_seconds'] += cpu_seconds
+            entry['max_rss_mb'] = max(entry['max_rss_mb'], max_rss_mb)
+
+    def cache_result(self, stage: str, hit: bool):
+        with self._lock:
+            self._entry(stage)['cache'] = 'hit' if hit else 'miss'
+
+    def merge(self, stages: dict):
+        """Add measurements taken by an earlier task of the same job"""
+        with self._lock:
+            for stage, values in stages.items():
+                entry = self._entry(stage)
+                entry['seconds'] += values.get('seconds', 0.0)
+                entry['bytes'] += values.get('bytes', 0)
+                entry['cpu_seconds'] += values.get('cpu_seconds', 0.0)
+                entry['max_rss_mb'] = max(entry['max_rss_mb'], values.get('max_rss_mb', 0.0))
+                if 'cache' in values:
+                    entry['cache'] = values['cache']
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                stage: {k: round(v, 4) if isinstance(v, float) else v for k, v in entry.items()}
+                for stage, entry in self.stages.items()
+            }
+
+    def summary(self) -> str:
+        """One-line summary for logs"""
+        return " ".join(f"{stage}={entry['seconds']:.2f}s" for stage, entry in self.as_dict().items())
+
+
+def add_bytes(size: int):
+    """Attribute transferred bytes to the stage running in this thread"""
+    current = _current_stage.get()
+    if current:
+        metrics, stage = current
+        metrics.add_bytes(stage, size)
+
+
+class TrackedPopen(subprocess.Popen):
+    """Popen that reports the child's CPU time and peak RSS to the current stage.
+
+    wait() reaps the child itself with os.wait4, which returns the resource
+    usage of that one child; RUSAGE_CHILDREN would mix in ffmpeg processes of
+    stages running in other threads. A child reaped by poll() is not recorded.
+    """
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            endtime = None if timeout is None else time.monotonic() + timeout
+            delay = 0.0005
+            while True:
+                try:
+                    pid, sts, rusage = os.wait4(self.pid, 0 if endtime is None else os.WNOHANG)
+                except ChildProcessError:
+                    # Reaped elsewhere, Popen.wait settles the return code
+                    break
+                if pid == self.pid:
+                    self.returncode = os.waitstatus_to_exitcode(sts)
+                    self._record_usage(rusage)
+                    break
+                remaining = endtime - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+                delay = min(delay * 2, remaining, 0.05)
+                time.sleep(delay)
+        return super().wait(timeout)
+
+    def _record_usage(self, rusage):
+        current = _current_stage.get()
+        if current:
+            metrics, stage = current
+            # ru_maxrss is in kilobytes on Linux
+            metrics.add_process(stage, rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss / 1024)
+
+
+def run_process(cmd, capture_output: bool = False, text: bool = False, check: bool = False,
+                timeout: float | None = None) -> subprocess.CompletedProcess:
+    """subprocess.run equivalent that records resource usage of the child"""
+    pipe = subprocess.PIPE if capture_output else None
+    with TrackedPopen(cmd, stdout=pipe, stderr=pipe, text=text) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except BaseException:
+            process.kill()
+            raise
+        retcode = process.poll()
+    if check and retcode:
+        raise subprocess.CalledProcessError(retcode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, retcode, stdout, stderr)
+
+
+async def run_process_async(cmd, check: bool = False, timeout: float | None = None) -> subprocess.CompletedProcess:
+    """run_process for the event loop, output is bytes.
+
+    The loop's child watcher reaps the child, so its CPU time and RSS are not
+    recorded; the stage still gets the wall time.
+    """
+    process = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def _bucket_fields(name: str, stage: str, value: float, buckets: tuple) -> list[str]:
+    fields = [f"{name}:{stage}:bucket:{le}" for le in buckets if value <= le]
+    return fields + [f"{name}:{stage}:bucket:+Inf", f"{name}:{stage}:count"]
+
+
+def record_job(metrics: JobMetrics, status: str) -> bool:
+    """Aggregate one job's measurements into Redis histograms and counters shared by all processes"""
+    key = f"{METRICS_PREFIX}:stages"
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(key, f"jobs:{status}", 1)
+        for stage, entry in metrics.as_dict().items():
+            for field in _bucket_fields('seconds', stage, entry['seconds'], SECONDS_BUCKETS):
+                pipe.hincrby(key, field, 1)
+            pipe.hincrbyfloat(key, f"seconds:{stage}:sum", entry['seconds'])
+            pipe.hincrby(key, f"bytes:{stage}", entry['bytes'])
+            pipe.hincrbyfloat(key, f"cpu:{stage}", entry['cpu_seconds'])
+            if entry['max_rss_mb']:
+                for field in _bucket_fields('rss', stage, entry['max_rss_mb'], RSS_MB_BUCKETS):
+                    pipe.hincrby(key, field, 1)
+                pipe.hincrbyfloat(key, f"rss:{stage}:sum", entry['max_rss_mb'])
+            if 'cache' in entry:
+                pipe.hincrby(key, f"cache:{stage}:{entry['cache']}", 1)
+        pipe.execute()
+        return True
+    except Exception:
+        return False
+
+
+def count_event(kind: str, result: str) -> bool:
+    """Increment an event counter, e.g. webhook deliveries by result"""
+    try:
+        redis_client.hincrby(f"{METRICS_PREFIX}:stages", f"event:{kind}:{result}", 1)
+        return True
+    except Exception:
+        return False
+
+
+def _histogram(lines: list, metric: str, data: dict, name: str, buckets: tuple, scale: float = 1.0):
+    stages = sorted({field.split(':')[1] for field in data if field.startswith(f"{name}:") and field.endswith(':count')})
+    for stage in stages:
+        for le in buckets:
+            count = data.get(f"{name}:{stage}:bucket:{le}", 0)
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="{le * scale:g}"}} {count}')
+        lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {data.get(f"{name}:{stage}:bucket:+Inf", 0)}')
+        lines.append(f'{metric}_sum{{stage="{stage}"}} {float(data.get(f"{name}:{stage}:sum", 0)) * scale}')
+        lines.append(f'{metric}_count{{stage="{stage}"}} {data.get(f"{name}:{stage}:count", 0)}')
+
+
+def queue_waits() -> dict:
+    """Average queue wait per queue from the queue_<name> stage histograms"""
+    try:
+        data = redis_client.hgetall(f"{METRICS_PREFIX}:stages")
+    except Exception:
+        return {}
+    waits = {}
+    for field, count in data.items():
+        if field.startswith("seconds:queue_") and field.endswith(":count") and int(count):
+            stage = field.split(':')[1]
+            total = float(data.get(f"seconds:{stage}:sum", 0))
+            waits[stage[len("queue_"):]] = {"jobs": int(count), "avg_wait_seconds": round(total / int(count), 3)}
+    return waits
+
+
+def render_prometheus(queue_depths: dict | None = None) -> str:
+    """Render aggregated metrics in Prometheus text exposition format"""
+    try:
+        data = redis_client.hgetall(f"{METRICS_PREFIX}:stages")
+    except Exception:
+        data = {}
+
+    lines = [
+        "# HELP videoframer_jobs_total Processed jobs by result status",
+        "# TYPE videoframer_jobs_total counter",
+    ]
+    for field, value in sorted(data.items()):
+        if field.startswith("jobs:"):
+            lines.append(f'videoframer_jobs_total{{status="{field[5:]}"}} {value}')
+
+    lines += [
+        "# HELP videoframer_stage_duration_seconds Wall time per pipeline stage",
+        "# TYPE videoframer_stage_duration_seconds histogram",
+    ]
+    _histogram(lines, "videoframer_stage_duration_seconds", data, "seconds", SECONDS_BUCKETS)
+
+    lines += [
+        "# HELP videoframer_stage_subprocess_max_rss_bytes Peak RSS of ffmpeg/ffprobe per stage",
+        "# TYPE videoframer_stage_subprocess_max_rss_bytes histogram",
+    ]
+    _histogram(lines, "videoframer_stage_subprocess_max_rss_bytes", data, "rss", RSS_MB_BUCKETS, 1024 * 1024)
+
+    lines += [
+        "# HELP videoframer_stage_bytes_total Bytes transferred per stage",
+        "# TYPE videoframer_stage_bytes_total counter",
+    ]
+    lines += [f'videoframer_stage_bytes_total{{stage="{f[6:]}"}} {v}' for f, v in sorted(data.items()) if f.startswith("bytes:")]
+
+    lines += [
+        "# HELP videoframer_stage_subprocess_cpu_seconds_total CPU time of ffmpeg/ffprobe per stage",
+        "# TYPE videoframer_stage_subprocess_cpu_seconds_total counter",
+    ]
+    lines += [f'videoframer_stage_subprocess_cpu_seconds_total{{stage="{f[4:]}"}} {v}' for f, v in sorted(data.items()) if f.startswith("cpu:")]
+
+    lines += [
+        "# HELP videoframer_stage_cache_total Stage cache lookups by result",
+        "# TYPE videoframer_stage_cache_total counter",
+    ]
+    for field, value in sorted(data.items()):
+        if field.startswith("cache:"):
+            _, stage, result = field.split(':')
+            lines.append(f'videoframer_stage_cache_total{{stage="{stage}",result="{result}"}} {value}')
+
+    lines += [
+        "# HELP videoframer_events_total Webhook deliveries and other events by result",
+        "# TYPE videoframer_events_total counter",
+    ]
+    for field, value in sorted(data.items()):
+        if field.startswith("event:"):
+            _, kind, result = field.split(':')
+            lines.append(f'videoframer_events_total{{kind="{kind}",result="{result}"}} {value}')
+
+    if queue_depths is not None:
+        lines += [
+            "# HELP videoframer_queue_depth Messages waiting per Celery queue",
+            "# TYPE videoframer_queue_depth gauge",
+        ]
+        lines += [f'videoframer_queue_depth{{queue="{name}"}} {depth}' for name, depth in sorted(queue_depths.items())]
+
+    lines += [
+        "# HELP videoframer_webhook_dead_letters Undelivered webhook payloads in the dead-letter store",
+        "# TYPE videoframer_webhook_dead_letters gauge",
+        f"videoframer_webhook_dead_letters {DeadLetters.count()}",
+    ]
+
+    return "\n".join(lines) + "\n"
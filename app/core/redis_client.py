@@ -1,5 +1,14 @@
+import asyncio
 import redis
+import redis.asyncio as redis_asyncio
 import json
+import hashlib
+import os
+import time
+import uuid
+import weakref
+from urllib.parse import urlsplit
+from . import codec
 from .config import get_settings
 
 settings = get_settings()
@@ -10,13 +19,18 @@ redis_client = redis.Redis.from_url(
     decode_responses=True  # Automatically decode responses to strings
 )
 
+# Separate client for compressed binary blobs
+binary_redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
 class Cache:
+    """Values are encoded with the codec (msgpack + zstd by default), older JSON entries are still read"""
+
     @staticmethod
     def get(key: str) -> dict | None:
         """Get value from cache"""
         try:
-            data = redis_client.get(key)
-            return json.loads(data) if data else None
+            data = binary_redis_client.get(key)
+            return codec.loads(data) if data else None
         except Exception:
             return None
 
@@ -24,10 +38,10 @@ class Cache:
     def set(key: str, value: dict, expire: int = 3600 * 24) -> bool:
         """Set value in cache with expiration"""
         try:
-            return redis_client.setex(
+            return binary_redis_client.setex(
                 key,
                 expire,
-                json.dumps(value)
+                codec.dumps(value)
             )
         except Exception:
             return False
@@ -39,3 +53,523 @@ class Cache:
             return redis_client.delete(key) > 0
         except Exception:
             return False
+
+
+class MediaCache:
+    """Content-addressed cache.
+
+    Two layers are kept:
+    - URL index: HTTP validators (ETag/Last-Modified + Content-Length + file name)
+      -> media fingerprint, so signed/mirrored URLs of the same file resolve
+      without downloading it again
+    - fingerprint (sha256 of the downloaded bytes) -> per-stage artifacts,
+      see StageCache
+
+    The exact URL is also mapped to its fingerprint for a short time, so a
+    repeated request is answered from cache before any HEAD request is sent.
+    """
+    INDEX_PREFIX = "video_index"
+    URL_PREFIX = "video_url"
+
+    @staticmethod
+    def index_key(url: str, headers) -> str | None:
+        """Build URL index key from response headers, None if the server sent no validators"""
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        content_length = headers.get('content-length')
+        if not content_length or not (etag or last_modified):
+            return None
+
+        # Query string and host are ignored on purpose: signed CDN URLs and mirrors
+        # of the same file differ only there
+        file_name = os.path.basename(urlsplit(url).path)
+        identity = f"{file_name}:{content_length}:{etag or ''}:{last_modified or ''}"
+        return f"{MediaCache.INDEX_PREFIX}:{hashlib.sha256(identity.encode()).hexdigest()}"
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        """Index key for the exact URL"""
+        return f"{MediaCache.URL_PREFIX}:{hashlib.sha256(url.encode()).hexdigest()}"
+
+    @staticmethod
+    def get_fingerprint(index_key: str) -> str | None:
+        data = Cache.get(index_key)
+        return data.get('fingerprint') if data else None
+
+    @staticmethod
+    def set_fingerprint(index_key: str, fingerprint: str, expire: int = 3600 * 24) -> bool:
+        return Cache.set(index_key, {'fingerprint': fingerprint}, expire)
+
+
+class StageCache:
+    """Per-stage artifact cache keyed by media fingerprint.
+
+    Every pipeline stage (probe, frames, audio, transcription, description) is
+    stored under its own key and TTL, so a retry resumes from the last stage
+    that succeeded. Values are encoded with the codec and entries over
+    STAGE_CACHE_MAX_ENTRY_BYTES are not stored.
+    """
+    PREFIX = "video_stage"
+
+    @staticmethod
+    def ttl(stage: str) -> int:
+        return {
+            'probe': settings.PROBE_CACHE_TTL,
+            'frames': settings.FRAMES_CACHE_TTL,
+            'audio': settings.AUDIO_CACHE_TTL,
+            'transcription': settings.TRANSCRIPTION_CACHE_TTL,
+            'description': settings.DESCRIPTION_CACHE_TTL,
+            # Segment summaries carry the segment's transcription
+            'segment': settings.TRANSCRIPTION_CACHE_TTL,
+        }.get(stage, settings.CACHE_EXPIRE_TIME)
+
+    @staticmethod
+    def key(stage: str, fingerprint: str, variant: str | None = None) -> str:
+        key = f"{StageCache.PREFIX}:{stage}:{fingerprint}"
+        return f"{key}:{variant}" if variant else key
+
+    @staticmethod
+    def get(stage: str, fingerprint: str, variant: str | None = None):
+        """Get value of a stage, None on miss"""
+        data = StageCache.get_bytes(stage, fingerprint, variant)
+        try:
+            return codec.loads(data) if data else None
+        except Exception:
+            return None
+
+    @staticmethod
+    def set(stage: str, fingerprint: str, value, variant: str | None = None) -> bool:
+        """Store value of a stage"""
+        try:
+            blob = codec.dumps(value)
+        except Exception:
+            return False
+        return StageCache.set_bytes(stage, fingerprint, blob, variant)
+
+    @staticmethod
+    def get_bytes(stage: str, fingerprint: str, variant: str | None = None) -> bytes | None:
+        """Get raw stage blob"""
+        try:
+            return binary_redis_client.get(StageCache.key(stage, fingerprint, variant))
+        except Exception:
+            return None
+
+    @staticmethod
+    def set_bytes(stage: str, fingerprint: str, blob: bytes, variant: str | None = None) -> bool:
+        """Store raw stage blob unless it exceeds the per-entry size limit"""
+        if len(blob) > settings.STAGE_CACHE_MAX_ENTRY_BYTES:
+            return False
+        try:
+            return binary_redis_client.setex(
+                StageCache.key(stage, fingerprint, variant),
+                StageCache.ttl(stage),
+                blob
+            )
+        except Exception:
+            return False
+
+
+class SingleFlight:
+    """Redis-backed single-flight lock for duplicate in-flight jobs.
+
+    The first job for a key becomes the leader and does the work; followers
+    wait for the leader's result on a pub/sub channel (with a result key as
+    fallback for late subscribers) instead of repeating it.
+    """
+    PREFIX = "video_inflight"
+
+    _release_script = redis_client.register_script("""
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            redis.call('del', KEYS[1])
+        end
+        if ARGV[2] ~= '' then
+            redis.call('setex', KEYS[2], ARGV[3], ARGV[2])
+        end
+        redis.call('publish', KEYS[3], ARGV[2])
+        return 1
+    """)
+
+    _extend_script = redis_client.register_script("""
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('expire', KEYS[1], ARGV[2])
+        end
+        return 0
+    """)
+
+    @staticmethod
+    def _keys(key: str) -> tuple[str, str, str]:
+        base = f"{SingleFlight.PREFIX}:{key}"
+        return f"{base}:lock", f"{base}:result", f"{base}:done"
+
+    @staticmethod
+    def acquire(key: str, ttl: int) -> str | None:
+        """Try to become the leader for key, returns lock token or None"""
+        lock_key, _, _ = SingleFlight._keys(key)
+        token = uuid.uuid4().hex
+        try:
+            return token if redis_client.set(lock_key, token, nx=True, ex=ttl) else None
+        except Exception:
+            # Without Redis every job simply runs on its own
+            return token
+
+    @staticmethod
+    def extend(key: str, token: str, ttl: int) -> bool:
+        """Keep holding the lock for ttl more seconds, False if it is no longer ours"""
+        lock_key, _, _ = SingleFlight._keys(key)
+        try:
+            return bool(SingleFlight._extend_script(keys=[lock_key], args=[token, ttl]))
+        except Exception:
+            return False
+
+    @staticmethod
+    def release(key: str, token: str, result: dict | None, expire: int = 300) -> bool:
+        """Release the lock and hand the result (None if the leader failed) to followers"""
+        try:
+            SingleFlight._release_script(
+                keys=list(SingleFlight._keys(key)),
+                args=[token, json.dumps(result) if result is not None else '', expire]
+            )
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def wait(key: str, timeout: float) -> dict | None:
+        """Wait for the leader's result, None if the leader failed or timeout elapsed"""
+        lock_key, result_key, channel = SingleFlight._keys(key)
+        deadline = time.monotonic() + timeout
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(channel)
+            while True:
+                # Check after subscribing so a result published in between is not missed
+                data = redis_client.get(result_key)
+                if data:
+                    return json.loads(data)
+                if not redis_client.exists(lock_key):
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                message = pubsub.get_message(timeout=min(remaining, 1.0))
+                if message:
+                    return json.loads(message['data']) if message['data'] else None
+        except Exception:
+            return None
+        finally:
+            pubsub.close()
+
+
+class BatchStore:
+    """Batch manifests: which task handles each submitted video, plus its metadata"""
+    PREFIX = "video_batch"
+
+    @staticmethod
+    def key(batch_id: str) -> str:
+        return f"{BatchStore.PREFIX}:{batch_id}"
+
+    @staticmethod
+    def save(batch_id: str, manifest: dict, expire: int = 3600) -> bool:
+        """Store batch manifest"""
+        return Cache.set(BatchStore.key(batch_id), manifest, expire)
+
+    @staticmethod
+    def get(batch_id: str) -> dict | None:
+        """Get batch manifest, None if unknown or expired"""
+        return Cache.get(BatchStore.key(batch_id))
+
+    @staticmethod
+    def claim_finish(batch_id: str, expire: int = 3600) -> bool:
+        """True for the first caller only, so the webhooks of a batch go out once"""
+        try:
+            return bool(redis_client.set(f"{BatchStore.key(batch_id)}:finished", 1, nx=True, ex=expire))
+        except Exception:
+            # Delivering twice beats not delivering at all
+            return True
+
+
+class WebhookOutbox:
+    """Pending webhook payloads waiting to be coalesced into one POST"""
+    KEY = "webhook_outbox"
+
+    @staticmethod
+    def push(payload: dict) -> int:
+        """Queue payload and return the outbox length, 0 if Redis failed"""
+        try:
+            return redis_client.rpush(WebhookOutbox.KEY, json.dumps(payload))
+        except Exception:
+            return 0
+
+    @staticmethod
+    def count() -> int:
+        try:
+            return redis_client.llen(WebhookOutbox.KEY)
+        except Exception:
+            return 0
+
+    @staticmethod
+    def pop(count: int) -> list[dict]:
+        """Take up to count oldest payloads"""
+        try:
+            pipe = redis_client.pipeline()
+            pipe.lrange(WebhookOutbox.KEY, 0, count - 1)
+            pipe.ltrim(WebhookOutbox.KEY, count, -1)
+            items, _ = pipe.execute()
+            return [json.loads(item) for item in items]
+        except Exception:
+            return []
+
+
+class DeadLetters:
+    """Webhook payloads that could not be delivered after all retries"""
+    KEY = "webhook_dead_letters"
+
+    @staticmethod
+    def push(payload, error: str, max_items: int = 10000) -> bool:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.lpush(DeadLetters.KEY, json.dumps({'payload': payload, 'error': error, 'failed_at': time.time()}))
+            pipe.ltrim(DeadLetters.KEY, 0, max_items - 1)
+            pipe.execute()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def peek(start: int = 0, count: int = 100) -> list[dict]:
+        try:
+            return [json.loads(item) for item in redis_client.lrange(DeadLetters.KEY, start, start + count - 1)]
+        except Exception:
+            return []
+
+    @staticmethod
+    def count() -> int:
+        try:
+            return redis_client.llen(DeadLetters.KEY)
+        except Exception:
+            return 0
+
+    @staticmethod
+    def pop_all() -> list[dict]:
+        """Remove and return every dead letter"""
+        try:
+            pipe = redis_client.pipeline()
+            pipe.lrange(DeadLetters.KEY, 0, -1)
+            pipe.delete(DeadLetters.KEY)
+            items, _ = pipe.execute()
+            return [json.loads(item) for item in items]
+        except Exception:
+            return []
+
+
+class ArtifactStore:
+    """Intermediate artifacts handed from one pipeline task to the next (frames, audio).
+
+    Unlike StageCache entries they are never skipped for size and live only
+    until the next task picks them up.
+    """
+    PREFIX = "video_artifact"
+
+    @staticmethod
+    def key(job_id: str, name: str) -> str:
+        return f"{ArtifactStore.PREFIX}:{job_id}:{name}"
+
+    @staticmethod
+    def set(job_id: str, name: str, blob: bytes, expire: int = 3600) -> bool:
+        try:
+            return bool(binary_redis_client.setex(ArtifactStore.key(job_id, name), expire, blob))
+        except Exception:
+            return False
+
+    @staticmethod
+    def get(job_id: str, name: str) -> bytes | None:
+        try:
+            return binary_redis_client.get(ArtifactStore.key(job_id, name))
+        except Exception:
+            return None
+
+    @staticmethod
+    def delete(job_id: str) -> bool:
+        try:
+            return binary_redis_client.delete(ArtifactStore.key(job_id, 'frames'),
+                                              ArtifactStore.key(job_id, 'audio')) > 0
+        except Exception:
+            return False
+
+
+class RateLimiter:
+    """Token buckets shared by all workers (e.g. OpenAI requests/min and tokens/min).
+
+    A request takes its cost from every bucket it names or from none of them,
+    atomically. A pause set after a 429 holds everyone back until it expires.
+    """
+    PREFIX = "ratelimit"
+
+    # KEYS: pause key, then one key per bucket; ARGV: now, then capacity, refill per second
+    # and cost for every bucket. Returns "0" when taken, otherwise seconds to wait.
+    _acquire_script = redis_client.register_script("""
+        local pause = redis.call('pttl', KEYS[1])
+        if pause > 0 then
+            return tostring(pause / 1000)
+        end
+        local now = tonumber(ARGV[1])
+        local wait = 0
+        local levels = {}
+        for i = 2, #KEYS do
+            local capacity = tonumber(ARGV[i * 3 - 4])
+            local rate = tonumber(ARGV[i * 3 - 3])
+            local cost = math.min(tonumber(ARGV[i * 3 - 2]), capacity)
+            local state = redis.call('hmget', KEYS[i], 'level', 'ts')
+            local level = tonumber(state[1]) or capacity
+            local ts = tonumber(state[2]) or now
+            level = math.min(capacity, level + math.max(0, now - ts) * rate)
+            levels[i] = level
+            if level < cost then
+                wait = math.max(wait, (cost - level) / rate)
+            end
+        end
+        if wait > 0 then
+            return tostring(wait)
+        end
+        for i = 2, #KEYS do
+            local capacity = tonumber(ARGV[i * 3 - 4])
+            local cost = math.min(tonumber(ARGV[i * 3 - 2]), capacity)
+            redis.call('hset', KEYS[i], 'level', tostring(levels[i] - cost), 'ts', ARGV[1])
+            redis.call('expire', KEYS[i], 3600)
+        end
+        return '0'
+    """)
+
+    @staticmethod
+    def acquire(name: str, buckets: dict) -> float:
+        """Take cost from every bucket {bucket: (per_minute, cost)}; 0 on success, else seconds to wait"""
+        keys = [f"{RateLimiter.PREFIX}:{name}:pause"]
+        args = [repr(time.time())]
+        for bucket, (per_minute, cost) in buckets.items():
+            if per_minute <= 0:
+                continue
+            keys.append(f"{RateLimiter.PREFIX}:{name}:{bucket}")
+            args += [per_minute, per_minute / 60, cost]
+        try:
+            return float(RateLimiter._acquire_script(keys=keys, args=args))
+        except Exception:
+            # Without Redis every worker just goes ahead
+            return 0.0
+
+    @staticmethod
+    def pause(name: str, seconds: float) -> bool:
+        """Hold back every worker for `seconds`, never shortening a longer pause already set"""
+        key = f"{RateLimiter.PREFIX}:{name}:pause"
+        try:
+            if redis_client.pttl(key) >= seconds * 1000:
+                return False
+            return bool(redis_client.set(key, '1', px=max(int(seconds * 1000), 1)))
+        except Exception:
+            return False
+
+
+class JobEvents:
+    """Progress events of a job: stages, streamed description tokens and the final result.
+
+    Every event is appended to a per-job log and published on the job's
+    channel as "<seq> <json>", seq being the event's position in the log.
+    Subscribers read the log from their cursor first, so events published
+    before they connected (or between two long polls) are not lost.
+    """
+    PREFIX = "job_events"
+
+    PUBLISH_SCRIPT = """
+        local seq = redis.call('rpush', KEYS[1], ARGV[1])
+        redis.call('expire', KEYS[1], ARGV[2])
+        redis.call('publish', KEYS[2], seq .. ' ' .. ARGV[1])
+        return seq
+    """
+    _publish_script = redis_client.register_script(PUBLISH_SCRIPT)
+
+    @staticmethod
+    def _keys(job_id: str) -> tuple[str, str]:
+        base = f"{JobEvents.PREFIX}:{job_id}"
+        return f"{base}:log", f"{base}:channel"
+
+    @staticmethod
+    def publish(job_id: str | None, event: dict) -> int:
+        """Append event to the job's log and notify subscribers, returns its seq (0 if not published)"""
+        if not job_id or not settings.PROGRESS_ENABLED:
+            return 0
+        try:
+            return int(JobEvents._publish_script(
+                keys=list(JobEvents._keys(job_id)),
+                args=[json.dumps(event), settings.PROGRESS_TTL]
+            ))
+        except Exception:
+            return 0
+
+    @staticmethod
+    async def publish_async(job_id: str | None, event: dict) -> int:
+        """publish from the event loop, on its asyncio Redis client"""
+        if not job_id or not settings.PROGRESS_ENABLED:
+            return 0
+        try:
+            script = async_redis_client().register_script(JobEvents.PUBLISH_SCRIPT)
+            return int(await script(keys=list(JobEvents._keys(job_id)), args=[json.dumps(event), settings.PROGRESS_TTL]))
+        except Exception:
+            return 0
+
+    @staticmethod
+    async def read(job_id: str, after: int = 0) -> list:
+        """Events of the job's log after seq `after`"""
+        log_key, _ = JobEvents._keys(job_id)
+        return [json.loads(data) for data in await async_redis_client().lrange(log_key, after, -1)]
+
+    @staticmethod
+    async def listen(job_id: str, after: int = 0, timeout: float = 60.0):
+        """Yield (seq, event) of the events after seq `after`, live ones included, until the
+        job's "done" event or until no event arrived for `timeout` seconds"""
+        log_key, channel = JobEvents._keys(job_id)
+        client = async_redis_client()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel)
+            while True:
+                # Read the log after subscribing, so an event published in between is not missed
+                for data in await client.lrange(log_key, after, -1):
+                    after += 1
+                    event = json.loads(data)
+                    yield after, event
+                    if event.get('event') == 'done':
+                        return
+
+                deadline = time.monotonic() + timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    message = await pubsub.get_message(timeout=min(remaining, 1.0))
+                    if message:
+                        break
+                seq, data = message['data'].split(' ', 1)
+                if int(seq) != after + 1:
+                    # Missed or already seen, the log has everything in order
+                    continue
+                after += 1
+                event = json.loads(data)
+                yield after, event
+                if event.get('event') == 'done':
+                    return
+        finally:
+            await pubsub.aclose()
+
+
+# asyncio connections belong to the loop that opened them, so there is one client per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def async_redis_client():
+    """asyncio Redis client for the running event loop, created on first use"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = redis_asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        _async_clients[loop] = client
+    return client
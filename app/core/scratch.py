@@ -0,0 +1,160 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from .config import get_settings
+
+settings = get_settings()
+
+# Every job directory lives under <base>/<SCRATCH_SUBDIR>/job-<pid>-<id>, so the
+# sweeper only ever touches directories this service created
+SCRATCH_SUBDIR = "videoframer"
+JOB_PREFIX = "job-"
+
+
+class ScratchSpaceError(Exception):
+    """Not enough free space for a job's temporary files"""
+
+
+def scratch_roots() -> List[str]:
+    """Directories holding job scratch dirs: the disk base and the RAM disk if enabled"""
+    bases = [settings.SCRATCH_DIR or None]
+    if settings.SCRATCH_RAM_DIR:
+        bases.append(settings.SCRATCH_RAM_DIR)
+    return [os.path.join(base or tempfile.gettempdir(), SCRATCH_SUBDIR) for base in bases]
+
+
+def free_bytes(path: str) -> int:
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+
+class ScratchSpace:
+    """Temporary directory of one job, created on first use and removed with everything in it.
+
+    Small jobs go to the RAM disk (SCRATCH_RAM_DIR, e.g. /dev/shm) when it has
+    room, everything else to SCRATCH_DIR. Use as a context manager or call
+    cleanup() when the job is done.
+    """
+
+    def __init__(self):
+        self._path: Optional[str] = None
+        self._min_free = settings.SCRATCH_MIN_FREE_BYTES
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        """Job directory, created on disk if reserve() was not called first"""
+        return self._path or self.reserve(0)
+
+    def _choose_root(self, expected_bytes: int) -> str:
+        disk_root, *ram_roots = scratch_roots()
+        if ram_roots and 0 < expected_bytes <= settings.SCRATCH_RAM_MAX_BYTES:
+            ram_root = ram_roots[0]
+            # Video plus extracted audio and chunks fit in about twice the video size
+            if free_bytes(os.path.dirname(ram_root)) - 2 * expected_bytes >= settings.SCRATCH_RAM_MIN_FREE_BYTES:
+                return ram_root
+        return disk_root
+
+    def reserve(self, expected_bytes: int) -> str:
+        """Create the job directory where expected_bytes fit, raises ScratchSpaceError if nowhere does"""
+        with self._lock:
+            if self._path is None:
+                root = self._choose_root(expected_bytes)
+                if root != scratch_roots()[0]:
+                    self._min_free = settings.SCRATCH_RAM_MIN_FREE_BYTES
+                os.makedirs(root, exist_ok=True)
+                self._path = os.path.join(root, f"{JOB_PREFIX}{os.getpid()}-{uuid.uuid4().hex}")
+                os.mkdir(self._path)
+            root = os.path.dirname(self._path)
+
+        needed = 2 * expected_bytes + self._min_free
+        available = free_bytes(root)
+        if expected_bytes and available < needed:
+            raise ScratchSpaceError(
+                f"Not enough scratch space in {root}: {available / 1024 / 1024:.0f}MB free, "
+                f"{needed / 1024 / 1024:.0f}MB needed"
+            )
+        return self._path
+
+    def cleanup(self):
+        """Remove the job directory and everything left in it"""
+        with self._lock:
+            path, self._path = self._path, None
+        if path:
+            shutil.rmtree(path, onerror=lambda _, failed, e: logging.warning(
+                f"Error removing scratch file {failed}: {e[1]}"
+            ))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+        return False
+
+
+def _owner_alive(name: str) -> bool:
+    """Whether the worker process that created a job directory still runs"""
+    try:
+        pid = int(name[len(JOB_PREFIX):].split("-", 1)[0])
+        os.kill(pid, 0)
+        return True
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+
+
+def sweep_scratch(max_age: Optional[float] = None) -> int:
+    """Remove job directories older than max_age, or whose process is gone; returns how many"""
+    max_age = settings.SCRATCH_SWEEP_MAX_AGE if max_age is None else max_age
+    now = time.time()
+    removed = 0
+    for root in scratch_roots():
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.name.startswith(JOB_PREFIX) or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                age = now - entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            # Give a fresh directory a moment, its owner may not have written anything yet
+            if age > max_age or (age > settings.SCRATCH_SWEEP_INTERVAL and not _owner_alive(entry.name)):
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+    if removed:
+        logging.info(f"Scratch sweeper removed {removed} leftover job directories")
+    return removed
+
+
+_sweeper: Optional[threading.Thread] = None
+
+
+def start_sweeper():
+    """Sweep once now, then every SCRATCH_SWEEP_INTERVAL seconds in a daemon thread"""
+    global _sweeper
+    if _sweeper is not None and _sweeper.is_alive():
+        return
+
+    def run():
+        while True:
+            try:
+                sweep_scratch()
+            except Exception as e:
+                logging.error(f"Scratch sweeper failed: {e}")
+            time.sleep(settings.SCRATCH_SWEEP_INTERVAL)
+
+    _sweeper = threading.Thread(target=run, name="scratch-sweeper", daemon=True)
+    _sweeper.start()
@@ -1,13 +1,26 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.gzip import GZipMiddleware
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
+from celery import chain, chord, group
 import httpx
+import asyncio
 import json
 import logging
-from .core.celery_app import celery_app
+import time
+import uuid
+from .core.celery_app import celery_app, queue_depths, video_queue
+from .services.async_video_service import AsyncVideoProcessor
 from .services.video_service import VideoProcessor
 from .core.config import get_settings
-from typing import Optional, Dict, Any
+from .core.http_clients import close_async_clients, connection_stats, get_http_session
+from .core.job_queue import JobQueue
+from .core.metrics import JobMetrics, count_event, queue_waits, record_job, render_prometheus
+from .core.redis_client import BatchStore, DeadLetters, JobEvents, WebhookOutbox
+from .core.scratch import start_sweeper
+from .services.webhooks import is_retryable, post_webhook, post_webhook_async, preview, retry_delay
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, Literal
 
 # Налаштування логування
 logging.basicConfig(
@@ -28,12 +41,15 @@ class VideoRequest(BaseModel):
     video_url: HttpUrl
     system_prompt: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
+    # "high" goes to the interactive queue, "low" to the bulk queue, otherwise routed by video size
+    priority: Optional[Literal["high", "normal", "low"]] = None
 
     class Config:
         json_schema_extra = {
             "example": {
                 "video_url": "https://example.com/video.mp4",
                 "system_prompt": "Optional custom prompt for video description",
+                "priority": "normal",
                 "metadata": {
                     "Post Rec ID": "rec203Zwfn0lV9u7G",
                     "Config Rec ID": "recEMgrOdYxMK5UvP",
@@ -42,86 +58,637 @@ class VideoRequest(BaseModel):
             }
         }
 
-def send_to_webhook(result: dict) -> bool:
-    """Send result to webhook with better error handling"""
+class BatchRequest(BaseModel):
+    videos: List[VideoRequest] = Field(..., min_length=1, max_length=settings.BATCH_MAX_SIZE)
+    batch_webhook: bool = False  # One webhook with all results instead of one per video
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "videos": [
+                    {"video_url": "https://example.com/video1.mp4", "metadata": {"Post Rec ID": "rec203Zwfn0lV9u7G"}},
+                    {"video_url": "https://example.com/video2.mp4", "metadata": {"Post Rec ID": "rec7q2YUCwU4aZn29"}}
+                ],
+                "batch_webhook": True
+            }
+        }
+
+def deliver_webhook(payload) -> bool:
+    """POST payload to the webhook right away"""
+    logger.info(f"Sending webhook to {settings.WEBHOOK_URL}")
+    logger.info(f"Webhook payload: {preview(payload)}")
+    try:
+        response = post_webhook(payload)
+        logger.info(f"Webhook response: {response.status_code} {preview(response.text)}")
+        return True
+    except Exception as e:
+        _log_webhook_error(e)
+        return False
+
+def _log_webhook_error(e: Exception):
+    logger.error(f"Error sending webhook: {str(e)}")
+    if isinstance(e, httpx.HTTPStatusError):
+        logger.error(f"HTTP Status: {e.response.status_code}")
+        logger.error(f"Response body: {preview(e.response.text)}")
+
+def enqueue_webhook(payload, coalesce: bool = True) -> bool:
+    """Hand payload over to the webhook queue, falling back to direct delivery without a broker"""
+    try:
+        if coalesce and settings.WEBHOOK_COALESCE:
+            pending = WebhookOutbox.push(payload)
+            if pending:
+                if pending == 1:
+                    # First result of a window, the flush collects everything queued until then
+                    flush_webhooks_task.apply_async(countdown=settings.WEBHOOK_COALESCE_WINDOW)
+                elif pending % settings.WEBHOOK_COALESCE_MAX == 0:
+                    flush_webhooks_task.delay()
+                return True
+
+        deliver_webhook_task.delay(payload)
+        logger.info(f"Webhook queued: {preview(payload, 200)}")
+        return True
+    except Exception as e:
+        logger.error(f"Error queueing webhook, delivering directly: {str(e)}")
+        return deliver_webhook(payload)
+
+def send_to_webhook(result: dict, metrics: JobMetrics | None = None, coalesce: bool = True) -> bool:
+    """Send result to webhook, through the webhook queue unless WEBHOOK_ASYNC is off"""
     if not settings.WEBHOOK_URL:
         logger.error("No webhook URL configured")
         return False
 
-    try:
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
+    _flatten_metadata(result)
+    with (metrics or JobMetrics()).stage('webhook'):
+        if settings.WEBHOOK_ASYNC:
+            return enqueue_webhook(result, coalesce)
+        return deliver_webhook(result)
 
-        # Додаємо метадані до результату
-        if "metadata" in result:
-            logger.info(f"Adding metadata to result: {result['metadata']}")
-            result.update(result["metadata"])
-            del result["metadata"]
+def _flatten_metadata(result: dict):
+    """Move the job's metadata to the top level of the webhook payload"""
+    # Додаємо метадані до результату
+    if "metadata" in result:
+        logger.info(f"Adding metadata to result: {preview(result['metadata'])}")
+        result.update(result["metadata"])
+        del result["metadata"]
 
-        logger.info(f"Sending webhook to {settings.WEBHOOK_URL}")
-        logger.info(f"Webhook payload: {json.dumps(result, indent=2)}")
-        
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(
-                settings.WEBHOOK_URL,
-                json=result,
-                headers=headers
-            )
-            
-        response.raise_for_status()
-        logger.info(f"Webhook response: {response.status_code}")
-        logger.info(f"Webhook response body: {response.text}")
+def _deliver_or_retry(task, payload, retry_args: list) -> bool:
+    """Deliver payload from a webhook task; retry with backoff, dead-letter when giving up"""
+    try:
+        response = post_webhook(payload)
+        logger.info(f"Webhook response: {response.status_code} {preview(response.text)}")
+        count_event("webhook", "delivered")
         return True
-
     except Exception as e:
-        logger.error(f"Error sending webhook: {str(e)}")
-        if isinstance(e, httpx.HTTPError):
-            logger.error(f"HTTP Status: {e.response.status_code if hasattr(e, 'response') else 'Unknown'}")
-            logger.error(f"Response body: {e.response.text if hasattr(e, 'response') else 'Unknown'}")
+        _log_webhook_error(e)
+        if is_retryable(e) and task.request.retries < task.max_retries:
+            count_event("webhook", "retried")
+            raise task.retry(args=retry_args, exc=e, countdown=retry_delay(task.request.retries))
+        DeadLetters.push(payload, str(e), settings.WEBHOOK_DEAD_LETTER_MAX)
+        count_event("webhook", "dead_lettered")
+        logger.error(f"Webhook moved to dead letters after {task.request.retries} retries: {preview(payload, 200)}")
         return False
 
-@celery_app.task(name="process_video_task")
-def process_video_task(video_url: str, system_prompt: str | None = None, metadata: dict | None = None):
+@celery_app.task(name="deliver_webhook_task", bind=True, max_retries=settings.WEBHOOK_MAX_RETRIES)
+def deliver_webhook_task(self, payload: dict):
+    """Deliver one webhook payload"""
+    return _deliver_or_retry(self, payload, [payload])
+
+@celery_app.task(name="flush_webhooks_task", bind=True, max_retries=settings.WEBHOOK_MAX_RETRIES)
+def flush_webhooks_task(self, payloads: list | None = None):
+    """Deliver queued results as one coalesced POST"""
+    if payloads is None:
+        payloads = WebhookOutbox.pop(settings.WEBHOOK_COALESCE_MAX)
+        if WebhookOutbox.count():
+            # More results arrived meanwhile and will not schedule a flush themselves
+            flush_webhooks_task.apply_async(countdown=settings.WEBHOOK_COALESCE_WINDOW)
+    if not payloads:
+        return 0
+
+    logger.info(f"Sending {len(payloads)} coalesced results to {settings.WEBHOOK_URL}")
+    if _deliver_or_retry(self, {"count": len(payloads), "results": payloads}, [payloads]):
+        return len(payloads)
+    return 0
+
+def routing_headers(priority: str | None = None, content_length: int | None = None) -> dict:
+    """Message headers used by the queue router and for queue latency"""
+    return {"priority": priority, "content_length": content_length, "enqueued_at": time.time()}
+
+def _request_header(task, name: str):
+    """Routing header of the running task's message"""
+    return task.request.get(name) or (task.request.headers or {}).get(name)
+
+def _job_id(task) -> str:
+    """Id clients know the job by: the job_id header, or the task's own id for the job's last task"""
+    return _request_header(task, "job_id") or task.request.id
+
+def _record_queue_wait(task, metrics: JobMetrics):
+    """Time the task spent waiting in its queue, reported per queue"""
+    enqueued_at = _request_header(task, "enqueued_at")
+    if enqueued_at:
+        queue = (task.request.delivery_info or {}).get("routing_key") or "unknown"
+        metrics.add_seconds(f"queue_{queue}", max(time.time() - enqueued_at, 0.0))
+
+def _publish_failure(task, error: Exception):
+    """Tell stream subscribers that the job failed with an exception"""
+    JobEvents.publish(_job_id(task), {"event": "done", "result": {"status": "error", "message": str(error)}})
+
+def _finish_job(processor: VideoProcessor, result: dict, metadata: dict | None, send_webhook: bool) -> dict:
+    """Attach metadata, send the webhook and record metrics for a finished job"""
+    if metadata:
+        result["metadata"] = metadata
+        logger.info("Added metadata to result")
+
+    # Stream subscribers get the result before the webhook is even queued
+    JobEvents.publish(processor.job_id, {"event": "done", "result": dict(result)})
+        
+    if not send_webhook:
+        logger.info("Webhook is sent for the whole batch")
+    elif send_to_webhook(result, processor.metrics):
+        logger.info("Webhook sent successfully")
+    else:
+        logger.error("Failed to send webhook")
+
+    logger.info(f"Connection reuse: {connection_stats()}")
+    # Per-stage measurements go into the task result, not the webhook payload
+    result["metrics"] = processor.metrics.as_dict()
+    record_job(processor.metrics, result.get("status", "unknown"))
+    return result
+
+@celery_app.task(name="process_video_task", bind=True)
+def process_video_task(self, video_url: str, system_prompt: str | None = None, metadata: dict | None = None,
+                       send_webhook: bool = True):
     """Process video task"""
     logger.info(f"Starting video processing task for URL: {video_url}")
     if metadata:
         logger.info(f"With metadata: {metadata}")
     
     try:
-        processor = VideoProcessor()
-        logger.info("Initialized VideoProcessor")
-        
-        result = processor.process_video(video_url, system_prompt)
+        with VideoProcessor(_job_id(self)) as processor:
+            logger.info("Initialized VideoProcessor")
+            _record_queue_wait(self, processor.metrics)
+            processor._progress('started')
+
+            with processor.metrics.stage('total'):
+                result = processor.process_video(video_url, system_prompt)
+        if result.get("status") != "segmented":
+            logger.info("Video processing completed")
+            return _finish_job(processor, result, metadata, send_webhook)
+    except Exception as e:
+        logger.error(f"Error processing video: {str(e)}", exc_info=True)
+        _publish_failure(self, e)
+        raise
+
+    # Long video: this task becomes a chord of segment tasks, the reduce task
+    # finishes the job and its result becomes the result of this task
+    result["metrics"] = processor.metrics.as_dict()
+    return self.replace(segment_job(result, video_url, system_prompt, metadata, send_webhook,
+                                    priority=_request_header(self, "priority"), job_id=_job_id(self)))
+
+@celery_app.task(name="prepare_video_task", bind=True)
+def prepare_video_task(self, video_url: str, system_prompt: str | None = None):
+    """Split pipeline, CPU part: download, probe, frames and audio"""
+    logger.info(f"Preparing video: {video_url}")
+    with VideoProcessor(_job_id(self)) as processor:
+        _record_queue_wait(self, processor.metrics)
+        processor._progress('started')
+        with processor.metrics.stage('total'):
+            prepared = processor.prepare_video(video_url, system_prompt)
+    prepared["metrics"] = processor.metrics.as_dict()
+    if prepared.get("status") == "segmented":
+        # describe_video_task passes the merged result through and finishes the job
+        return self.replace(segment_job(prepared, video_url, system_prompt, final=False,
+                                        priority=_request_header(self, "priority"), job_id=_job_id(self)))
+    return prepared
+
+@celery_app.task(name="describe_video_task", bind=True)
+def describe_video_task(self, prepared: dict, video_url: str, system_prompt: str | None = None,
+                        metadata: dict | None = None, send_webhook: bool = True):
+    """Split pipeline, I/O part: Whisper, GPT and the webhook"""
+    logger.info(f"Describing video: {video_url}")
+    try:
+        with VideoProcessor(_job_id(self)) as processor:
+            processor.metrics.merge(prepared.pop("metrics", {}))
+            with processor.metrics.stage('total'):
+                result = processor.describe_video(prepared, system_prompt)
         logger.info("Video processing completed")
-        
-        if metadata:
-            result["metadata"] = metadata
-            logger.info("Added metadata to result")
-            
-        if send_to_webhook(result):
-            logger.info("Webhook sent successfully")
-        else:
-            logger.error("Failed to send webhook")
-            
-        return result
+        return _finish_job(processor, result, metadata, send_webhook)
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}", exc_info=True)
+        _publish_failure(self, e)
         raise
 
+@celery_app.task(name="segment_video_task", bind=True)
+def segment_video_task(self, video_url: str, fingerprint: str, start: float, length: float, has_audio: bool = True):
+    """Segmented mode: frames, transcription and a summary of one segment"""
+    logger.info(f"Processing segment at {start:.0f}s of {video_url}")
+    with VideoProcessor() as processor:
+        _record_queue_wait(self, processor.metrics)
+        result = processor.process_segment(video_url, fingerprint, start, length, has_audio)
+    JobEvents.publish(_job_id(self), {"event": "stage", "stage": "segment", "start": start,
+                                      "status": result["status"]})
+    result["metrics"] = processor.metrics.as_dict()
+    return result
+
+@celery_app.task(name="reduce_segments_task", bind=True)
+def reduce_segments_task(self, segments: list, plan: dict, system_prompt: str | None = None,
+                         metadata: dict | None = None, send_webhook: bool = True, final: bool = True):
+    """Segmented mode, chord callback: merge the segment summaries and finish the job"""
+    logger.info(f"Merging {len(segments)} segments")
+    with VideoProcessor(_job_id(self)) as processor:
+        processor.metrics.merge(plan.pop("metrics", {}))
+        for segment in segments:
+            processor.metrics.merge(segment.pop("metrics", {}))
+        with processor.metrics.stage('total'):
+            result = processor.reduce_segments(plan, segments, system_prompt)
+    if not final:
+        result["metrics"] = processor.metrics.as_dict()
+        return result
+    return _finish_job(processor, result, metadata, send_webhook)
+
+def segment_job(plan: dict, video_url: str, system_prompt: str | None, metadata: dict | None = None,
+                send_webhook: bool = True, final: bool = True, priority: str | None = None,
+                job_id: str | None = None):
+    """Chord processing the segments of a long video in parallel, then merging them"""
+    segments = []
+    for start, length in plan["segments"]:
+        # Each segment is routed by its share of the video, not by the whole file
+        share = int(plan["content_length"] * length / plan["duration"]) if plan["content_length"] else None
+        segments.append(
+            segment_video_task.s(video_url, plan["fingerprint"], start, length, plan["has_audio"])
+            .set(headers={**routing_headers(priority, share), "job_id": job_id})
+        )
+    return chord(segments, reduce_segments_task.s(plan, system_prompt, metadata, send_webhook, final)
+                 .set(headers={"job_id": job_id}))
+
+def video_job(video_url: str, system_prompt: str | None, metadata: dict | None, send_webhook: bool,
+              headers: dict):
+    """Signature processing one video, a single task or a prepare -> describe chain.
+
+    The id of the job's last task is the id clients see, earlier tasks get it in the job_id header.
+    """
+    if settings.PIPELINE_MODE == "split":
+        job_id = str(uuid.uuid4())
+        return chain(
+            prepare_video_task.s(video_url, system_prompt).set(headers={**headers, "job_id": job_id}),
+            describe_video_task.s(video_url, system_prompt, metadata, send_webhook).set(task_id=job_id)
+        )
+    return process_video_task.s(video_url, system_prompt, metadata, send_webhook).set(headers=headers)
+
+# Queue name reported for jobs of the async backend
+ASYNC_QUEUE = "async"
+
+async def deliver_webhook_async(payload) -> bool:
+    """deliver_webhook from the event loop"""
+    logger.info(f"Sending webhook to {settings.WEBHOOK_URL}")
+    logger.info(f"Webhook payload: {preview(payload)}")
+    try:
+        response = await post_webhook_async(payload)
+        logger.info(f"Webhook response: {response.status_code} {preview(response.text)}")
+        return True
+    except Exception as e:
+        _log_webhook_error(e)
+        return False
+
+async def retry_webhook_async(payload) -> bool:
+    """deliver_webhook_task for the async backend: retry with backoff, dead-letter when giving up"""
+    retries = 0
+    try:
+        while True:
+            try:
+                response = await post_webhook_async(payload)
+                logger.info(f"Webhook response: {response.status_code} {preview(response.text)}")
+                await asyncio.to_thread(count_event, "webhook", "delivered")
+                return True
+            except Exception as e:
+                _log_webhook_error(e)
+                if not is_retryable(e) or retries >= settings.WEBHOOK_MAX_RETRIES:
+                    error = str(e)
+                    break
+                await asyncio.to_thread(count_event, "webhook", "retried")
+                await asyncio.sleep(retry_delay(retries))
+                retries += 1
+    except asyncio.CancelledError:
+        # Shutdown in the middle of the retries, the payload can still be replayed;
+        # shielded so that another cancellation does not lose the push
+        await asyncio.shield(asyncio.to_thread(
+            DeadLetters.push, payload, "Cancelled on shutdown", settings.WEBHOOK_DEAD_LETTER_MAX
+        ))
+        raise
+    await asyncio.to_thread(DeadLetters.push, payload, error, settings.WEBHOOK_DEAD_LETTER_MAX)
+    await asyncio.to_thread(count_event, "webhook", "dead_lettered")
+    logger.error(f"Webhook moved to dead letters after {retries} retries: {preview(payload, 200)}")
+    return False
+
+async def send_to_webhook_async(result: dict, metrics: JobMetrics) -> bool:
+    """send_to_webhook for the async backend; retried delivery runs in the background instead of the webhook queue"""
+    if not settings.WEBHOOK_URL:
+        logger.error("No webhook URL configured")
+        return False
+
+    _flatten_metadata(result)
+    with metrics.stage('webhook'):
+        if settings.WEBHOOK_ASYNC:
+            # A copy, metrics are added to the result once the job is finished
+            job_queue.spawn(retry_webhook_async(dict(result)))
+            logger.info(f"Webhook queued: {preview(result, 200)}")
+            return True
+        return await deliver_webhook_async(result)
+
+async def _finish_async_job(processor: AsyncVideoProcessor, result: dict, metadata: dict | None) -> dict:
+    """_finish_job for the async backend"""
+    if metadata:
+        result["metadata"] = metadata
+        logger.info("Added metadata to result")
+
+    await JobEvents.publish_async(processor.job_id, {"event": "done", "result": dict(result)})
+
+    if await send_to_webhook_async(result, processor.metrics):
+        logger.info("Webhook sent successfully")
+    else:
+        logger.error("Failed to send webhook")
+
+    logger.info(f"Connection reuse: {connection_stats()}")
+    result["metrics"] = processor.metrics.as_dict()
+    await asyncio.to_thread(record_job, processor.metrics, result.get("status", "unknown"))
+    return result
+
+async def _fail_async_job(job_id: str, error: Exception):
+    """Record an async job that raised as a failed task and tell stream subscribers"""
+    await JobEvents.publish_async(job_id, {"event": "done", "result": {"status": "error", "message": str(error)}})
+    await asyncio.to_thread(celery_app.backend.mark_as_failure, job_id, error)
+
+async def run_async_job(job_id: str, video_url: str, system_prompt: str | None, metadata: dict | None,
+                        enqueued_at: float):
+    """Async backend: what process_video_task does, on the event loop of this process.
+
+    The result is stored in the Celery result backend under job_id, so
+    GET /task/{task_id} and the progress streams work the same for both backends.
+    """
+    logger.info(f"Starting async video processing job {job_id} for URL: {video_url}")
+    try:
+        await asyncio.to_thread(celery_app.backend.store_result, job_id, None, "STARTED")
+        async with AsyncVideoProcessor(job_id) as processor:
+            processor.metrics.add_seconds(f"queue_{ASYNC_QUEUE}", max(time.time() - enqueued_at, 0.0))
+            await processor._progress('started')
+
+            with processor.metrics.stage('total'):
+                try:
+                    result = await asyncio.wait_for(processor.process_video(video_url, system_prompt),
+                                                    settings.ASYNC_JOB_TIME_LIMIT)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Job exceeded the time limit of {settings.ASYNC_JOB_TIME_LIMIT}s") from None
+        logger.info("Video processing completed")
+        result = await _finish_async_job(processor, result, metadata)
+        await asyncio.to_thread(celery_app.backend.mark_as_done, job_id, result)
+    except asyncio.CancelledError:
+        await _fail_async_job(job_id, Exception("Server shut down while the job was running"))
+        raise
+    except Exception as e:
+        logger.error(f"Error processing video: {str(e)}", exc_info=True)
+        await _fail_async_job(job_id, e)
+
+job_queue = JobQueue(run_async_job, settings.ASYNC_MAX_CONCURRENCY, settings.ASYNC_QUEUE_SIZE)
+
+@app.on_event("startup")
+async def start_async_backend():
+    """Start serving the in-process job queue when the async backend is selected"""
+    if settings.EXECUTION_BACKEND != "async":
+        return
+    # The API process is the worker now, so it also removes leftover scratch directories
+    start_sweeper()
+    job_queue.start()
+    logger.info(f"Async execution backend: {settings.ASYNC_MAX_CONCURRENCY} jobs at once, "
+                f"{settings.ASYNC_QUEUE_SIZE} queued")
+
+@app.on_event("shutdown")
+async def stop_async_backend():
+    """Let running jobs finish, fail the ones still queued"""
+    if settings.EXECUTION_BACKEND != "async":
+        return
+    dropped = await job_queue.stop(settings.ASYNC_SHUTDOWN_TIMEOUT)
+    for job_id, *_ in dropped:
+        await _fail_async_job(job_id, Exception("Server shut down before the job started"))
+    await close_async_clients()
+
+def _queue_depths() -> dict:
+    """Jobs waiting per queue of the configured execution backend"""
+    if settings.EXECUTION_BACKEND == "async":
+        return {ASYNC_QUEUE: job_queue.stats()["queued"]}
+    return queue_depths()
+
+def _item_result(result: dict, task_metadata: dict | None, metadata: dict | None) -> dict:
+    """Result of one batch item: the task result with the item's own metadata"""
+    item = {k: v for k, v in result.items() if k != "metrics" and k not in (task_metadata or {})}
+    if metadata:
+        item["metadata"] = metadata
+    return item
+
+def _task_metas(task_ids: list) -> list:
+    """State and result of every task, fetched in one round trip instead of one per task"""
+    backend = celery_app.backend
+    keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+    values = backend.mget(keys)
+    if hasattr(values, "items"):
+        # Some result backends return a mapping instead of a list
+        values = [values.get(key) for key in keys]
+    return [backend.decode_result(value) if value else {"status": "PENDING", "result": None} for value in values]
+
+@celery_app.task(name="finish_batch_task")
+def finish_batch_task(results: list, batch_id: str):
+    """Chord callback: deliver webhooks that individual tasks did not send"""
+    manifest = BatchStore.get(batch_id)
+    if manifest is None:
+        logger.error(f"Batch {batch_id} manifest not found")
+        return None
+    # The chord error callback can run more than once for one failed task
+    if not BatchStore.claim_finish(batch_id, settings.CELERY_RESULT_EXPIRES):
+        logger.info(f"Batch {batch_id} already finished")
+        return batch_id
+
+    items = []
+    for item in manifest["items"]:
+        task_index = item["task"]
+        task_metadata = manifest["tasks"][task_index]["metadata"]
+        items.append((item, _item_result(results[task_index], task_metadata, item["metadata"])))
+
+    if manifest["batch_webhook"]:
+        results_payload = []
+        for item, result in items:
+            if "metadata" in result:
+                result.update(result.pop("metadata"))
+            results_payload.append(result)
+        payload = {
+            "batch_id": batch_id,
+            "total": len(results_payload),
+            "succeeded": sum(1 for r in results_payload if r.get("status") == "success"),
+            "results": results_payload
+        }
+        # A batch already is one POST, it is never coalesced further
+        if send_to_webhook(payload, coalesce=False):
+            logger.info(f"Batch webhook sent for {batch_id}")
+        else:
+            logger.error(f"Failed to send batch webhook for {batch_id}")
+    else:
+        # The first request of every URL+prompt pair got its webhook from
+        # the task itself, duplicates get theirs now
+        for item, result in items:
+            if item["duplicate"]:
+                send_to_webhook(result)
+    return batch_id
+
+@celery_app.task(name="finish_failed_batch_task")
+def finish_failed_batch_task(request, exc, traceback, batch_id: str):
+    """Chord error callback: finish the batch anyway, with error results for the tasks that failed"""
+    # A task that raised or hit the hard time limit fails the whole chord,
+    # so finish_batch_task would never deliver the batch or duplicate webhooks
+    logger.error(f"Batch {batch_id} had failed tasks: {exc}")
+    manifest = BatchStore.get(batch_id)
+    if manifest is None:
+        logger.error(f"Batch {batch_id} manifest not found")
+        return
+    results = []
+    for meta in _task_metas([task["task_id"] for task in manifest["tasks"]]):
+        if meta["status"] == "SUCCESS":
+            results.append(meta["result"])
+        elif meta["status"] == "FAILURE":
+            results.append({"status": "error", "message": str(meta["result"])})
+        else:
+            results.append({"status": "error", "message": f"Task did not finish ({meta['status']})"})
+    finish_batch_task.delay(results, batch_id)
+
+# Batch endpoints are plain functions: the manifest, result backend and broker
+# calls block, so FastAPI runs them in its threadpool instead of the event loop
+@app.post("/process/batch")
+def process_video_batch(request: BatchRequest):
+    """Process many videos with a single broker round trip"""
+    batch_id = uuid.uuid4().hex
+    logger.info(f"Received batch {batch_id} with {len(request.videos)} videos")
+
+    # Identical URL+prompt pairs are processed once
+    tasks = []
+    task_index = {}
+    items = []
+    for video in request.videos:
+        pair = (str(video.video_url), video.system_prompt or "")
+        duplicate = pair in task_index
+        if not duplicate:
+            task_index[pair] = len(tasks)
+            tasks.append({
+                "video_url": pair[0],
+                "system_prompt": video.system_prompt,
+                # Backfills are bulk work unless the client says otherwise
+                "priority": video.priority or "low",
+                # With a batch webhook tasks run without metadata, it is attached per item later
+                "metadata": None if request.batch_webhook else video.metadata
+            })
+        items.append({"task": task_index[pair], "metadata": video.metadata, "duplicate": duplicate})
+
+    try:
+        signatures = [
+            video_job(
+                task["video_url"], task["system_prompt"], task["metadata"],
+                not request.batch_webhook, routing_headers(task["priority"])
+            )
+            for task in tasks
+        ]
+        # The id of a chain is the id of its last task, which holds the final result
+        task_ids = [signature.freeze().id for signature in signatures]
+        manifest = {
+            "items": items,
+            "tasks": [{**task, "task_id": task_id} for task, task_id in zip(tasks, task_ids)],
+            "batch_webhook": request.batch_webhook
+        }
+        # Manifest must exist before the chord callback can run
+        if not BatchStore.save(batch_id, manifest, settings.CELERY_RESULT_EXPIRES):
+            raise RuntimeError("Failed to store batch manifest")
+
+        # All messages are published over one producer connection
+        chord(signatures)(finish_batch_task.s(batch_id).on_error(finish_failed_batch_task.s(batch_id)))
+        logger.info(f"Batch {batch_id}: {len(tasks)} tasks for {len(items)} videos")
+        return {
+            "batch_id": batch_id,
+            "status": "Processing started",
+            "total": len(items),
+            "tasks": len(tasks),
+            "duplicates": len(items) - len(tasks),
+            "task_ids": [manifest["tasks"][item["task"]]["task_id"] for item in items]
+        }
+    except Exception as e:
+        logger.error(f"Error creating batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/batch/{batch_id}")
+def get_batch_status(batch_id: str, include_results: bool = False):
+    """Aggregated batch status endpoint"""
+    manifest = BatchStore.get(batch_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Batch not found or expired")
+
+    try:
+        metas = _task_metas([task["task_id"] for task in manifest["tasks"]])
+
+        counts: Dict[str, int] = {}
+        for item in manifest["items"]:
+            status = metas[item["task"]]["status"]
+            counts[status] = counts.get(status, 0) + 1
+
+        done = counts.get("SUCCESS", 0) + counts.get("FAILURE", 0)
+        response = {
+            "batch_id": batch_id,
+            "status": "SUCCESS" if done == len(manifest["items"]) else "PROGRESS",
+            "total": len(manifest["items"]),
+            "completed": done,
+            "counts": counts
+        }
+        if include_results:
+            response["results"] = []
+            for item in manifest["items"]:
+                task = manifest["tasks"][item["task"]]
+                meta = metas[item["task"]]
+                entry = {"task_id": task["task_id"], "status": meta["status"]}
+                if meta["status"] == "SUCCESS":
+                    entry["result"] = _item_result(meta["result"], task["metadata"], item["metadata"])
+                elif meta["status"] == "FAILURE":
+                    entry["error"] = str(meta["result"])
+                response["results"].append(entry)
+        return response
+    except Exception as e:
+        logger.error(f"Error checking batch status: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _content_length(video_url: str) -> int | None:
+    """Video size from a quick HEAD request, None if unknown"""
+    try:
+        response = await asyncio.to_thread(
+            get_http_session().head, video_url, timeout=settings.ROUTING_HEAD_TIMEOUT, allow_redirects=True
+        )
+        return int(response.headers.get("content-length", 0)) or None
+    except Exception:
+        return None
+
 @app.post("/process")
 async def process_video(request: VideoRequest):
     """Process video endpoint"""
     logger.info(f"Received request to process video: {request.video_url}")
+    if settings.EXECUTION_BACKEND == "async":
+        task_id = str(uuid.uuid4())
+        if not job_queue.submit(request.priority, task_id, str(request.video_url), request.system_prompt,
+                                request.metadata, time.time()):
+            raise HTTPException(status_code=503, detail="Too many jobs queued, try again later")
+        logger.info(f"Queued async job with ID: {task_id}")
+        return {"task_id": task_id, "status": "Processing started", "queue": ASYNC_QUEUE}
     try:
-        task = process_video_task.delay(
-            str(request.video_url),
-            request.system_prompt,
-            request.metadata
-        )
-        logger.info(f"Created Celery task with ID: {task.id}")
-        return {"task_id": task.id, "status": "Processing started"}
+        content_length = None
+        if request.priority in (None, "normal") and settings.ROUTING_HEAD_CHECK:
+            content_length = await _content_length(str(request.video_url))
+
+        task = video_job(
+            str(request.video_url), request.system_prompt, request.metadata, True,
+            routing_headers(request.priority, content_length)
+        ).apply_async()
+        queue = video_queue(request.priority, content_length)
+        logger.info(f"Created Celery task with ID: {task.id} in queue {queue}")
+        return {"task_id": task.id, "status": "Processing started", "queue": queue}
     except Exception as e:
         logger.error(f"Error creating task: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -142,12 +709,133 @@ async def get_task_status(task_id: str):
         elif task.status == 'FAILURE':
             response["error"] = str(task.result)
             
-        logger.info(f"Task status: {response}")
+        # Results carry the whole transcription, only the status is logged
+        logger.info(f"Task {task_id} status: {task.status}")
         return response
     except Exception as e:
         logger.error(f"Error checking task status: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _finished_event(task_id: str) -> dict | None:
+    """'done' event with the result of a finished task, None while it runs"""
+    task = celery_app.AsyncResult(task_id)
+    if not task.ready():
+        return None
+    result = task.result if task.successful() else {"status": "error", "message": str(task.result)}
+    if isinstance(result, dict):
+        result = {k: v for k, v in result.items() if k != "metrics"}
+    return {"event": "done", "result": result}
+
+async def _task_events(task_id: str, after: int, timeout: float):
+    """Progress events of a task; one finished before its events were kept yields just its result"""
+    if after == 0 and not await JobEvents.read(task_id):
+        # Result backend round trips block, so they run off the event loop
+        done = await asyncio.to_thread(_finished_event, task_id)
+        if done:
+            yield 1, done
+            return
+    async with aclosing(JobEvents.listen(task_id, after, timeout)) as events:
+        async for seq, event in events:
+            yield seq, event
+
+@app.get("/task/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request):
+    """Server-sent events with the progress of a task, resumed from the Last-Event-ID header"""
+    after = int(request.headers.get("last-event-id") or 0)
+
+    async def events():
+        async for seq, event in _task_events(task_id, after, settings.PROGRESS_STREAM_IDLE_TIMEOUT):
+            yield f"id: {seq}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    # Content-Encoding keeps GZipMiddleware from buffering the stream
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "Content-Encoding": "identity"})
+
+@app.websocket("/task/{task_id}/ws")
+async def task_events_socket(websocket: WebSocket, task_id: str, after: int = 0):
+    """Progress events of a task as JSON messages over a WebSocket"""
+    await websocket.accept()
+    try:
+        async for seq, event in _task_events(task_id, after, settings.PROGRESS_STREAM_IDLE_TIMEOUT):
+            await websocket.send_json({"seq": seq, **event})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/task/{task_id}/wait")
+async def wait_task_events(task_id: str, after: int = 0, timeout: float | None = None):
+    """Long poll: progress events after seq `after`, waiting for the first one up to timeout seconds"""
+    timeout = min(timeout or settings.PROGRESS_LONG_POLL_TIMEOUT, settings.PROGRESS_LONG_POLL_TIMEOUT)
+    events = []
+    async with aclosing(_task_events(task_id, after, timeout)) as stream:
+        async for seq, event in stream:
+            events.append(event)
+            break
+    if events and events[0]["event"] != "done":
+        # Everything else that is already there comes in the same response
+        events += await JobEvents.read(task_id, after + 1)
+    return {
+        "task_id": task_id,
+        "events": events,
+        "next": after + len(events),
+        "done": any(event["event"] == "done" for event in events)
+    }
+
+@app.get("/queues")
+def get_queues():
+    """Queue depth and average wait per queue"""
+    try:
+        depths = _queue_depths()
+    except Exception as e:
+        logger.error(f"Error reading queue depths: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    waits = queue_waits()
+    return {
+        name: {"depth": depth, **waits.get(name, {"jobs": 0, "avg_wait_seconds": None})}
+        for name, depth in depths.items()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics endpoint"""
+    try:
+        depths = _queue_depths()
+    except Exception:
+        depths = None
+    return render_prometheus(depths)
+
+@app.get("/webhooks/dead-letters")
+def get_dead_letters(start: int = 0, count: int = 100):
+    """Webhook payloads that could not be delivered"""
+    return {"total": DeadLetters.count(), "items": DeadLetters.peek(start, count)}
+
+def _requeue_dead_letters(letters: list):
+    """Publish deliveries of dead letters in one go, putting them back if that fails"""
+    try:
+        group(deliver_webhook_task.s(letter["payload"]) for letter in letters).apply_async()
+    except Exception:
+        for letter in letters:
+            DeadLetters.push(letter["payload"], letter["error"], settings.WEBHOOK_DEAD_LETTER_MAX)
+        raise
+
+@app.post("/webhooks/dead-letters/replay")
+async def replay_dead_letters():
+    """Queue every dead letter for delivery again"""
+    letters = await asyncio.to_thread(DeadLetters.pop_all)
+    if not letters:
+        return {"requeued": 0}
+    if settings.EXECUTION_BACKEND == "async":
+        for letter in letters:
+            job_queue.spawn(retry_webhook_async(letter["payload"]))
+        return {"requeued": len(letters)}
+    try:
+        # All messages are published over one producer connection
+        await asyncio.to_thread(_requeue_dead_letters, letters)
+    except Exception as e:
+        logger.error(f"Error replaying dead letters: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"requeued": len(letters)}
+
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
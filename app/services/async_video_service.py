@@ -0,0 +1,568 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from ..core.config import get_settings
+from ..core.http_clients import get_async_http_client, get_async_openai_client
+from ..core.metrics import add_bytes
+from ..core.redis_client import JobEvents
+from .audio import audio_extension, extract_audio_async, plan_chunks, split_audio, stitch_transcripts
+from .contact_sheet import format_timestamp
+from .downloader import download_to_file_async, sample_fingerprint, supports_streaming
+from .frame_extractor import extract_frames_async, pack_frames, unique_frames, unpack_frames
+from .media import MediaContext, RejectedVideo, probe_media_async
+from .openai_calls import call_openai_async
+from .video_service import SEGMENT_PROMPT, VideoProcessor
+
+settings = get_settings()
+
+
+class AsyncVideoProcessor(VideoProcessor):
+    """VideoProcessor for the event loop, used by the async execution backend.
+
+    Same pipeline, cache entries and results as VideoProcessor.process_video,
+    including segmented mode, whose segments run as concurrent coroutines of
+    the job instead of a chord. ffprobe and ffmpeg are asyncio subprocesses;
+    the video, Whisper and GPT go through the loop's pooled async clients.
+    Redis calls and the rarely used blocking steps of the base class (scene
+    detection, keyframe lookup for keyframe seek, contact sheets, voice
+    activity check, chunked audio, sampled fingerprints, early probe) run in
+    threads. Every pipeline method overridden here is a coroutine.
+    """
+
+    def __init__(self, job_id: Optional[str] = None):
+        super().__init__(job_id)
+        self.client = get_async_openai_client()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.to_thread(self._cleanup)
+        return False
+
+    async def _progress(self, stage: str, **fields):
+        """Publish a stage progress event of the job"""
+        await JobEvents.publish_async(self.job_id, {'event': 'stage', 'stage': stage, **fields})
+
+    async def _run_parallel(self, *stages):
+        """Await coroutine functions together (one after another with PARALLEL_STAGES off), returns their results.
+
+        If one fails the others are cancelled before the error propagates,
+        so nothing keeps writing to a scratch directory about to be removed.
+        """
+        if not settings.PARALLEL_STAGES:
+            return [await stage() for stage in stages]
+        tasks = [asyncio.ensure_future(stage()) for stage in stages]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _validate_video(self, url: str) -> tuple[bool, str, dict]:
+        """Validate video before downloading, returns (is_valid, error, response headers)"""
+        try:
+            with self.metrics.stage('head'):
+                response = await get_async_http_client().head(url, timeout=settings.REQUEST_TIMEOUT,
+                                                              follow_redirects=True)
+            response.raise_for_status()
+            error = self._validation_error(response.headers)
+            return not error, error, response.headers
+        except httpx.HTTPError as e:
+            return False, f"Error validating video: {str(e)}", {}
+
+    async def _download_video(self, video_url: str, content_length: int = 0) -> tuple[str, str]:
+        """Download a validated video and return (path, sha256 fingerprint of its bytes)"""
+        scratch_dir = self.scratch.reserve(content_length or settings.MAX_VIDEO_SIZE)
+        video_path = os.path.join(scratch_dir, 'video.mp4')
+        with self.metrics.stage('download'):
+            _, fingerprint = await download_to_file_async(
+                video_url, video_path, settings.MAX_VIDEO_SIZE,
+                chunk_size=settings.DOWNLOAD_CHUNK_SIZE, timeout=settings.REQUEST_TIMEOUT
+            )
+        return video_path, fingerprint
+
+    async def _extract_frames(self, video_path: str, duration: float, max_frames: int = 8,
+                              ffmpeg_path: str = 'ffmpeg') -> List[bytes]:
+        """Extract frames and return list of encoded images"""
+        if settings.FRAME_PACKING == 'contact_sheet':
+            return await asyncio.to_thread(self._extract_contact_sheets, video_path, duration, ffmpeg_path)
+
+        if settings.FRAME_SELECTION_MODE == 'scene':
+            timestamps = await asyncio.to_thread(self._frame_timestamps, video_path, duration, max_frames, ffmpeg_path)
+        else:
+            timestamps = self._frame_timestamps(video_path, duration, max_frames, ffmpeg_path)
+        if not settings.FRAME_ACCURATE_SEEK:
+            timestamps = await asyncio.to_thread(self._seek_timestamps, video_path, timestamps)
+        frames = await extract_frames_async(
+            video_path, timestamps, ffmpeg_path,
+            max_size=settings.MAX_IMAGE_SIZE,
+            quality=settings.JPEG_QUALITY,
+            accurate_seek=settings.FRAME_ACCURATE_SEEK,
+            image_format=settings.FRAME_FORMAT
+        )
+        return unique_frames(frames, timestamps)[0]
+
+    async def _extract_audio(self, video_path: str, ffmpeg_path: str = 'ffmpeg') -> str:
+        """Extract compact mono audio for transcription and return path"""
+        return await extract_audio_async(video_path, self._audio_path(), ffmpeg_path, **self._audio_profile())
+
+    async def _transcribe_file(self, audio_path: str, with_segments: bool = False):
+        """Send one audio file to Whisper"""
+        with self.metrics.stage('whisper'):
+            audio = await asyncio.to_thread(Path(audio_path).read_bytes)
+            add_bytes(len(audio))
+            return await call_openai_async('audio', lambda: self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=(os.path.basename(audio_path), audio),
+                language="en",
+                **({'response_format': 'verbose_json'} if with_segments else {})
+            ))
+
+    async def _get_transcription(self, audio_path: str, duration: Optional[float] = None) -> str:
+        """Get audio transcription, splitting long audio into chunks transcribed concurrently"""
+        chunks = await asyncio.to_thread(self._transcription_chunks, audio_path, duration)
+        if len(chunks) == 1:
+            return (await self._transcribe_file(audio_path)).text
+
+        ffmpeg_path, _ = self._get_ffmpeg_path()
+        chunk_paths = await asyncio.to_thread(split_audio, audio_path, chunks, ffmpeg_path)
+        limit = asyncio.Semaphore(settings.TRANSCRIPTION_CONCURRENCY)
+
+        async def transcribe(path: str):
+            async with limit:
+                return await self._transcribe_file(path, with_segments=True)
+
+        try:
+            responses = await asyncio.gather(*(transcribe(path) for path in chunk_paths))
+        finally:
+            for chunk_path in chunk_paths:
+                if os.path.exists(chunk_path):
+                    os.remove(chunk_path)
+
+        return stitch_transcripts([
+            (start, getattr(response, 'segments', None), response.text)
+            for (start, _), response in zip(chunks, responses)
+        ])
+
+    async def _stream_chat(self, messages: List[Dict], max_tokens: int) -> str:
+        """Streamed chat completion, tokens are published as progress events while they arrive"""
+        parts = []
+        pending = []
+        sent = time.monotonic()
+        stream = await self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                pending.append(delta)
+            if pending and time.monotonic() - sent >= settings.PROGRESS_TOKEN_INTERVAL:
+                await JobEvents.publish_async(self.job_id, {'event': 'tokens', 'text': ''.join(pending)})
+                pending = []
+                sent = time.monotonic()
+        if pending:
+            await JobEvents.publish_async(self.job_id, {'event': 'tokens', 'text': ''.join(pending)})
+        return ''.join(parts)
+
+    async def _chat(self, messages: List[Dict], request_bytes: int, tokens: int, max_tokens: int = 2048,
+                    stream: bool = True) -> str:
+        """Send a chat completion and return its text, streamed to the job's subscribers unless stream is off"""
+        streamed = stream and bool(self.job_id) and settings.PROGRESS_ENABLED and settings.PROGRESS_STREAM_TOKENS
+        attempts = 0
+
+        async def request() -> str:
+            nonlocal attempts
+            attempts += 1
+            if not streamed:
+                response = await self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=max_tokens
+                )
+                return response.choices[0].message.content
+            if attempts > 1:
+                await JobEvents.publish_async(self.job_id, {'event': 'tokens_reset'})
+            return await self._stream_chat(messages, max_tokens)
+
+        try:
+            with self.metrics.stage('gpt'):
+                add_bytes(request_bytes)
+                return await call_openai_async('chat', request, tokens)
+        except Exception as e:
+            logging.error(f"Error getting description from OpenAI: {str(e)}")
+            raise Exception(f"Error code: {getattr(e, 'status_code', 'unknown')} - {str(e)}")
+
+    async def _get_description(self, frames: Sequence[bytes], transcription: str, system_prompt: Optional[str] = None,
+                               sheets: Optional[bool] = None, max_tokens: int = 2048) -> str:
+        """Get video description using OpenAI"""
+        messages, request_bytes, tokens = self._description_request(frames, transcription, system_prompt, sheets,
+                                                                    max_tokens)
+        return await self._chat(messages, request_bytes, tokens, max_tokens)
+
+    async def _run_stage(self, stage: str, fingerprint: str, compute, variant: Optional[str] = None):
+        """Return stage output from the stage cache, or await compute() and cache it"""
+        with self.metrics.stage(stage):
+            if settings.CACHE_ENABLED:
+                cached = await asyncio.to_thread(self.stage_cache.get, stage, fingerprint, variant)
+                self.metrics.cache_result(stage, cached is not None)
+                if cached is not None:
+                    return cached
+
+            value = await compute()
+            if settings.CACHE_ENABLED:
+                await asyncio.to_thread(self.stage_cache.set, stage, fingerprint, value, variant)
+            return value
+
+    async def _run_frames_stage(self, fingerprint: str, extract) -> Sequence[bytes]:
+        """Return encoded frames from the stage cache, or await extract() and cache them"""
+        variant = self._frames_variant()
+        with self.metrics.stage('frames'):
+            if settings.CACHE_ENABLED:
+                blob = await asyncio.to_thread(self.stage_cache.get_bytes, 'frames', fingerprint, variant)
+                self.metrics.cache_result('frames', bool(blob))
+                if blob:
+                    return unpack_frames(blob)
+
+            frames = await extract()
+            if settings.CACHE_ENABLED:
+                await asyncio.to_thread(self.stage_cache.set_bytes, 'frames', fingerprint, pack_frames(frames), variant)
+            return frames
+
+    async def _run_audio_stage(self, fingerprint: str, extract) -> str:
+        """Return path to extracted audio, restoring it from the stage cache if possible"""
+        variant = self._audio_variant()
+        with self.metrics.stage('audio'):
+            if settings.CACHE_ENABLED:
+                audio_bytes = await asyncio.to_thread(self.stage_cache.get_bytes, 'audio', fingerprint, variant)
+                self.metrics.cache_result('audio', bool(audio_bytes))
+                if audio_bytes:
+                    audio_path = self._audio_path()
+                    await asyncio.to_thread(Path(audio_path).write_bytes, audio_bytes)
+                    return audio_path
+
+            audio_path = await extract()
+            if settings.CACHE_ENABLED:
+                audio_bytes = await asyncio.to_thread(Path(audio_path).read_bytes)
+                await asyncio.to_thread(self.stage_cache.set_bytes, 'audio', fingerprint, audio_bytes, variant)
+            return audio_path
+
+    async def _get_cached_result(self, fingerprint: Optional[str], prompt_variant: str) -> Optional[Dict]:
+        """Final result for media + prompt from the stage cache"""
+        if not settings.CACHE_ENABLED or not fingerprint:
+            return None
+        with self.metrics.stage('description'):
+            cached_result = await asyncio.to_thread(self.stage_cache.get, 'description', fingerprint, prompt_variant)
+        self.metrics.cache_result('description', bool(cached_result))
+        return cached_result
+
+    async def process_video(self, video_url: str, system_prompt: Optional[str] = None) -> Dict:
+        """Process video and return results, sharing the work of duplicate in-flight jobs"""
+        prompt_variant = hashlib.md5((system_prompt or '').encode()).hexdigest()
+        if settings.CACHE_ENABLED:
+            url_fingerprint = await asyncio.to_thread(self.media_cache.get_fingerprint,
+                                                      self.media_cache.url_key(video_url))
+            cached_result = await self._get_cached_result(url_fingerprint, prompt_variant)
+            if cached_result:
+                return cached_result
+
+        is_valid, error, headers = await self._validate_video(video_url)
+        if not is_valid:
+            return {
+                'status': 'error',
+                'message': error
+            }
+        media = MediaContext(video_url, headers)
+
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await self._process_validated_video(media, system_prompt)
+
+        # Followers of a job running in a Celery worker or another API process wait the same way
+        flight_key = self._get_flight_key(video_url, headers, system_prompt)
+        token = await asyncio.to_thread(self.single_flight.acquire, flight_key, settings.ASYNC_JOB_TIME_LIMIT)
+        if token is None:
+            shared_result = await asyncio.to_thread(self.single_flight.wait, flight_key,
+                                                    settings.SINGLE_FLIGHT_WAIT_TIMEOUT)
+            if shared_result is not None:
+                return shared_result
+            token = await asyncio.to_thread(self.single_flight.acquire, flight_key, settings.ASYNC_JOB_TIME_LIMIT)
+
+        result = None
+        try:
+            result = await self._process_validated_video(media, system_prompt)
+            return result
+        finally:
+            if token:
+                await asyncio.to_thread(self.single_flight.release, flight_key, token, result,
+                                        settings.SINGLE_FLIGHT_RESULT_TTL)
+
+    async def _resolve_fingerprint(self, media: MediaContext):
+        """Fill in media.fingerprint (and media.stream / media.path) for a validated video"""
+        index_key = None
+        if settings.CACHE_ENABLED:
+            index_key = self.media_cache.index_key(media.url, media.headers)
+            media.fingerprint = (await asyncio.to_thread(self.media_cache.get_fingerprint, index_key)
+                                 if index_key else None)
+
+        media.stream = settings.VIDEO_INPUT_MODE == 'stream' and supports_streaming(media.headers)
+        if media.fingerprint is None:
+            if media.stream or (settings.SEGMENTED_ENABLED and supports_streaming(media.headers)):
+                media.fingerprint = await asyncio.to_thread(
+                    sample_fingerprint, media.url, media.content_length, timeout=settings.REQUEST_TIMEOUT
+                )
+                media.stream = media.stream and media.fingerprint is not None
+
+            if media.fingerprint is None:
+                await asyncio.to_thread(self._early_probe, media)
+                media.path, media.fingerprint = await self._download_video(media.url, media.content_length)
+            if index_key:
+                await asyncio.to_thread(self.media_cache.set_fingerprint, index_key, media.fingerprint,
+                                        settings.CACHE_EXPIRE_TIME)
+        if settings.CACHE_ENABLED:
+            await asyncio.to_thread(self.media_cache.set_fingerprint, self.media_cache.url_key(media.url),
+                                    media.fingerprint, settings.URL_INDEX_TTL)
+
+    async def _ensure_video(self, media: MediaContext, download_lock: asyncio.Lock) -> str:
+        """Video input for ffmpeg; known media is downloaded only once a stage misses the cache"""
+        if media.stream:
+            return media.url
+        async with download_lock:
+            if media.path is None:
+                media.path, _ = await self._download_video(media.url, media.content_length)
+        return media.path
+
+    async def _probe(self, media: MediaContext, download_lock: asyncio.Lock) -> Optional[Dict]:
+        """Probe the video into media.probe, returns an error result if it cannot be processed"""
+        _, ffprobe_path = self._get_ffmpeg_path()
+
+        async def probe() -> Dict:
+            return media.probe or await probe_media_async(await self._ensure_video(media, download_lock), ffprobe_path)
+
+        media.probe = await self._run_stage('probe', media.fingerprint, probe, variant='streams')
+        try:
+            await asyncio.to_thread(self._check_media, media.probe)
+        except RejectedVideo as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        return None
+
+    async def _plan_segments(self, media: MediaContext, prompt_variant: str) -> Optional[Dict]:
+        """Segment plan for a long video in segmented mode, None to process it as a whole"""
+        if not settings.SEGMENTED_ENABLED or media.path or not supports_streaming(media.headers):
+            return None
+        _, ffprobe_path = self._get_ffmpeg_path()
+
+        async def probe() -> Dict:
+            return media.probe or await probe_media_async(media.url, ffprobe_path)
+
+        media.probe = await self._run_stage('probe', media.fingerprint, probe, variant='streams')
+        if media.duration <= settings.SEGMENT_MIN_DURATION:
+            return None
+        await asyncio.to_thread(self._check_media, media.probe)
+
+        segments = plan_chunks(media.duration, settings.SEGMENT_DURATION)
+        logging.info(f"Segmented mode: {media.duration:.0f}s video split into {len(segments)} segments")
+        return {
+            'status': 'segmented',
+            'fingerprint': media.fingerprint,
+            'prompt_variant': prompt_variant,
+            'duration': media.duration,
+            'content_length': media.content_length,
+            'has_audio': media.probe['has_audio'],
+            'segments': segments
+        }
+
+    async def process_segment(self, video_url: str, fingerprint: str, start: float, length: float,
+                              has_audio: bool = True) -> Dict:
+        """Frames, transcription and a short summary of one segment of a long video, read from the URL"""
+        try:
+            ffmpeg_path, _ = self._get_ffmpeg_path()
+
+            async def transcribe() -> str:
+                # Segments of the job run side by side in one scratch directory
+                audio_path = os.path.join(self.scratch.path,
+                                          f"segment_{start:.0f}.{audio_extension(settings.AUDIO_CODEC)}")
+                await extract_audio_async(video_url, audio_path, ffmpeg_path,
+                                          **{**self._audio_profile(), 'start': start, 'max_duration': length})
+                try:
+                    return await self._get_transcription(audio_path, length)
+                except RejectedVideo:
+                    return ''
+
+            async def frames() -> List[bytes]:
+                timestamps = [start + length * (i + 0.5) / settings.SEGMENT_FRAMES
+                              for i in range(settings.SEGMENT_FRAMES)]
+                if not settings.FRAME_ACCURATE_SEEK:
+                    timestamps = await asyncio.to_thread(self._seek_timestamps, video_url, timestamps,
+                                                         start, start + length)
+                with self.metrics.stage('frames'):
+                    segment_frames = await extract_frames_async(
+                        video_url, timestamps, ffmpeg_path,
+                        max_size=settings.MAX_IMAGE_SIZE,
+                        quality=settings.JPEG_QUALITY,
+                        accurate_seek=settings.FRAME_ACCURATE_SEEK,
+                        image_format=settings.FRAME_FORMAT
+                    )
+                    return unique_frames(segment_frames, timestamps)[0]
+
+            async def summarize() -> Dict:
+                if has_audio:
+                    segment_frames, transcription = await self._run_parallel(frames, transcribe)
+                else:
+                    segment_frames, transcription = await frames(), ''
+                prompt = SEGMENT_PROMPT.format(start=format_timestamp(start), end=format_timestamp(start + length))
+                max_tokens = settings.SEGMENT_SUMMARY_MAX_TOKENS
+                request = self._description_request(segment_frames, transcription, prompt, False, max_tokens)
+                return {
+                    'start': start,
+                    'length': length,
+                    'transcription': transcription,
+                    # Segments run side by side, their tokens would interleave in the job's stream
+                    'summary': await self._chat(*request, max_tokens, stream=False)
+                }
+
+            segment = await self._run_stage('segment', fingerprint, summarize,
+                                            variant=self._segment_variant(start, length))
+            return {'status': 'success', **segment}
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': f"Segment {format_timestamp(start)}: {str(e)}"
+            }
+
+    async def reduce_segments(self, plan: Dict, segments: Sequence[Dict], system_prompt: Optional[str] = None) -> Dict:
+        """Merge the segment summaries of a segmented job into the final result"""
+        failed = next((segment for segment in segments if segment.get('status') != 'success'), None)
+        if failed:
+            return failed
+        segments = sorted(segments, key=lambda segment: segment['start'])
+        transcription = " ".join(segment['transcription'].strip() for segment in segments
+                                 if segment['transcription'].strip())
+        word_count = len(transcription.split())
+        if word_count < settings.MIN_WORDS:
+            return {
+                'status': 'error',
+                'message': f'Transcription word count ({word_count}) is less than minimum required words ({settings.MIN_WORDS})'
+            }
+        await self._progress('transcribed', word_count=word_count)
+
+        async def describe() -> Dict:
+            return {
+                'status': 'success',
+                'transcription': transcription,
+                'description': await self._chat(*self._summaries_request(segments, system_prompt)),
+                'word_count': word_count
+            }
+
+        result = await self._run_stage('description', plan['fingerprint'], describe, variant=plan['prompt_variant'])
+        await self._progress('described')
+        return result
+
+    async def _process_segments(self, plan: Dict, video_url: str, system_prompt: Optional[str] = None) -> Dict:
+        """Segmented mode in one job: segments run concurrently, then their summaries are merged"""
+        limit = asyncio.Semaphore(settings.ASYNC_SEGMENT_CONCURRENCY)
+
+        async def segment(start: float, length: float) -> Dict:
+            async with limit:
+                result = await self.process_segment(video_url, plan['fingerprint'], start, length, plan['has_audio'])
+            await JobEvents.publish_async(self.job_id, {'event': 'stage', 'stage': 'segment', 'start': start,
+                                                        'status': result['status']})
+            return result
+
+        segments = await asyncio.gather(*(segment(start, length) for start, length in plan['segments']))
+        return await self.reduce_segments(plan, segments, system_prompt)
+
+    async def _describe(self, fingerprint: str, frames: Sequence[bytes], transcription: str,
+                        system_prompt: Optional[str], prompt_variant: str) -> Dict:
+        """Check the transcription and get the description, cached per prompt together with the final result"""
+        word_count = len(transcription.split())
+        if word_count < settings.MIN_WORDS:
+            return {
+                'status': 'error',
+                'message': f'Transcription word count ({word_count}) is less than minimum required words ({settings.MIN_WORDS})'
+            }
+        await self._progress('transcribed', word_count=word_count)
+
+        async def describe() -> Dict:
+            return {
+                'status': 'success',
+                'transcription': transcription,
+                'description': await self._get_description(frames, transcription, system_prompt),
+                'word_count': word_count
+            }
+
+        result = await self._run_stage('description', fingerprint, describe, variant=prompt_variant)
+        await self._progress('described')
+        return result
+
+    async def _process_validated_video(self, media: MediaContext, system_prompt: Optional[str] = None) -> Dict:
+        """Run the processing pipeline for a video that passed validation"""
+        download_lock = asyncio.Lock()
+
+        try:
+            ffmpeg_path, _ = self._get_ffmpeg_path()
+
+            await self._resolve_fingerprint(media)
+            fingerprint = media.fingerprint
+
+            prompt_variant = hashlib.md5((system_prompt or '').encode()).hexdigest()
+            cached_result = await self._get_cached_result(fingerprint, prompt_variant)
+            if cached_result:
+                return cached_result
+
+            plan = await self._plan_segments(media, prompt_variant)
+            if plan:
+                return await self._process_segments(plan, media.url, system_prompt)
+
+            error = await self._probe(media, download_lock)
+            if error:
+                return error
+            await self._progress('downloaded')
+            duration = media.duration
+
+            async def extract_audio() -> str:
+                return await self._extract_audio(await self._ensure_video(media, download_lock), ffmpeg_path)
+
+            async def transcribe() -> str:
+                audio_path = await self._run_audio_stage(fingerprint, extract_audio)
+                return await self._get_transcription(audio_path, duration)
+
+            async def extract_frames() -> List[bytes]:
+                return await self._extract_frames(await self._ensure_video(media, download_lock), duration,
+                                                  settings.MAX_FRAMES, ffmpeg_path)
+
+            async def frames() -> Sequence[bytes]:
+                result = await self._run_frames_stage(fingerprint, extract_frames)
+                await self._progress('frames', count=len(result))
+                return result
+
+            # Frames do not depend on audio, both run on the loop at once
+            video_frames, transcription = await self._run_parallel(
+                frames,
+                lambda: self._run_stage('transcription', fingerprint, transcribe, variant=self._transcription_variant())
+            )
+
+            return await self._describe(fingerprint, video_frames, transcription, system_prompt, prompt_variant)
+
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        finally:
+            logging.info(f"Stage timings: {self.metrics.summary()}")
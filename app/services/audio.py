@@ -0,0 +1,164 @@
+import os
+import subprocess
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.metrics import run_process, run_process_async
+
+# codec name -> (ffmpeg encoder, container/file extension accepted by Whisper)
+AUDIO_CODECS = {
+    'opus': ('libopus', 'ogg'),
+    'mp3': ('libmp3lame', 'mp3'),
+}
+
+
+def audio_extension(codec: str) -> str:
+    """File extension for an audio codec"""
+    return AUDIO_CODECS[codec][1]
+
+
+def build_audio_cmd(source: str, output_path: str, ffmpeg_path: str = 'ffmpeg', codec: str = 'opus',
+                    bitrate: str = '24k', sample_rate: int = 16000, channels: int = 1,
+                    max_duration: float = 0, trim_silence: bool = False, start: float = 0) -> List[str]:
+    """Build ffmpeg command producing transcription-ready audio"""
+    encoder, _ = AUDIO_CODECS[codec]
+    cmd = [ffmpeg_path, '-nostdin', '-y', '-loglevel', 'error']
+    if start:
+        # Input-side seek, a segment of a remote video is read with range requests
+        cmd += ['-ss', f"{start:.3f}"]
+    if max_duration:
+        # Input-side limit stops demuxing once enough audio is read
+        cmd += ['-t', str(max_duration)]
+    cmd += ['-i', source, '-map', '0:a:0', '-vn', '-sn', '-dn']
+
+    if trim_silence:
+        # Drop every pause longer than a second, Whisper does not need them
+        cmd += ['-af', 'silenceremove=start_periods=1:start_threshold=-50dB:'
+                       'stop_periods=-1:stop_duration=1:stop_threshold=-50dB']
+
+    cmd += [
+        '-ac', str(channels), '-ar', str(sample_rate),
+        '-c:a', encoder, '-b:a', bitrate,
+    ]
+    if codec == 'opus':
+        cmd += ['-application', 'voip']
+    return cmd + [output_path]
+
+
+def extract_audio(source: str, output_path: str, ffmpeg_path: str = 'ffmpeg', **profile) -> str:
+    """Extract audio from source using the given profile and return output path"""
+    cmd = build_audio_cmd(source, output_path, ffmpeg_path, **profile)
+    try:
+        run_process(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error extracting audio: {e.stderr}")
+        raise Exception(f"Failed to extract audio: {e.stderr}")
+    return output_path
+
+
+async def extract_audio_async(source: str, output_path: str, ffmpeg_path: str = 'ffmpeg', **profile) -> str:
+    """extract_audio with ffmpeg run from the event loop"""
+    cmd = build_audio_cmd(source, output_path, ffmpeg_path, **profile)
+    try:
+        await run_process_async(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors='replace')
+        print(f"Error extracting audio: {stderr}")
+        raise Exception(f"Failed to extract audio: {stderr}")
+    return output_path
+
+
+def speech_seconds(source: str, ffmpeg_path: str = 'ffmpeg', sample_rate: int = 16000,
+                   threshold_db: float = -45.0, frame_ms: int = 30) -> float:
+    """Seconds of likely speech in source, from frame energy in the voice band.
+
+    A frame counts as speech when it is louder than threshold_db (dBFS) and
+    10dB above the noise floor of the clip. Cheap enough to run before every
+    Whisper call; music with vocals still passes, silence and hum do not.
+    """
+    cmd = [
+        ffmpeg_path, '-nostdin', '-loglevel', 'error', '-i', source, '-map', '0:a:0',
+        '-ac', '1', '-ar', str(sample_rate), '-af', 'highpass=f=100,lowpass=f=3800',
+        '-f', 's16le', 'pipe:1'
+    ]
+    try:
+        result = run_process(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error decoding audio for voice detection: {e.stderr}")
+        raise Exception(f"Failed to decode audio: {e.stderr}")
+
+    samples = np.frombuffer(result.stdout, dtype=np.int16)
+    frame = sample_rate * frame_ms // 1000
+    count = len(samples) // frame
+    if count == 0:
+        return 0.0
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float32) / 32768
+    level_db = 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10)
+    noise_floor = np.percentile(level_db, 10)
+    voiced = (level_db > threshold_db) & (level_db > noise_floor + 10)
+    return float(np.count_nonzero(voiced) * frame_ms / 1000)
+
+
+def plan_chunks(duration: float, chunk_duration: float, overlap: float = 0) -> List[Tuple[float, float]]:
+    """Split duration into (start, length) chunks that overlap by `overlap` seconds"""
+    if duration <= chunk_duration:
+        return [(0.0, duration)]
+
+    chunks = []
+    start = 0.0
+    step = max(chunk_duration - overlap, 1.0)
+    while start < duration:
+        chunks.append((start, min(chunk_duration, duration - start)))
+        if start + chunk_duration >= duration:
+            break
+        start += step
+    return chunks
+
+
+def split_audio(audio_path: str, chunks: Sequence[Tuple[float, float]], ffmpeg_path: str = 'ffmpeg') -> List[str]:
+    """Cut audio into chunk files without re-encoding and return their paths"""
+    base, ext = os.path.splitext(audio_path)
+    paths = []
+    for i, (start, length) in enumerate(chunks):
+        chunk_path = f"{base}_{i:03d}{ext}"
+        cmd = [
+            ffmpeg_path, '-nostdin', '-y', '-loglevel', 'error',
+            '-ss', f"{start:.3f}", '-t', f"{length:.3f}", '-i', audio_path,
+            '-c', 'copy', chunk_path
+        ]
+        try:
+            run_process(cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Error splitting audio: {e.stderr}")
+            raise Exception(f"Failed to split audio: {e.stderr}")
+        paths.append(chunk_path)
+    return paths
+
+
+def _segment_field(segment, name: str) -> Any:
+    return segment[name] if isinstance(segment, dict) else getattr(segment, name)
+
+
+def stitch_transcripts(parts: Sequence[Tuple[float, Optional[list], str]]) -> str:
+    """Join chunk transcripts given as (chunk start, segments, text) in chunk order.
+
+    Segments are shifted to absolute time; a segment whose midpoint falls
+    inside audio already covered by the previous chunk (the overlap) is
+    dropped, so words at chunk boundaries are neither lost nor repeated.
+    Chunks without segments are appended as plain text.
+    """
+    texts = []
+    covered_until = 0.0
+    for offset, segments, text in parts:
+        if not segments:
+            texts.append(text.strip())
+            continue
+        for segment in segments:
+            start = offset + _segment_field(segment, 'start')
+            end = offset + _segment_field(segment, 'end')
+            if (start + end) / 2 < covered_until:
+                continue
+            texts.append(_segment_field(segment, 'text').strip())
+            covered_until = max(covered_until, end)
+    return " ".join(t for t in texts if t)
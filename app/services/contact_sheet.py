@@ -0,0 +1,112 @@
+import math
+from typing import Dict, List, Sequence
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .frame_extractor import encode_image, webp_available
+
+# OpenAI image token cost (gpt-4o units; gpt-4o-mini bills the same tiles at a
+# fixed multiple, so the budget comparisons hold for both)
+LOW_DETAIL_TOKENS = 85
+HIGH_DETAIL_BASE_TOKENS = 85
+HIGH_DETAIL_TILE_TOKENS = 170
+LOW_DETAIL_SIDE = 512
+
+# Sheet layouts tried by plan_contact_sheets: (detail, sheet side in px)
+SHEET_SIDES = (("high", 768), ("low", LOW_DETAIL_SIDE))
+GRIDS = (2, 3, 4)
+
+
+def image_tokens(width: int, height: int, detail: str = "low") -> int:
+    """Estimated vision tokens of one image"""
+    if detail == "low":
+        return LOW_DETAIL_TOKENS
+    # Fit into 2048x2048, then scale the shortest side down to 768, count 512px tiles
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return HIGH_DETAIL_BASE_TOKENS + HIGH_DETAIL_TILE_TOKENS * tiles
+
+
+def token_budget(duration: float, per_minute: int, min_tokens: int, max_tokens: int) -> int:
+    """Image token budget for a video, proportional to its duration"""
+    return max(min_tokens, min(max_tokens, int(per_minute * duration / 60)))
+
+
+def sheet_frame_count(duration: float, frame_interval: float, max_frames: int) -> int:
+    """How many frames to tile: one per frame_interval seconds, capped"""
+    return max(1, min(max_frames, math.ceil(duration / frame_interval)))
+
+
+def sheet_plan(frames: int, sheets: int, grid: int, cell: int, detail: str, tokens: int) -> Dict:
+    """Contact sheet layout: `grid` columns (and at most `grid` rows) of `cell` px square tiles"""
+    return {'frames': frames, 'sheets': sheets, 'grid': grid, 'cell': cell, 'detail': detail, 'tokens': tokens}
+
+
+def plan_contact_sheets(frame_count: int, budget: int, min_cell: int = 128) -> Dict:
+    """Pick the sheet layout with the largest tiles whose token cost fits the budget, cheapest on ties.
+
+    If no layout fits all frames, the cheapest-per-frame layout is used and the
+    frame count is cut to what the budget pays for (at least one sheet).
+    """
+    layouts = []
+    for detail, side in SHEET_SIDES:
+        for grid in GRIDS:
+            cell = side // grid
+            if cell < min_cell:
+                continue
+            sheets = math.ceil(frame_count / (grid * grid))
+            cost = image_tokens(side, side, detail)
+            layouts.append(sheet_plan(frame_count, sheets, grid, cell, detail, sheets * cost))
+
+    fitting = [plan for plan in layouts if plan['tokens'] <= budget]
+    if fitting:
+        return max(fitting, key=lambda plan: (plan['cell'], -plan['tokens']))
+
+    cheapest = min(layouts, key=lambda plan: (plan['tokens'] / frame_count, -plan['cell']))
+    per_sheet_tokens = cheapest['tokens'] // cheapest['sheets']
+    tiles_per_sheet = cheapest['grid'] * cheapest['grid']
+    frames = min(frame_count, max(1, budget // per_sheet_tokens) * tiles_per_sheet)
+    sheets = math.ceil(frames / tiles_per_sheet)
+    return sheet_plan(frames, sheets, cheapest['grid'], cheapest['cell'], cheapest['detail'],
+                      sheets * per_sheet_tokens)
+
+
+def spread_timestamps(duration: float, count: int) -> List[float]:
+    """Timestamps in the middle of count equal slices of the video"""
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def build_contact_sheets(tiles: Sequence[Image.Image], timestamps: Sequence[float], plan: Dict,
+                         quality: int = 70, image_format: str = "jpeg") -> List[bytes]:
+    """Tile frames row by row into grid images, each tile labelled with its timestamp"""
+    if image_format == "webp" and not webp_available():
+        raise Exception("FRAME_FORMAT is webp but Pillow has no WebP support")
+
+    font = ImageFont.load_default()
+    per_sheet = plan['grid'] * plan['grid']
+    sheets = []
+    for start in range(0, len(tiles), per_sheet):
+        batch = list(zip(tiles[start:start + per_sheet], timestamps[start:start + per_sheet]))
+        rows = math.ceil(len(batch) / plan['grid'])
+        columns = min(plan['grid'], len(batch))
+        sheet = Image.new("RGB", (columns * plan['cell'], rows * plan['cell']))
+        draw = ImageDraw.Draw(sheet)
+        for index, (tile, timestamp) in enumerate(batch):
+            x = (index % plan['grid']) * plan['cell']
+            y = (index // plan['grid']) * plan['cell']
+            # Centre the frame in its square cell, the rest stays black
+            sheet.paste(tile, (x + (plan['cell'] - tile.width) // 2, y + (plan['cell'] - tile.height) // 2))
+            label = format_timestamp(timestamp)
+            left, top, right, bottom = draw.textbbox((x + 4, y + 4), label, font=font)
+            draw.rectangle((left - 2, top - 2, right + 2, bottom + 2), fill=(0, 0, 0))
+            draw.text((x + 4, y + 4), label, fill=(255, 255, 255), font=font)
+        sheets.append(encode_image(sheet, quality, image_format))
+    return sheets
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import struct
+
+from ..core.http_clients import get_async_http_client, get_http_session
+from ..core.metrics import add_bytes
+
+
+def download_to_file(url: str, path: str, max_size: int, chunk_size: int = 1024 * 1024,
+                     timeout: int = 30) -> tuple[int, str]:
+    """Stream url into path and return (size in bytes, sha256 hex digest)"""
+    # One preallocated buffer is reused for every read instead of a new bytes
+    # object per 8 KB chunk
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    digest = hashlib.sha256()
+    downloaded_size = 0
+
+    with get_http_session().get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+
+        with open(path, 'wb', buffering=0) as f:
+            while True:
+                n = response.raw.readinto(view)
+                if not n:
+                    break
+                downloaded_size += n
+                # Check size during download
+                if downloaded_size > max_size:
+                    f.close()
+                    os.remove(path)
+                    raise ValueError(f"Video size exceeds maximum allowed size ({max_size / 1024 / 1024:.1f}MB)")
+                chunk = view[:n]
+                digest.update(chunk)
+                f.write(chunk)
+
+    add_bytes(downloaded_size)
+    return downloaded_size, digest.hexdigest()
+
+
+async def download_to_file_async(url: str, path: str, max_size: int, chunk_size: int = 1024 * 1024,
+                                 timeout: int = 30) -> tuple[int, str]:
+    """download_to_file on the event loop's pooled httpx client"""
+    digest = hashlib.sha256()
+    downloaded_size = 0
+
+    async with get_async_http_client().stream('GET', url, timeout=timeout, follow_redirects=True) as response:
+        response.raise_for_status()
+        # Chunks land in the page cache, writing them does not hold the loop noticeably
+        with open(path, 'wb', buffering=0) as f:
+            async for chunk in response.aiter_bytes(chunk_size):
+                downloaded_size += len(chunk)
+                if downloaded_size > max_size:
+                    f.close()
+                    os.remove(path)
+                    raise ValueError(f"Video size exceeds maximum allowed size ({max_size / 1024 / 1024:.1f}MB)")
+                digest.update(chunk)
+                f.write(chunk)
+
+    add_bytes(downloaded_size)
+    return downloaded_size, digest.hexdigest()
+
+
+def supports_streaming(headers) -> bool:
+    """Whether the server lets ffmpeg read the video directly with range requests"""
+    return headers.get('accept-ranges', '').lower() == 'bytes' and bool(headers.get('content-length'))
+
+
+def sample_fingerprint(url: str, content_length: int, sample_size: int = 1024 * 1024,
+                       timeout: int = 30) -> str | None:
+    """Fingerprint a remote video from its size and first/last bytes without downloading it.
+
+    Container headers and sample tables sit at the start or end of the file,
+    so they identify the media well enough for caching. This is weaker than
+    the sha256 of the whole download: two files of the same size that differ
+    only in the middle share a fingerprint, so the key is prefixed with
+    "sampled-" and never matches a full-content one. Returns None if the
+    server ignores range requests.
+    """
+    digest = hashlib.sha256(f"{content_length}:".encode())
+    for byte_range in (f"bytes=0-{sample_size - 1}", f"bytes=-{sample_size}"):
+        sample = _read_range(url, byte_range, sample_size, timeout)
+        if sample is None:
+            return None
+        digest.update(sample)
+    return f"sampled-{digest.hexdigest()}"
+
+
+def _read_range(url: str, byte_range: str, limit: int, timeout: int) -> bytes | None:
+    """At most limit bytes of a range request, None if the server ignores range requests"""
+    # Streamed, so a server that answers 200 with the whole video is not downloaded
+    with get_http_session().get(url, headers={'Range': byte_range}, stream=True, timeout=timeout) as response:
+        if response.status_code != 206:
+            return None
+        data = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            data += chunk[:limit - len(data)]
+            if len(data) >= limit:
+                break
+    add_bytes(len(data))
+    return bytes(data)
+
+
+def _fetch_range(url: str, start: int, end: int, timeout: int) -> bytes | None:
+    """Bytes start..end (inclusive) of url, None if the server ignores range requests"""
+    return _read_range(url, f"bytes={start}-{end}", end - start + 1, timeout)
+
+
+def _atom_header(data: bytes, offset: int) -> tuple[int, bytes, int] | None:
+    """(size, type, header length) of the MP4 atom at offset in data, None if it does not fit"""
+    if offset + 8 > len(data):
+        return None
+    size = struct.unpack('>I', data[offset:offset + 4])[0]
+    kind = data[offset + 4:offset + 8]
+    if size == 1:
+        if offset + 16 > len(data):
+            return None
+        return struct.unpack('>Q', data[offset + 8:offset + 16])[0], kind, 16
+    return size, kind, 8
+
+
+def fetch_container_header(url: str, content_length: int, head_size: int = 1024 * 1024,
+                           max_size: int = 8 * 1024 * 1024, timeout: int = 30) -> tuple[bytes, bool] | None:
+    """Just enough of a remote video for ffprobe: the container header, without the media data.
+
+    For MP4/MOV the top-level atoms are walked with range requests and the
+    result is every atom except mdat, with moov fetched wherever it sits
+    (start or end of the file). Other containers keep their header at the
+    start, so the first head_size bytes are returned. Returns (header, whether
+    it holds a complete moov); only then can ffprobe read the real duration
+    instead of guessing it from a truncated file. None if the server ignores
+    range requests or the header is larger than max_size.
+    """
+    head = _fetch_range(url, 0, min(head_size, content_length) - 1, timeout)
+    if head is None:
+        return None
+    if head[4:8] != b'ftyp':
+        return head, False
+
+    parts = []
+    offset = 0
+    while offset < content_length:
+        if offset + 16 <= len(head):
+            header = _atom_header(head, offset)
+        else:
+            window = _fetch_range(url, offset, min(offset + 16, content_length) - 1, timeout)
+            header = _atom_header(window, 0) if window else None
+        if header is None:
+            break
+        size, kind, header_length = header
+        if size == 0:
+            size = content_length - offset
+        if size < header_length:
+            break
+
+        if kind != b'mdat':
+            if size > max_size:
+                return None
+            if offset + size <= len(head):
+                parts.append(head[offset:offset + size])
+            else:
+                atom = _fetch_range(url, offset, offset + size - 1, timeout)
+                if atom is None or len(atom) != size:
+                    return None
+                parts.append(atom)
+            if kind == b'moov':
+                return b''.join(parts), True
+        offset += size
+
+    # No moov found by the walk, ffprobe gets whatever the first bytes hold
+    return head, False
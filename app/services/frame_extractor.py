@@ -0,0 +1,267 @@
+import asyncio
+import bisect
+import io
+import struct
+import subprocess
+import tempfile
+from typing import AsyncIterator, BinaryIO, Callable, Iterator, List, Sequence, Tuple, TypeVar
+
+from PIL import Image, features
+
+from ..core.metrics import TrackedPopen
+
+T = TypeVar("T")
+
+
+def frame_timestamps(duration: float, max_frames: int = 8, short_threshold: float = 30,
+                     medium_threshold: float = 60, short_interval: float = 5,
+                     medium_interval: float = 10, long_interval: float = 20) -> List[float]:
+    """Return fixed-interval timestamps (in seconds) for a video of given duration"""
+    if duration <= short_threshold:
+        interval = short_interval
+    elif duration <= medium_threshold:
+        interval = medium_interval
+    else:
+        interval = long_interval
+
+    num_frames = min(max_frames, int(duration / interval))
+    if num_frames == 0:
+        num_frames = 1
+
+    return [float(i * interval) for i in range(num_frames) if i * interval < duration]
+
+
+def snap_to_keyframes(timestamps: Sequence[float], keyframes: Sequence[float]) -> List[float]:
+    """Nearest keyframe to every timestamp, without repeats.
+
+    A keyframe seek returns the keyframe it lands on, so timestamps sharing a
+    keyframe would otherwise produce the same image more than once.
+    """
+    if not keyframes:
+        return list(timestamps)
+    snapped = []
+    for ts in timestamps:
+        i = bisect.bisect_left(keyframes, ts)
+        nearest = min(keyframes[max(i - 1, 0):i + 1], key=lambda k: abs(k - ts))
+        if nearest not in snapped:
+            snapped.append(nearest)
+    return snapped
+
+
+def unique_frames(frames: Sequence[T], timestamps: Sequence[float],
+                  key: Callable[[T], bytes] = bytes) -> Tuple[List[T], List[float]]:
+    """Drop frames identical to an earlier one, along with their timestamps"""
+    seen = set()
+    kept, kept_timestamps = [], []
+    for frame, ts in zip(frames, timestamps):
+        data = key(frame)
+        if data in seen:
+            continue
+        seen.add(data)
+        kept.append(frame)
+        kept_timestamps.append(ts)
+    return kept, kept_timestamps
+
+
+def read_ppm_frames(stream: BinaryIO) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield (width, height, rgb_bytes) for every PPM image in an image2pipe stream"""
+    while True:
+        magic = stream.readline()
+        if not magic:
+            return
+        if magic.strip() != b"P6":
+            raise ValueError(f"Unexpected frame header: {magic[:16]!r}")
+        width, height = (int(v) for v in stream.readline().split())
+        maxval = int(stream.readline().strip())
+        if maxval != 255:
+            raise ValueError(f"Unsupported PPM max value: {maxval}")
+
+        size = width * height * 3
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated frame in ffmpeg output")
+        yield width, height, data
+
+
+async def read_ppm_frames_async(stream: asyncio.StreamReader) -> AsyncIterator[Tuple[int, int, bytes]]:
+    """read_ppm_frames for the stdout of an asyncio subprocess"""
+    while True:
+        magic = await stream.readline()
+        if not magic:
+            return
+        if magic.strip() != b"P6":
+            raise ValueError(f"Unexpected frame header: {magic[:16]!r}")
+        width, height = (int(v) for v in (await stream.readline()).split())
+        maxval = int((await stream.readline()).strip())
+        if maxval != 255:
+            raise ValueError(f"Unsupported PPM max value: {maxval}")
+
+        try:
+            data = await stream.readexactly(width * height * 3)
+        except asyncio.IncompleteReadError:
+            raise ValueError("Truncated frame in ffmpeg output")
+        yield width, height, data
+
+
+# image format -> (PIL format name, MIME type)
+IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+
+def image_mime(image_format: str) -> str:
+    """MIME type of a frame image format"""
+    return IMAGE_FORMATS[image_format][1]
+
+
+def webp_available() -> bool:
+    """Whether Pillow was built with WebP support"""
+    return features.check("webp")
+
+
+def encode_frame(width: int, height: int, data: bytes, quality: int = 70, image_format: str = "jpeg") -> bytes:
+    """Encode a raw RGB frame once into JPEG or WebP bytes"""
+    # frombuffer wraps the pipe data without copying it
+    img = Image.frombuffer("RGB", (width, height), data, "raw", "RGB", 0, 1)
+    return encode_image(img, quality, image_format)
+
+
+def encode_image(img: Image.Image, quality: int = 70, image_format: str = "jpeg") -> bytes:
+    """Encode a PIL image into JPEG or WebP bytes"""
+    buffer = io.BytesIO()
+    img.save(buffer, format=IMAGE_FORMATS[image_format][0], quality=quality)
+    return buffer.getvalue()
+
+
+def pack_frames(frames: Sequence[bytes]) -> bytes:
+    """Serialize encoded frames as length-prefixed records"""
+    return b"".join(struct.pack(">I", len(frame)) + bytes(frame) for frame in frames)
+
+
+def unpack_frames(blob: bytes) -> List[memoryview]:
+    """Split a pack_frames blob into zero-copy views of each frame"""
+    view = memoryview(blob)
+    frames = []
+    offset = 0
+    while offset < len(view):
+        (size,) = struct.unpack_from(">I", view, offset)
+        offset += 4
+        frames.append(view[offset:offset + size])
+        offset += size
+    return frames
+
+
+def build_extract_cmd(video_path: str, timestamps: Sequence[float], ffmpeg_path: str = "ffmpeg",
+                      max_size: int = 512, accurate_seek: bool = True) -> List[str]:
+    """Build a single ffmpeg command that outputs all selected frames as PPM to stdout"""
+    # Every timestamp gets its own input with an input-side seek, so ffmpeg jumps
+    # to a keyframe instead of decoding the whole video, but all frames still come
+    # out of one process and one pipe. Without accurate seek the keyframe itself is
+    # used, which avoids decoding up to a full GOP per frame; timestamps should then
+    # be snapped with snap_to_keyframes, so they are printed with full precision.
+    seek_opts = [] if accurate_seek else ["-noaccurate_seek"]
+    cmd = [ffmpeg_path, "-nostdin", "-loglevel", "error"]
+    for ts in timestamps:
+        cmd += ["-ss", f"{ts:.6f}", *seek_opts, "-i", video_path]
+
+    # ffmpeg scales to the final size, so the pipe only carries pixels that get encoded
+    scale = f"scale=w='min({max_size},iw)':h='min({max_size},ih)':force_original_aspect_ratio=decrease"
+    chains = [
+        f"[{i}:v:0]trim=end_frame=1,setpts=PTS-STARTPTS,{scale}[f{i}]"
+        for i in range(len(timestamps))
+    ]
+    inputs = "".join(f"[f{i}]" for i in range(len(timestamps)))
+    chains.append(f"{inputs}concat=n={len(timestamps)}:v=1:a=0[out]")
+
+    return cmd + [
+        "-filter_complex", ";".join(chains),
+        "-map", "[out]",
+        "-vsync", "passthrough",
+        "-f", "image2pipe", "-c:v", "ppm", "pipe:1",
+    ]
+
+
+def decode_frames(video_path: str, timestamps: Sequence[float], handle: Callable[[int, int, bytes], T],
+                  ffmpeg_path: str = "ffmpeg", max_size: int = 512, accurate_seek: bool = True) -> List[T]:
+    """Run one ffmpeg process for all timestamps and pass every raw RGB frame to handle"""
+    if not timestamps:
+        return []
+
+    cmd = build_extract_cmd(video_path, timestamps, ffmpeg_path, max_size, accurate_seek)
+    frames = []
+    # stderr goes to a file, not a pipe: a damaged input can log more than a pipe
+    # buffer of decode errors, and ffmpeg would stall while stdout is being read
+    with tempfile.TemporaryFile() as stderr_file:
+        process = TrackedPopen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            # Frames are handled as soon as they arrive, while ffmpeg keeps decoding
+            for width, height, data in read_ppm_frames(process.stdout):
+                frames.append(handle(width, height, data))
+            process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors="replace")
+
+    if process.returncode != 0:
+        print(f"Error extracting frames: {stderr}")
+        raise Exception(f"Failed to extract frames: {stderr}")
+    return frames
+
+
+def extract_frames(video_path: str, timestamps: Sequence[float], ffmpeg_path: str = "ffmpeg",
+                   max_size: int = 512, quality: int = 70, accurate_seek: bool = True,
+                   image_format: str = "jpeg") -> List[bytes]:
+    """Extract frames at the given timestamps with one ffmpeg process and return encoded images"""
+    if image_format == "webp" and not webp_available():
+        raise Exception("FRAME_FORMAT is webp but Pillow has no WebP support")
+    return decode_frames(
+        video_path, timestamps,
+        lambda width, height, data: encode_frame(width, height, data, quality, image_format),
+        ffmpeg_path, max_size, accurate_seek
+    )
+
+
+async def decode_frames_async(video_path: str, timestamps: Sequence[float], handle: Callable[[int, int, bytes], T],
+                              ffmpeg_path: str = "ffmpeg", max_size: int = 512, accurate_seek: bool = True) -> List[T]:
+    """decode_frames with ffmpeg run from the event loop; handle runs in a thread so encoding does not block it"""
+    if not timestamps:
+        return []
+
+    cmd = build_extract_cmd(video_path, timestamps, ffmpeg_path, max_size, accurate_seek)
+    frames = []
+    process = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Read alongside the frames, a full stderr pipe would stall ffmpeg
+    stderr_read = asyncio.ensure_future(process.stderr.read())
+    try:
+        async for width, height, data in read_ppm_frames_async(process.stdout):
+            frames.append(await asyncio.to_thread(handle, width, height, data))
+        stderr = (await stderr_read).decode(errors="replace")
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_read.cancel()
+
+    if process.returncode != 0:
+        print(f"Error extracting frames: {stderr}")
+        raise Exception(f"Failed to extract frames: {stderr}")
+    return frames
+
+
+async def extract_frames_async(video_path: str, timestamps: Sequence[float], ffmpeg_path: str = "ffmpeg",
+                               max_size: int = 512, quality: int = 70, accurate_seek: bool = True,
+                               image_format: str = "jpeg") -> List[bytes]:
+    """extract_frames with ffmpeg run from the event loop"""
+    if image_format == "webp" and not webp_available():
+        raise Exception("FRAME_FORMAT is webp but Pillow has no WebP support")
+    return await decode_frames_async(
+        video_path, timestamps,
+        lambda width, height, data: encode_frame(width, height, data, quality, image_format),
+        ffmpeg_path, max_size, accurate_seek
+    )
@@ -0,0 +1,93 @@
+import re
+import subprocess
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ..core.metrics import run_process
+
+SAMPLE_WIDTH = 64
+SAMPLE_HEIGHT = 36
+HISTOGRAM_BINS = 32
+
+
+def sample_keyframes(video_path: str, ffmpeg_path: str = 'ffmpeg', width: int = SAMPLE_WIDTH,
+                     height: int = SAMPLE_HEIGHT) -> Tuple[List[float], np.ndarray]:
+    """Decode only keyframes, downscaled to grayscale thumbnails.
+
+    Returns (timestamps, frames) where frames has shape (n, height, width).
+    Skipping non-key frames keeps this pass cheap, and keyframe timestamps
+    are exactly where keyframe seeking lands during extraction.
+    """
+    cmd = [
+        ffmpeg_path, '-nostdin', '-loglevel', 'info',
+        '-skip_frame', 'nokey', '-i', video_path,
+        '-an', '-sn', '-dn',
+        '-vf', f"scale={width}:{height},format=gray,showinfo",
+        '-vsync', 'passthrough',
+        '-f', 'rawvideo', 'pipe:1',
+    ]
+    try:
+        result = run_process(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors='replace')[-2000:]
+        print(f"Error sampling keyframes: {stderr}")
+        raise Exception(f"Failed to sample keyframes: {stderr}")
+
+    stderr = result.stderr.decode(errors='replace')
+    timestamps = [float(t) for t in re.findall(r"pts_time:\s*(-?[\d.]+)", stderr)]
+    frame_size = width * height
+    count = min(len(timestamps), len(result.stdout) // frame_size)
+    frames = np.frombuffer(result.stdout[:count * frame_size], dtype=np.uint8).reshape(count, height, width)
+    return timestamps[:count], frames
+
+
+def scene_scores(frames: np.ndarray) -> np.ndarray:
+    """Score each frame by how much its histogram differs from the previous one (0..1)"""
+    if len(frames) == 0:
+        return np.zeros(0)
+
+    bins = (frames.reshape(len(frames), -1).astype(np.uint16) * HISTOGRAM_BINS) >> 8
+    histograms = np.stack([np.bincount(row, minlength=HISTOGRAM_BINS) for row in bins]).astype(np.float32)
+    histograms /= histograms.sum(axis=1, keepdims=True)
+
+    scores = np.empty(len(frames), dtype=np.float32)
+    # The opening frame always establishes the first scene
+    scores[0] = 1.0
+    scores[1:] = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+    return scores
+
+
+def dhash(frame: np.ndarray, size: int = 8) -> int:
+    """Difference hash (size*size bits) of a grayscale frame"""
+    small = np.asarray(
+        Image.fromarray(frame).resize((size + 1, size), Image.BILINEAR),
+        dtype=np.int16
+    )
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def select_distinct(timestamps: List[float], frames: np.ndarray, max_frames: int,
+                    hash_threshold: int = 10) -> List[float]:
+    """Pick up to max_frames timestamps with the highest scene scores, skipping near-duplicates"""
+    scores = scene_scores(frames)
+    hashes = [dhash(frame) for frame in frames]
+
+    selected = []
+    for i in np.argsort(-scores, kind='stable'):
+        if len(selected) >= max_frames:
+            break
+        if all(bin(hashes[i] ^ hashes[j]).count('1') >= hash_threshold for j in selected):
+            selected.append(int(i))
+    return sorted(timestamps[i] for i in selected)
+
+
+def scene_timestamps(video_path: str, max_frames: int, ffmpeg_path: str = 'ffmpeg',
+                     hash_threshold: int = 10) -> List[float]:
+    """Timestamps of the most distinct keyframes, empty if the video has too few keyframes"""
+    timestamps, frames = sample_keyframes(video_path, ffmpeg_path)
+    if len(timestamps) < 2:
+        return []
+    return select_distinct(timestamps, frames, max_frames, hash_threshold)
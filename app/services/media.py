@@ -0,0 +1,148 @@
+import json
+import subprocess
+from typing import Dict, List, Optional, Sequence
+
+from ..core.metrics import run_process, run_process_async
+
+
+def build_probe_cmd(source: str, ffprobe_path: str = 'ffprobe') -> List[str]:
+    """ffprobe command printing duration, container and streams of a video as JSON"""
+    return [
+        ffprobe_path, '-v', 'error',
+        '-show_entries', 'format=duration,format_name,bit_rate:stream=codec_type,codec_name,width,height',
+        '-of', 'json', source
+    ]
+
+
+def parse_probe(output: str | bytes) -> Dict:
+    """Probe result from the JSON printed by build_probe_cmd"""
+    data = json.loads(output or '{}')
+    fmt = data.get('format', {})
+    streams = data.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+    try:
+        duration = float(fmt['duration'])
+    except (KeyError, ValueError):
+        raise Exception("Failed to get video duration")
+
+    return {
+        'duration': duration,
+        'format': fmt.get('format_name'),
+        'bit_rate': int(fmt['bit_rate']) if fmt.get('bit_rate', '').isdigit() else None,
+        'width': video.get('width') if video else None,
+        'height': video.get('height') if video else None,
+        'video_codec': video.get('codec_name') if video else None,
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'has_audio': audio is not None,
+    }
+
+
+def probe_media(source: str, ffprobe_path: str = 'ffprobe') -> Dict:
+    """Probe duration, container and streams of a video with a single ffprobe call"""
+    try:
+        result = run_process(build_probe_cmd(source, ffprobe_path), capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error probing video: {e.stderr}")
+        raise Exception(f"Failed to probe video: {e.stderr}")
+    return parse_probe(result.stdout)
+
+
+async def probe_media_async(source: str, ffprobe_path: str = 'ffprobe') -> Dict:
+    """probe_media with ffprobe run from the event loop"""
+    try:
+        result = await run_process_async(build_probe_cmd(source, ffprobe_path), check=True)
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors='replace')
+        print(f"Error probing video: {stderr}")
+        raise Exception(f"Failed to probe video: {stderr}")
+    return parse_probe(result.stdout)
+
+
+def build_keyframes_cmd(source: str, ffprobe_path: str = 'ffprobe',
+                        start: Optional[float] = None, end: Optional[float] = None) -> List[str]:
+    """ffprobe command listing the video packets with their flags, without decoding them"""
+    cmd = [
+        ffprobe_path, '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0'
+    ]
+    if start is not None:
+        # Only the packets from the keyframe before start on are read, which matters for URLs
+        cmd += ['-read_intervals', f'{start:.3f}%' + (f'{end:.3f}' if end is not None else '')]
+    return cmd + [source]
+
+
+def parse_keyframes(output: str | bytes) -> List[float]:
+    """Sorted keyframe timestamps from the output of build_keyframes_cmd"""
+    if isinstance(output, bytes):
+        output = output.decode(errors='replace')
+    keyframes = set()
+    for line in output.splitlines():
+        pts, _, flags = line.strip().partition(',')
+        if flags.startswith('K') and pts not in ('', 'N/A'):
+            keyframes.add(float(pts))
+    return sorted(keyframes)
+
+
+def probe_keyframes(source: str, ffprobe_path: str = 'ffprobe',
+                    start: Optional[float] = None, end: Optional[float] = None) -> List[float]:
+    """Timestamps of the keyframes of a video, optionally only around [start, end]"""
+    try:
+        result = run_process(build_keyframes_cmd(source, ffprobe_path, start, end),
+                             capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error probing keyframes: {e.stderr}")
+        raise Exception(f"Failed to probe keyframes: {e.stderr}")
+    return parse_keyframes(result.stdout)
+
+
+class RejectedVideo(Exception):
+    """Video that cannot produce a result, found out before paying for the work"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def check_media(probe: Dict, min_duration: float, require_audio: bool = True,
+                video_codecs: Sequence[str] = (), audio_codecs: Sequence[str] = ()):
+    """Raise RejectedVideo if the probed video is too short, silent or uses an unsupported codec"""
+    duration = probe['duration']
+    if duration < min_duration:
+        raise RejectedVideo(
+            'duration',
+            f'Video duration ({duration:.1f}s) is less than minimum required duration ({min_duration}s)'
+        )
+    if not probe.get('video_codec'):
+        raise RejectedVideo('codec', 'Video has no video stream')
+    if video_codecs and probe['video_codec'] not in video_codecs:
+        raise RejectedVideo('codec', f"Unsupported video codec: {probe['video_codec']}")
+    if require_audio and not probe.get('has_audio'):
+        raise RejectedVideo('no_audio', 'Video has no audio stream')
+    if audio_codecs and probe.get('has_audio') and probe['audio_codec'] not in audio_codecs:
+        raise RejectedVideo('codec', f"Unsupported audio codec: {probe['audio_codec']}")
+
+
+class MediaContext:
+    """What is known about one job's video, shared by every stage of the pipeline.
+
+    Filled in as the job goes: validation headers first, then the media
+    fingerprint, the local copy (or stream URL) and the probe result.
+    """
+
+    def __init__(self, url: str, headers=None):
+        self.url = url
+        self.headers = headers or {}
+        self.fingerprint: Optional[str] = None
+        self.path: Optional[str] = None
+        self.stream = False
+        self.probe: Optional[Dict] = None
+
+    @property
+    def duration(self) -> float:
+        return self.probe['duration']
+
+    @property
+    def content_length(self) -> int:
+        return int(self.headers.get('content-length', 0))
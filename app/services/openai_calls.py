@@ -0,0 +1,174 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+import weakref
+
+import openai
+
+from ..core.config import get_settings
+from ..core.metrics import count_event
+from ..core.redis_client import RateLimiter
+
+settings = get_settings()
+
+# Client-side cap on concurrent OpenAI requests from one worker process
+_concurrency = threading.BoundedSemaphore(settings.OPENAI_MAX_CONCURRENCY)
+# The same cap for requests made from an event loop, one semaphore per loop
+_async_concurrency = weakref.WeakKeyDictionary()
+
+
+def rate_limits(endpoint: str) -> dict:
+    """Per-minute account limits {bucket: limit} of an endpoint, 0 disables a bucket"""
+    if endpoint == 'audio':
+        return {'requests': settings.OPENAI_AUDIO_RPM}
+    return {'requests': settings.OPENAI_CHAT_RPM, 'tokens': settings.OPENAI_CHAT_TPM}
+
+
+def estimate_tokens(text: str, image_tokens: int = 0, max_tokens: int = 0) -> int:
+    """Rough token cost of a chat request as OpenAI counts it against TPM (max_tokens included)"""
+    return len(text) // 4 + image_tokens + max_tokens
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 408, 409, 5xx, timeouts and connection errors are worth retrying"""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds the server asked us to wait (retry-after-ms or retry-after), None if not given"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP date form
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(retries: int) -> float:
+    """Exponential backoff with jitter for the given number of previous attempts"""
+    delay = min(settings.OPENAI_RETRY_BACKOFF * (2 ** retries), settings.OPENAI_RETRY_BACKOFF_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def capacity_wait(endpoint: str, tokens: int = 0) -> float:
+    """Take one request of `tokens` tokens from the shared buckets of endpoint, or return seconds to wait"""
+    buckets = {
+        bucket: (limit, tokens if bucket == 'tokens' else 1)
+        for bucket, limit in rate_limits(endpoint).items()
+    }
+    return RateLimiter.acquire(f"openai:{endpoint}", buckets)
+
+
+def wait_for_capacity(endpoint: str, tokens: int = 0):
+    """Block until the shared buckets of endpoint allow one more request of `tokens` tokens"""
+    if not settings.OPENAI_RATE_LIMIT_ENABLED:
+        return
+    deadline = time.monotonic() + settings.OPENAI_RATE_LIMIT_MAX_WAIT
+    throttled = False
+    while True:
+        wait = capacity_wait(endpoint, tokens)
+        if wait <= 0:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # Better to try and get a 429 than to wait forever on a miscounted bucket
+            logging.warning(f"OpenAI {endpoint} rate limit wait exceeded, sending anyway")
+            break
+        throttled = True
+        # Small jitter so waiting workers do not all wake at the same moment
+        time.sleep(min(wait, remaining) + random.uniform(0, 0.05))
+    if throttled:
+        count_event('openai', 'throttled')
+
+
+def failure_delay(endpoint: str, error: Exception, retries: int) -> float | None:
+    """Seconds to wait before retrying a failed request, None to give up"""
+    if not is_retryable(error) or retries >= settings.OPENAI_MAX_RETRIES:
+        count_event('openai', 'failed')
+        return None
+    delay = retry_delay(retries)
+    server_delay = retry_after(error)
+    if server_delay is not None:
+        delay = max(delay, min(server_delay, settings.OPENAI_RETRY_BACKOFF_MAX))
+    if getattr(error, 'status_code', None) == 429 and settings.OPENAI_RATE_LIMIT_ENABLED:
+        RateLimiter.pause(f"openai:{endpoint}", delay)
+    count_event('openai', 'retried')
+    logging.warning(f"OpenAI {endpoint} request failed ({error}), retry {retries + 1} in {delay:.1f}s")
+    return delay
+
+
+def call_openai(endpoint: str, request, tokens: int = 0):
+    """Run request() under the shared rate limit and the per-process concurrency cap.
+
+    Transient errors are retried with exponential backoff and jitter, waiting
+    at least as long as Retry-After says; a 429 also pauses the endpoint for
+    every worker so they do not all retry at once.
+    """
+    retries = 0
+    while True:
+        wait_for_capacity(endpoint, tokens)
+        try:
+            with _concurrency:
+                return request()
+        except Exception as e:
+            delay = failure_delay(endpoint, e, retries)
+            if delay is None:
+                raise
+            retries += 1
+            time.sleep(delay)
+
+
+async def wait_for_capacity_async(endpoint: str, tokens: int = 0):
+    """wait_for_capacity that sleeps without blocking the event loop"""
+    if not settings.OPENAI_RATE_LIMIT_ENABLED:
+        return
+    deadline = time.monotonic() + settings.OPENAI_RATE_LIMIT_MAX_WAIT
+    throttled = False
+    while True:
+        wait = await asyncio.to_thread(capacity_wait, endpoint, tokens)
+        if wait <= 0:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logging.warning(f"OpenAI {endpoint} rate limit wait exceeded, sending anyway")
+            break
+        throttled = True
+        await asyncio.sleep(min(wait, remaining) + random.uniform(0, 0.05))
+    if throttled:
+        await asyncio.to_thread(count_event, 'openai', 'throttled')
+
+
+async def call_openai_async(endpoint: str, request, tokens: int = 0):
+    """call_openai for a coroutine function: same rate limit, cap and retries, awaited on the event loop"""
+    loop = asyncio.get_running_loop()
+    concurrency = _async_concurrency.get(loop)
+    if concurrency is None:
+        concurrency = _async_concurrency[loop] = asyncio.BoundedSemaphore(settings.OPENAI_MAX_CONCURRENCY)
+    retries = 0
+    while True:
+        await wait_for_capacity_async(endpoint, tokens)
+        try:
+            async with concurrency:
+                return await request()
+        except Exception as e:
+            delay = await asyncio.to_thread(failure_delay, endpoint, e, retries)
+            if delay is None:
+                raise
+            retries += 1
+            await asyncio.sleep(delay)
@@ -1,229 +1,386 @@
+import base64
+import io
 import os
 import subprocess
-import base64
-from typing import List, Dict, Optional
-import tempfile
+from functools import lru_cache
+from typing import Callable, List, Dict, Optional, Sequence, TypeVar
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from PIL import Image
-import io
 import hashlib
-from openai import OpenAI
 from ..core.config import get_settings
-from ..core.redis_client import Cache
+from ..core.http_clients import get_http_session, get_openai_client
+from ..core.metrics import JobMetrics, add_bytes, count_event, run_process
+from ..core.redis_client import ArtifactStore, Cache, JobEvents, MediaCache, SingleFlight, StageCache
+from ..core.scratch import ScratchSpace
+from .audio import audio_extension, extract_audio, plan_chunks, speech_seconds, split_audio, stitch_transcripts
+from .contact_sheet import (build_contact_sheets, format_timestamp, image_tokens, plan_contact_sheets,
+                            sheet_frame_count, spread_timestamps, token_budget)
+from .downloader import download_to_file, fetch_container_header, sample_fingerprint, supports_streaming
+from .frame_extractor import (decode_frames, extract_frames, frame_timestamps, image_mime, pack_frames,
+                              snap_to_keyframes, unique_frames, unpack_frames)
+from .keyframes import scene_timestamps
+from .media import MediaContext, RejectedVideo, check_media, probe_keyframes, probe_media
+from .openai_calls import call_openai, estimate_tokens
 import logging
 
 settings = get_settings()
 
+T = TypeVar('T')
+
+DEFAULT_SYSTEM_PROMPT = """As a video Assistant, your goal is to describe a video with a focus on context that will be useful for bloggers, noting details that can be used as ideas for content: Plot, Key points, Atmosphere, Style, Visual look, Gestures, or anything else that could attract attention.
+
+Also describe what exactly is happening in the video: The place depicted, the actions performed by people or objects, their interaction."""
+
+SEGMENT_PROMPT = """You are watching one segment ({start} - {end}) of a longer video. Summarize it briefly and factually: the place, the people and objects, what they do and say, key points, atmosphere and visual style. The summaries of all segments will be merged into one description of the whole video, so do not introduce or conclude."""
+
+
+@lru_cache(maxsize=None)
+def find_ffmpeg() -> tuple[str, str]:
+    """Get ffmpeg and ffprobe paths, resolved once per process"""
+    # Try common locations
+    common_paths = [
+        '/usr/bin',  # Most common on Linux
+        '/usr/local/bin',
+        '/opt/homebrew/bin',
+        '/usr/local/opt/ffmpeg/bin',
+        '/bin',
+        '/snap/bin'  # For Ubuntu with snap
+    ]
+
+    # First try exact paths we know work
+    for path in common_paths:
+        ffmpeg_candidate = os.path.join(path, 'ffmpeg')
+        ffprobe_candidate = os.path.join(path, 'ffprobe')
+
+        if os.path.exists(ffmpeg_candidate) and os.access(ffmpeg_candidate, os.X_OK) and \
+           os.path.exists(ffprobe_candidate) and os.access(ffprobe_candidate, os.X_OK):
+            print(f"Found ffmpeg at {ffmpeg_candidate} and ffprobe at {ffprobe_candidate}")
+            return ffmpeg_candidate, ffprobe_candidate
+
+    # If exact paths didn't work, try which command
+    try:
+        ffmpeg_path = subprocess.run(['which', 'ffmpeg'], capture_output=True, text=True).stdout.strip()
+        ffprobe_path = subprocess.run(['which', 'ffprobe'], capture_output=True, text=True).stdout.strip()
+        if ffmpeg_path and ffprobe_path and \
+           os.path.exists(ffmpeg_path) and os.access(ffmpeg_path, os.X_OK) and \
+           os.path.exists(ffprobe_path) and os.access(ffprobe_path, os.X_OK):
+            print(f"Found ffmpeg at {ffmpeg_path} and ffprobe at {ffprobe_path}")
+            return ffmpeg_path, ffprobe_path
+    except Exception as e:
+        print(f"Error finding ffmpeg in PATH: {e}")
+
+    # If we get here, we couldn't find the executables
+    error_msg = "FFmpeg/FFprobe not found or not executable. Please install FFmpeg."
+    print(error_msg)
+    raise Exception(error_msg)
+
+
 class VideoProcessor:
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.temp_dir = tempfile.mkdtemp()
+    def __init__(self, job_id: Optional[str] = None):
+        # Progress events are published for the job when given
+        self.job_id = job_id
+        self.client = get_openai_client()
+        # Created on first use, so jobs answered from cache never touch the disk
+        self.scratch = ScratchSpace()
         self.cache = Cache()
+        self.media_cache = MediaCache()
+        self.stage_cache = StageCache()
+        self.single_flight = SingleFlight()
+        self.artifacts = ArtifactStore()
+        self.metrics = JobMetrics()
 
-    def _cleanup(self, *files):
-        """Clean up temporary files"""
-        for file in files:
-            try:
-                if file and os.path.exists(file):
-                    os.remove(file)
-            except Exception as e:
-                print(f"Error removing file {file}: {e}")
-        try:
-            if os.path.exists(self.temp_dir):
-                os.rmdir(self.temp_dir)
-        except Exception as e:
-            print(f"Error removing temp dir {self.temp_dir}: {e}")
+    def __enter__(self):
+        return self
 
-    def _validate_video(self, url: str) -> tuple[bool, str]:
-        """Validate video before downloading"""
+    def __exit__(self, *exc):
+        self._cleanup()
+        return False
+
+    def _progress(self, stage: str, **fields):
+        """Publish a stage progress event of the job"""
+        JobEvents.publish(self.job_id, {'event': 'stage', 'stage': stage, **fields})
+
+    def _cleanup(self):
+        """Remove the job's scratch directory with everything left in it"""
+        self.scratch.cleanup()
+
+    def _validate_video(self, url: str) -> tuple[bool, str, dict]:
+        """Validate video before downloading, returns (is_valid, error, response headers)"""
         try:
             # Send HEAD request to get content info
-            response = requests.head(url, timeout=settings.REQUEST_TIMEOUT, allow_redirects=True)
+            with self.metrics.stage('head'):
+                response = get_http_session().head(url, timeout=settings.REQUEST_TIMEOUT, allow_redirects=True)
             response.raise_for_status()
-            
-            # Check content type
-            content_type = response.headers.get('content-type', '').lower()
-            if not any(format in content_type for format in settings.ALLOWED_VIDEO_FORMATS):
-                return False, f"Invalid video format. Allowed formats: {', '.join(settings.ALLOWED_VIDEO_FORMATS)}"
-            
-            # Check file size
-            content_length = int(response.headers.get('content-length', 0))
-            if content_length > settings.MAX_VIDEO_SIZE:
-                return False, f"Video size ({content_length / 1024 / 1024:.1f}MB) exceeds maximum allowed size ({settings.MAX_VIDEO_SIZE / 1024 / 1024:.1f}MB)"
-            
-            return True, ""
+            error = self._validation_error(response.headers)
+            return not error, error, response.headers
         except requests.RequestException as e:
-            return False, f"Error validating video: {str(e)}"
+            return False, f"Error validating video: {str(e)}", {}
 
-    def _download_video(self, video_url: str) -> str:
-        """Download video and return path"""
-        # Validate video first
-        is_valid, error_message = self._validate_video(video_url)
-        if not is_valid:
-            raise ValueError(error_message)
-            
-        video_path = os.path.join(self.temp_dir, 'video.mp4')
-        
-        # Download with progress tracking and timeout
-        with requests.get(video_url, stream=True, timeout=settings.REQUEST_TIMEOUT) as response:
-            response.raise_for_status()
-            total_size = int(response.headers.get('content-length', 0))
-            block_size = 8192
-            downloaded_size = 0
-            
-            with open(video_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=block_size):
-                    if chunk:
-                        downloaded_size += len(chunk)
-                        f.write(chunk)
-                        # Check size during download
-                        if downloaded_size > settings.MAX_VIDEO_SIZE:
-                            os.remove(video_path)
-                            raise ValueError(f"Video size exceeds maximum allowed size ({settings.MAX_VIDEO_SIZE / 1024 / 1024:.1f}MB)")
-                            
-        return video_path
+    def _validation_error(self, headers) -> str:
+        """Why the HEAD response headers rule the video out, empty if they do not"""
+        # Check content type
+        content_type = headers.get('content-type', '').lower()
+        if not any(format in content_type for format in settings.ALLOWED_VIDEO_FORMATS):
+            return f"Invalid video format. Allowed formats: {', '.join(settings.ALLOWED_VIDEO_FORMATS)}"
+
+        # Check file size
+        content_length = int(headers.get('content-length', 0))
+        if content_length > settings.MAX_VIDEO_SIZE:
+            return f"Video size ({content_length / 1024 / 1024:.1f}MB) exceeds maximum allowed size ({settings.MAX_VIDEO_SIZE / 1024 / 1024:.1f}MB)"
+        return ""
+
+    def _download_video(self, video_url: str, content_length: int = 0) -> tuple[str, str]:
+        """Download a validated video and return (path, sha256 fingerprint of its bytes)"""
+        # Fails before any byte is fetched if the scratch space cannot hold the video
+        scratch_dir = self.scratch.reserve(content_length or settings.MAX_VIDEO_SIZE)
+        # Size is enforced again while downloading, no second HEAD request needed
+        video_path = os.path.join(scratch_dir, 'video.mp4')
+        with self.metrics.stage('download'):
+            _, fingerprint = download_to_file(
+                video_url, video_path, settings.MAX_VIDEO_SIZE,
+                chunk_size=settings.DOWNLOAD_CHUNK_SIZE, timeout=settings.REQUEST_TIMEOUT
+            )
+        return video_path, fingerprint
 
     def _get_ffmpeg_path(self) -> tuple[str, str]:
         """Get ffmpeg and ffprobe paths"""
-        # Try common locations
-        common_paths = [
-            '/usr/bin',  # Most common on Linux
-            '/usr/local/bin',
-            '/opt/homebrew/bin',
-            '/usr/local/opt/ffmpeg/bin',
-            '/bin',
-            '/snap/bin'  # For Ubuntu with snap
-        ]
-        
-        # First try exact paths we know work
-        for path in common_paths:
-            ffmpeg_candidate = os.path.join(path, 'ffmpeg')
-            ffprobe_candidate = os.path.join(path, 'ffprobe')
-            
-            if os.path.exists(ffmpeg_candidate) and os.access(ffmpeg_candidate, os.X_OK) and \
-               os.path.exists(ffprobe_candidate) and os.access(ffprobe_candidate, os.X_OK):
-                print(f"Found ffmpeg at {ffmpeg_candidate} and ffprobe at {ffprobe_candidate}")
-                return ffmpeg_candidate, ffprobe_candidate
-        
-        # If exact paths didn't work, try which command
-        try:
-            ffmpeg_path = subprocess.run(['which', 'ffmpeg'], capture_output=True, text=True).stdout.strip()
-            ffprobe_path = subprocess.run(['which', 'ffprobe'], capture_output=True, text=True).stdout.strip()
-            if ffmpeg_path and ffprobe_path and \
-               os.path.exists(ffmpeg_path) and os.access(ffmpeg_path, os.X_OK) and \
-               os.path.exists(ffprobe_path) and os.access(ffprobe_path, os.X_OK):
-                print(f"Found ffmpeg at {ffmpeg_path} and ffprobe at {ffprobe_path}")
-                return ffmpeg_path, ffprobe_path
-        except Exception as e:
-            print(f"Error finding ffmpeg in PATH: {e}")
-        
-        # If we get here, we couldn't find the executables
-        error_msg = "FFmpeg/FFprobe not found or not executable. Please install FFmpeg."
-        print(error_msg)
-        raise Exception(error_msg)
-
-    def _extract_frames(self, video_path: str, max_frames: int = 8, ffmpeg_path: str = 'ffmpeg') -> List[str]:
-        """Extract frames and return list of base64 encoded images"""
-        # Get video duration using ffprobe path
-        ffmpeg_path, ffprobe_path = self._get_ffmpeg_path()  # Get both paths
-        duration_cmd = [
-            ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1', video_path
-        ]
-        try:
-            result = subprocess.run(duration_cmd, capture_output=True, text=True, check=True)
-            duration = float(result.stdout.strip())
-        except subprocess.CalledProcessError as e:
-            print(f"Error getting duration: {e.stderr}")
-            raise Exception(f"Failed to get video duration: {e.stderr}")
-        
-        # Calculate frame interval
-        if duration <= 30:
-            interval = 5
-        elif duration <= 60:
-            interval = 10
-        else:
-            interval = 20
-            
-        # Calculate number of frames
-        num_frames = min(max_frames, int(duration / interval))
-        if num_frames == 0:
-            num_frames = 1
-            
-        frames = []
-        for i in range(num_frames):
-            timestamp = i * interval
-            if timestamp >= duration:
-                break
-                
-            # Extract frame using ffmpeg path
-            frame_path = os.path.join(self.temp_dir, f'frame_{i}.jpg')
-            extract_cmd = [
-                ffmpeg_path, '-ss', str(timestamp), '-i', video_path,
-                '-vframes', '1', '-q:v', '2', frame_path
-            ]
-            try:
-                subprocess.run(extract_cmd, capture_output=True, text=True, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error extracting frame: {e.stderr}")
-                raise Exception(f"Failed to extract frame: {e.stderr}")
-            
-            # Convert to base64
-            try:
-                with Image.open(frame_path) as img:
-                    # Resize if needed
-                    if img.size[0] > 800 or img.size[1] > 800:
-                        img.thumbnail((800, 800))
-                        
-                    # Convert to JPEG and optimize
-                    buffer = io.BytesIO()
-                    img.save(buffer, format='JPEG', quality=70, optimize=True)
-                    img_str = base64.b64encode(buffer.getvalue()).decode()
-                    frames.append(img_str)
-            except Exception as e:
-                print(f"Error processing frame: {e}")
-                raise
-            finally:
-                # Cleanup frame
-                if os.path.exists(frame_path):
-                    try:
-                        os.remove(frame_path)
-                    except Exception as e:
-                        print(f"Error removing frame: {e}")
-            
-        return frames
+        return find_ffmpeg()
+
+    def _frame_timestamps(self, video_path: str, duration: float, max_frames: int, ffmpeg_path: str) -> List[float]:
+        """Choose frame timestamps according to FRAME_SELECTION_MODE"""
+        if settings.FRAME_SELECTION_MODE == 'scene':
+            timestamps = scene_timestamps(video_path, max_frames, ffmpeg_path, settings.FRAME_HASH_THRESHOLD)
+            if timestamps:
+                return timestamps
+            # Too few keyframes to compare, fall back to fixed intervals
+
+        return frame_timestamps(
+            duration, max_frames,
+            short_threshold=settings.SHORT_VIDEO_THRESHOLD,
+            medium_threshold=settings.MEDIUM_VIDEO_THRESHOLD,
+            short_interval=settings.SHORT_VIDEO_INTERVAL,
+            medium_interval=settings.MEDIUM_VIDEO_INTERVAL,
+            long_interval=settings.LONG_VIDEO_INTERVAL
+        )
+
+    def _seek_timestamps(self, video_path: str, timestamps: Sequence[float],
+                         start: Optional[float] = None, end: Optional[float] = None) -> List[float]:
+        """Timestamps to extract; with keyframe seek, the distinct keyframes nearest to them"""
+        if settings.FRAME_ACCURATE_SEEK:
+            return list(timestamps)
+        _, ffprobe_path = self._get_ffmpeg_path()
+        return snap_to_keyframes(timestamps, probe_keyframes(video_path, ffprobe_path, start, end))
+
+    def _frames_variant(self) -> str:
+        """Stage cache variant for frames, changes whenever frame selection or encoding settings do"""
+        variant = (f"{settings.FRAME_SELECTION_MODE}:{settings.MAX_FRAMES}:"
+                   f"{settings.MAX_IMAGE_SIZE}:{settings.FRAME_FORMAT}:{settings.JPEG_QUALITY}:"
+                   f"{'exact' if settings.FRAME_ACCURATE_SEEK else 'key'}")
+        if settings.FRAME_PACKING == 'contact_sheet':
+            variant += (f":sheet:{settings.CONTACT_SHEET_FRAME_INTERVAL}:{settings.CONTACT_SHEET_MAX_FRAMES}:"
+                        f"{settings.CONTACT_SHEET_TOKENS_PER_MINUTE}:{settings.CONTACT_SHEET_MIN_TOKENS}:"
+                        f"{settings.CONTACT_SHEET_MAX_TOKENS}:{settings.CONTACT_SHEET_MIN_CELL}")
+        return variant
+
+    def _extract_frames(self, video_path: str, duration: float, max_frames: int = 8,
+                        ffmpeg_path: str = 'ffmpeg') -> List[bytes]:
+        """Extract frames and return list of encoded images"""
+        if settings.FRAME_PACKING == 'contact_sheet':
+            return self._extract_contact_sheets(video_path, duration, ffmpeg_path)
+
+        # Decode the video once and pick all target frames in a single ffmpeg pass
+        timestamps = self._frame_timestamps(video_path, duration, max_frames, ffmpeg_path)
+        timestamps = self._seek_timestamps(video_path, timestamps)
+        frames = extract_frames(
+            video_path, timestamps, ffmpeg_path,
+            max_size=settings.MAX_IMAGE_SIZE,
+            quality=settings.JPEG_QUALITY,
+            accurate_seek=settings.FRAME_ACCURATE_SEEK,
+            image_format=settings.FRAME_FORMAT
+        )
+        return unique_frames(frames, timestamps)[0]
+
+    def _extract_contact_sheets(self, video_path: str, duration: float, ffmpeg_path: str = 'ffmpeg') -> List[bytes]:
+        """Tile frames into contact sheets sized to the image token budget of the video"""
+        budget = token_budget(duration, settings.CONTACT_SHEET_TOKENS_PER_MINUTE,
+                              settings.CONTACT_SHEET_MIN_TOKENS, settings.CONTACT_SHEET_MAX_TOKENS)
+        count = sheet_frame_count(duration, settings.CONTACT_SHEET_FRAME_INTERVAL, settings.CONTACT_SHEET_MAX_FRAMES)
+        plan = plan_contact_sheets(count, budget, settings.CONTACT_SHEET_MIN_CELL)
+
+        timestamps = None
+        if settings.FRAME_SELECTION_MODE == 'scene':
+            timestamps = scene_timestamps(video_path, plan['frames'], ffmpeg_path, settings.FRAME_HASH_THRESHOLD)
+        # Sheets are about coverage, so frames are spread over the whole video
+        timestamps = self._seek_timestamps(video_path, timestamps or spread_timestamps(duration, plan['frames']))
+
+        # ffmpeg scales every frame straight to the tile size
+        tiles = decode_frames(
+            video_path, timestamps,
+            lambda width, height, data: Image.frombuffer("RGB", (width, height), data, "raw", "RGB", 0, 1),
+            ffmpeg_path, plan['cell'], settings.FRAME_ACCURATE_SEEK
+        )
+        tiles, timestamps = unique_frames(tiles, timestamps, key=Image.Image.tobytes)
+        logging.info(f"Contact sheets: {len(tiles)} frames on {plan['sheets']} {plan['grid']}x{plan['grid']} "
+                     f"sheets of {plan['cell']}px tiles, ~{plan['tokens']} image tokens (budget {budget})")
+        return build_contact_sheets(tiles, timestamps, plan, settings.JPEG_QUALITY, settings.FRAME_FORMAT)
+
+    def _image_detail(self, image: bytes, sheets: bool) -> tuple[str, int]:
+        """Vision detail and estimated tokens of an image; contact sheets over 512px need "high" to stay legible"""
+        if not sheets:
+            return "low", image_tokens(0, 0, "low")
+        with Image.open(io.BytesIO(image)) as img:
+            detail = "high" if max(img.size) > 512 else "low"
+            return detail, image_tokens(*img.size, detail)
+
+    def _audio_profile(self) -> Dict:
+        """Audio encoding profile from settings"""
+        return {
+            'codec': settings.AUDIO_CODEC,
+            'bitrate': settings.AUDIO_BITRATE,
+            'sample_rate': settings.AUDIO_SAMPLE_RATE,
+            'channels': settings.AUDIO_CHANNELS,
+            'max_duration': settings.AUDIO_MAX_DURATION,
+            'trim_silence': settings.AUDIO_TRIM_SILENCE,
+        }
+
+    def _audio_path(self) -> str:
+        return os.path.join(self.scratch.path, f"audio.{audio_extension(settings.AUDIO_CODEC)}")
 
     def _extract_audio(self, video_path: str, ffmpeg_path: str = 'ffmpeg') -> str:
-        """Extract audio and return path"""
-        ffmpeg_path, _ = self._get_ffmpeg_path()  # Get ffmpeg path
-        audio_path = os.path.join(self.temp_dir, 'audio.mp3')
-        extract_cmd = [
-            ffmpeg_path, '-i', video_path, '-q:a', '0', '-map', 'a', audio_path
-        ]
+        """Extract compact mono audio for transcription and return path"""
+        return extract_audio(video_path, self._audio_path(), ffmpeg_path, **self._audio_profile())
+
+    def _transcribe_file(self, audio_path: str, with_segments: bool = False):
+        """Send one audio file to Whisper"""
+        def request():
+            # Reopened on every attempt, a retried upload must start from the first byte
+            with open(audio_path, "rb") as audio_file:
+                return self.client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_file,
+                    language="en",  # Явно вказуємо англійську мову
+                    **({'response_format': 'verbose_json'} if with_segments else {})
+                )
+
+        with self.metrics.stage('whisper'):
+            add_bytes(os.path.getsize(audio_path))
+            return call_openai('audio', request)
+
+    def _transcription_chunks(self, audio_path: str, duration: Optional[float] = None) -> List[tuple]:
+        """Check the audio for speech and plan the (start, length) chunks it is transcribed in"""
+        if settings.VAD_ENABLED:
+            self._check_speech(audio_path)
+        if duration is None or duration > settings.AUDIO_CHUNK_DURATION \
+                or os.path.getsize(audio_path) > settings.AUDIO_MAX_UPLOAD_BYTES:
+            _, ffprobe_path = self._get_ffmpeg_path()
+            duration = self._get_duration(audio_path, ffprobe_path)
+            # Keep every chunk under the upload limit as well as under the chunk duration
+            bytes_per_second = os.path.getsize(audio_path) / max(duration, 1.0)
+            chunk_duration = min(settings.AUDIO_CHUNK_DURATION,
+                                 settings.AUDIO_MAX_UPLOAD_BYTES / max(bytes_per_second, 1.0))
+            return plan_chunks(duration, chunk_duration, settings.AUDIO_CHUNK_OVERLAP)
+        return [(0.0, duration)]
+
+    def _get_transcription(self, audio_path: str, duration: Optional[float] = None) -> str:
+        """Get audio transcription, splitting long audio into chunks transcribed in parallel"""
+        chunks = self._transcription_chunks(audio_path, duration)
+        if len(chunks) == 1:
+            return self._transcribe_file(audio_path).text
+
+        ffmpeg_path, _ = self._get_ffmpeg_path()
+        chunk_paths = split_audio(audio_path, chunks, ffmpeg_path)
         try:
-            subprocess.run(extract_cmd, capture_output=True, text=True, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error extracting audio: {e.stderr}")
-            raise Exception(f"Failed to extract audio: {e.stderr}")
-        return audio_path
-
-    def _get_transcription(self, audio_path: str) -> str:
-        """Get audio transcription"""
-        with open(audio_path, "rb") as audio_file:
-            transcription = self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="en"  # Явно вказуємо англійську мову
-            )
-        return transcription.text
+            with ThreadPoolExecutor(max_workers=settings.TRANSCRIPTION_CONCURRENCY) as executor:
+                responses = list(executor.map(lambda path: self._transcribe_file(path, with_segments=True), chunk_paths))
+        finally:
+            for chunk_path in chunk_paths:
+                if os.path.exists(chunk_path):
+                    os.remove(chunk_path)
+
+        return stitch_transcripts([
+            (start, getattr(response, 'segments', None), response.text)
+            for (start, _), response in zip(chunks, responses)
+        ])
 
-    def _get_description(self, frames: List[str], transcription: str, system_prompt: Optional[str] = None) -> str:
+    def _stream_chat(self, messages: List[Dict], max_tokens: int) -> str:
+        """Streamed chat completion, tokens are published as progress events while they arrive"""
+        parts = []
+        pending = []
+        sent = time.monotonic()
+        stream = self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                pending.append(delta)
+            # Tokens are batched, one Redis round trip per token would cost more than the token
+            if pending and time.monotonic() - sent >= settings.PROGRESS_TOKEN_INTERVAL:
+                JobEvents.publish(self.job_id, {'event': 'tokens', 'text': ''.join(pending)})
+                pending = []
+                sent = time.monotonic()
+        if pending:
+            JobEvents.publish(self.job_id, {'event': 'tokens', 'text': ''.join(pending)})
+        return ''.join(parts)
+
+    def _chat(self, messages: List[Dict], request_bytes: int, tokens: int, max_tokens: int = 2048) -> str:
+        """Send a chat completion and return its text, streamed to the job's subscribers if it has any"""
+        streamed = bool(self.job_id) and settings.PROGRESS_ENABLED and settings.PROGRESS_STREAM_TOKENS
+        attempts = 0
+
+        def request() -> str:
+            nonlocal attempts
+            attempts += 1
+            if not streamed:
+                response = self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=max_tokens
+                )
+                return response.choices[0].message.content
+            if attempts > 1:
+                # Subscribers drop the tokens of the failed attempt
+                JobEvents.publish(self.job_id, {'event': 'tokens_reset'})
+            return self._stream_chat(messages, max_tokens)
+
+        try:
+            with self.metrics.stage('gpt'):
+                add_bytes(request_bytes)
+                return call_openai('chat', request, tokens)
+        except Exception as e:
+            logging.error(f"Error getting description from OpenAI: {str(e)}")
+            raise Exception(f"Error code: {getattr(e, 'status_code', 'unknown')} - {str(e)}")
+
+    def _get_description(self, frames: Sequence[bytes], transcription: str, system_prompt: Optional[str] = None,
+                         sheets: Optional[bool] = None, max_tokens: int = 2048) -> str:
         """Get video description using OpenAI"""
-        
+        messages, request_bytes, tokens = self._description_request(frames, transcription, system_prompt, sheets,
+                                                                    max_tokens)
+        return self._chat(messages, request_bytes, tokens, max_tokens)
+
+    def _description_request(self, frames: Sequence[bytes], transcription: str, system_prompt: Optional[str] = None,
+                             sheets: Optional[bool] = None, max_tokens: int = 2048) -> tuple[List[Dict], int, int]:
+        """Chat messages of a description request with its size in bytes and estimated tokens"""
         if system_prompt is None:
-            system_prompt = """As a video Assistant, your goal is to describe a video with a focus on context that will be useful for bloggers, noting details that can be used as ideas for content: Plot, Key points, Atmosphere, Style, Visual look, Gestures, or anything else that could attract attention.
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+        if sheets is None:
+            sheets = settings.FRAME_PACKING == 'contact_sheet'
 
-Also describe what exactly is happening in the video: The place depicted, the actions performed by people or objects, their interaction."""
+        # Frames stay raw bytes until here; base64 is only built for the request body
+        mime = image_mime(settings.FRAME_FORMAT)
+        frame_urls = [f"data:{mime};base64,{base64.b64encode(frame).decode()}" for frame in frames]
+        details = [self._image_detail(frame, sheets) for frame in frames]
+        frames_intro = ("And here are contact sheets of frames from the video, in time order "
+                        "(left to right, top to bottom), each frame labelled with its timestamp:"
+                        if sheets else "And here are the frames from the video:")
 
         messages = [
             {
@@ -235,111 +392,513 @@ Also describe what exactly is happening in the video: The place depicted, the ac
                 "content": [
                     "Here is the audio transcription from the video:",
                     transcription,
-                    "And here are the frames from the video:",
+                    frames_intro,
                     *[{
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{frame}",
-                            "detail": "low"
+                            "url": url,
+                            "detail": detail
                         }
-                    } for frame in frames]
+                    } for url, (detail, _) in zip(frame_urls, details)]
                 ]
             }
         ]
 
+        # Request size is dominated by the base64 frames
+        request_bytes = len(system_prompt) + len(transcription) + sum(len(url) for url in frame_urls)
+        tokens = estimate_tokens(system_prompt + transcription, sum(cost for _, cost in details), max_tokens)
+        return messages, request_bytes, tokens
+
+    def _get_duration(self, video_path: str, ffprobe_path: str = 'ffprobe') -> float:
+        """Get video duration in seconds"""
+        duration_cmd = [
+            ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1', video_path
+        ]
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=2048
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logging.error(f"Error getting description from OpenAI: {str(e)}")
-            raise Exception(f"Error code: {getattr(e, 'status_code', 'unknown')} - {str(e)}")
+            result = run_process(duration_cmd, capture_output=True, text=True, check=True)
+            return float(result.stdout.strip())
+        except subprocess.CalledProcessError as e:
+            print(f"Error getting duration: {e.stderr}")
+            raise Exception(f"Failed to get video duration: {e.stderr}")
+
+    def _run_stage(self, stage: str, fingerprint: str, compute, variant: Optional[str] = None):
+        """Return stage output from the stage cache, or compute and cache it"""
+        with self.metrics.stage(stage):
+            if settings.CACHE_ENABLED:
+                cached = self.stage_cache.get(stage, fingerprint, variant)
+                self.metrics.cache_result(stage, cached is not None)
+                if cached is not None:
+                    return cached
+
+            value = compute()
+            if settings.CACHE_ENABLED:
+                self.stage_cache.set(stage, fingerprint, value, variant)
+            return value
+
+    def _run_frames_stage(self, fingerprint: str, extract) -> Sequence[bytes]:
+        """Return encoded frames from the stage cache, or extract and cache them"""
+        variant = self._frames_variant()
+        with self.metrics.stage('frames'):
+            if settings.CACHE_ENABLED:
+                blob = self.stage_cache.get_bytes('frames', fingerprint, variant)
+                self.metrics.cache_result('frames', bool(blob))
+                if blob:
+                    return unpack_frames(blob)
+
+            frames = extract()
+            if settings.CACHE_ENABLED:
+                self.stage_cache.set_bytes('frames', fingerprint, pack_frames(frames), variant)
+            return frames
+
+    def _audio_variant(self) -> str:
+        """Stage cache variant for audio; audio encoded with another profile is a different artifact"""
+        return hashlib.md5(repr(sorted(self._audio_profile().items())).encode()).hexdigest()[:12]
 
-    def _get_cache_key(self, video_url: str, system_prompt: Optional[str] = None) -> str:
-        """Generate unique cache key based on video URL and system prompt"""
-        key_data = f"{video_url}:{system_prompt or ''}"
-        return f"video_processing:{hashlib.md5(key_data.encode()).hexdigest()}"
+    def _transcription_variant(self) -> str:
+        """Stage cache variant for transcriptions, changes with the audio they are made from and its chunking"""
+        return (f"{self._audio_variant()}:{settings.AUDIO_CHUNK_DURATION}:{settings.AUDIO_CHUNK_OVERLAP}:"
+                f"{settings.AUDIO_MAX_UPLOAD_BYTES}")
+
+    def _run_audio_stage(self, fingerprint: str, extract) -> str:
+        """Return path to extracted audio, restoring it from the stage cache if possible"""
+        variant = self._audio_variant()
+        with self.metrics.stage('audio'):
+            if settings.CACHE_ENABLED:
+                audio_bytes = self.stage_cache.get_bytes('audio', fingerprint, variant)
+                self.metrics.cache_result('audio', bool(audio_bytes))
+                if audio_bytes:
+                    audio_path = self._audio_path()
+                    with open(audio_path, 'wb') as f:
+                        f.write(audio_bytes)
+                    return audio_path
+
+            audio_path = extract()
+            if settings.CACHE_ENABLED:
+                with open(audio_path, 'rb') as f:
+                    self.stage_cache.set_bytes('audio', fingerprint, f.read(), variant)
+            return audio_path
+
+    def _get_flight_key(self, video_url: str, headers, system_prompt: Optional[str] = None) -> str:
+        """Key identifying duplicate jobs: same media (or URL) and same prompt"""
+        media_key = self.media_cache.index_key(video_url, headers) or hashlib.md5(video_url.encode()).hexdigest()
+        prompt_variant = hashlib.md5((system_prompt or '').encode()).hexdigest()
+        return f"{media_key}:{prompt_variant}"
+
+    def _get_cached_result(self, fingerprint: Optional[str], prompt_variant: str) -> Optional[Dict]:
+        """Final result for media + prompt from the stage cache"""
+        if not settings.CACHE_ENABLED or not fingerprint:
+            return None
+        with self.metrics.stage('description'):
+            cached_result = self.stage_cache.get('description', fingerprint, prompt_variant)
+        self.metrics.cache_result('description', bool(cached_result))
+        return cached_result
 
     def process_video(self, video_url: str, system_prompt: Optional[str] = None) -> Dict:
-        """Process video and return results"""
-        video_path = None
-        audio_path = None
-        
+        """Process video and return results, sharing the work of duplicate in-flight jobs"""
+        return self._run_job(video_url, system_prompt, self._process_validated_video)
+
+    def _run_job(self, video_url: str, system_prompt: Optional[str],
+                 run: Callable[[MediaContext, Optional[str]], Dict]) -> Dict:
+        """Cache lookup, validation and single flight around one run of a pipeline"""
+        # A repeated URL is answered from cache without any outbound request
+        prompt_variant = hashlib.md5((system_prompt or '').encode()).hexdigest()
+        if settings.CACHE_ENABLED:
+            url_fingerprint = self.media_cache.get_fingerprint(self.media_cache.url_key(video_url))
+            cached_result = self._get_cached_result(url_fingerprint, prompt_variant)
+            if cached_result:
+                return cached_result
+
+        # Validate video first
+        is_valid, error, headers = self._validate_video(video_url)
+        if not is_valid:
+            return {
+                'status': 'error',
+                'message': error
+            }
+        media = MediaContext(video_url, headers)
+
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return run(media, system_prompt)
+
+        flight_key = self._get_flight_key(video_url, headers, system_prompt)
+        token = self.single_flight.acquire(flight_key, settings.CELERY_TASK_TIME_LIMIT)
+        if token is None:
+            shared_result = self.single_flight.wait(flight_key, settings.SINGLE_FLIGHT_WAIT_TIMEOUT)
+            if shared_result is not None:
+                return shared_result
+            # Leader failed or is too slow, do the work ourselves
+            token = self.single_flight.acquire(flight_key, settings.CELERY_TASK_TIME_LIMIT)
+
+        result = None
         try:
-            # Get FFmpeg paths
-            ffmpeg_path, ffprobe_path = self._get_ffmpeg_path()
-            
-            # Validate video first
-            is_valid, error = self._validate_video(video_url)
-            if not is_valid:
-                return {
-                    'status': 'error',
-                    'message': error
-                }
+            result = run(media, system_prompt)
+            if token and result.get('status') in ('segmented', 'prepared'):
+                # Followers wait for the final result, not for the plan or the prepared state
+                result['flight'] = self._hand_off_flight(flight_key, token)
+                token = None
+            return result
+        finally:
+            if token:
+                self.single_flight.release(flight_key, token, result, settings.SINGLE_FLIGHT_RESULT_TTL)
 
-            # Check cache first
-            if settings.CACHE_ENABLED:
-                cache_key = self._get_cache_key(video_url, system_prompt)
-                cached_result = self.cache.get(cache_key)
-                if cached_result:
-                    return cached_result
+    def _hand_off_flight(self, flight_key: str, token: str) -> Dict:
+        """Keep the single-flight lock of a job continued by other tasks, released with _release_flight"""
+        # The next tasks (describe_video, or the segments then the reduce) each run under the task time limit
+        self.single_flight.extend(flight_key, token, settings.CELERY_TASK_TIME_LIMIT * 2)
+        return {'key': flight_key, 'token': token}
 
-            # Download video
-            video_path = self._download_video(video_url)
-            
-            # Get video duration
-            duration_cmd = [
-                ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1', video_path
-            ]
+    def _release_flight(self, flight: Optional[Dict], result: Optional[Dict]):
+        """Hand the final result of a job continued by other tasks to its duplicates"""
+        if flight:
+            self.single_flight.release(flight['key'], flight['token'], result, settings.SINGLE_FLIGHT_RESULT_TTL)
+
+    def _resolve_fingerprint(self, media: MediaContext):
+        """Fill in media.fingerprint (and media.stream / media.path) for a validated video"""
+        # Resolve URL to media fingerprint via HTTP validators
+        index_key = None
+        if settings.CACHE_ENABLED:
+            index_key = self.media_cache.index_key(media.url, media.headers)
+            media.fingerprint = self.media_cache.get_fingerprint(index_key) if index_key else None
+
+        # In stream mode ffmpeg reads the URL itself with range requests, so
+        # decoding overlaps the transfer and nothing is written to disk
+        media.stream = settings.VIDEO_INPUT_MODE == 'stream' and supports_streaming(media.headers)
+        if media.fingerprint is None:
+            # Segmented mode never downloads a long video, so it is fingerprinted by sampling too
+            if media.stream or (settings.SEGMENTED_ENABLED and supports_streaming(media.headers)):
+                media.fingerprint = sample_fingerprint(
+                    media.url, media.content_length, timeout=settings.REQUEST_TIMEOUT
+                )
+                media.stream = media.stream and media.fingerprint is not None
+
+            # Otherwise unknown media has to be downloaded to be fingerprinted
+            if media.fingerprint is None:
+                self._early_probe(media)
+                media.path, media.fingerprint = self._download_video(media.url, media.content_length)
+            if index_key:
+                self.media_cache.set_fingerprint(index_key, media.fingerprint, settings.CACHE_EXPIRE_TIME)
+        if settings.CACHE_ENABLED:
+            self.media_cache.set_fingerprint(self.media_cache.url_key(media.url), media.fingerprint,
+                                             settings.URL_INDEX_TTL)
+
+    def _ensure_video(self, media: MediaContext, download_lock: threading.Lock) -> str:
+        """Video input for ffmpeg; known media is downloaded only once a stage misses the cache"""
+        if media.stream:
+            return media.url
+        # Frames and audio stages may ask for the video at the same time
+        with download_lock:
+            if media.path is None:
+                media.path, _ = self._download_video(media.url, media.content_length)
+        return media.path
+
+    def _check_media(self, probe: Dict, check_duration: bool = True):
+        """Raise RejectedVideo for a video that is too short, silent or uses an unsupported codec"""
+        try:
+            check_media(probe, settings.MIN_DURATION if check_duration else 0, settings.REQUIRE_AUDIO,
+                        settings.SUPPORTED_VIDEO_CODECS, settings.SUPPORTED_AUDIO_CODECS)
+        except RejectedVideo as e:
+            count_event('rejected', e.reason)
+            raise
+
+    def _early_probe(self, media: MediaContext):
+        """Probe only the container header of a video about to be downloaded and reject it early"""
+        if not settings.EARLY_PROBE_ENABLED or not supports_streaming(media.headers):
+            return
+        _, ffprobe_path = self._get_ffmpeg_path()
+        with self.metrics.stage('early_probe'):
             try:
-                result = subprocess.run(duration_cmd, capture_output=True, text=True, check=True)
-                duration = float(result.stdout.strip())
-            except subprocess.CalledProcessError as e:
-                print(f"Error getting duration: {e.stderr}")
-                raise Exception(f"Failed to get video duration: {e.stderr}")
-            
-            if duration < settings.MIN_DURATION:
-                result = {
-                    'status': 'error',
-                    'message': f'Video duration ({duration:.1f}s) is less than minimum required duration ({settings.MIN_DURATION}s)'
-                }
-                return result
+                fetched = fetch_container_header(
+                    media.url, media.content_length, settings.EARLY_PROBE_HEAD_BYTES,
+                    settings.EARLY_PROBE_MAX_BYTES, timeout=settings.REQUEST_TIMEOUT
+                )
+                if fetched is None:
+                    return
+                header, complete = fetched
+                # Reserve room for the whole video now, so it lands next to the header
+                header_path = os.path.join(self.scratch.reserve(media.content_length), 'header')
+                with open(header_path, 'wb') as f:
+                    f.write(header)
+                try:
+                    probe = probe_media(header_path, ffprobe_path)
+                finally:
+                    os.remove(header_path)
+            except Exception as e:
+                logging.info(f"Early probe failed, video is checked after download: {e}")
+                return
+        # Without a complete moov (other containers, fragmented MP4) ffprobe
+        # guesses the duration from the truncated file, so only the streams
+        # are checked now and the duration after the download
+        if not complete or not probe.get('duration'):
+            self._check_media(probe, check_duration=False)
+            return
+        # ffprobe derives the bit rate from the file it saw, which is only the header
+        probe['bit_rate'] = int(media.content_length * 8 / probe['duration'])
+        self._check_media(probe)
+        media.probe = probe
 
-            # Extract frames and audio using full paths
-            frames = self._extract_frames(video_path, settings.MAX_FRAMES, ffmpeg_path)
-            audio_path = self._extract_audio(video_path, ffmpeg_path)
-            
-            # Get transcription
-            transcription = self._get_transcription(audio_path)
-            word_count = len(transcription.split())
-            
-            if word_count < settings.MIN_WORDS:
-                result = {
-                    'status': 'error',
-                    'message': f'Transcription word count ({word_count}) is less than minimum required words ({settings.MIN_WORDS})'
+    def _check_speech(self, audio_path: str):
+        """Reject audio without speech before paying for transcription"""
+        ffmpeg_path, _ = self._get_ffmpeg_path()
+        with self.metrics.stage('vad'):
+            seconds = speech_seconds(audio_path, ffmpeg_path, settings.AUDIO_SAMPLE_RATE, settings.VAD_THRESHOLD_DB)
+        if seconds < settings.VAD_MIN_SPEECH_SECONDS:
+            count_event('rejected', 'no_speech')
+            raise RejectedVideo('no_speech', f'No speech detected in audio ({seconds:.1f}s of voice activity)')
+
+    def _probe(self, media: MediaContext, download_lock: threading.Lock) -> Optional[Dict]:
+        """Probe the video into media.probe, returns an error result if it cannot be processed"""
+        _, ffprobe_path = self._get_ffmpeg_path()
+        # One ffprobe call for duration, resolution and codecs, shared by every stage;
+        # reused from the early probe when it already ran on the container header
+        media.probe = self._run_stage(
+            'probe', media.fingerprint,
+            lambda: media.probe or probe_media(self._ensure_video(media, download_lock), ffprobe_path),
+            variant='streams'
+        )
+        try:
+            self._check_media(media.probe)
+        except RejectedVideo as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        return None
+
+    def _plan_segments(self, media: MediaContext, prompt_variant: str) -> Optional[Dict]:
+        """Segment plan for a long video in segmented mode, None to process it in one task"""
+        if not settings.SEGMENTED_ENABLED or media.path or not supports_streaming(media.headers):
+            return None
+        _, ffprobe_path = self._get_ffmpeg_path()
+        # ffprobe reads only the container header of the URL with range requests
+        media.probe = self._run_stage(
+            'probe', media.fingerprint,
+            lambda: media.probe or probe_media(media.url, ffprobe_path),
+            variant='streams'
+        )
+        if media.duration <= settings.SEGMENT_MIN_DURATION:
+            return None
+        self._check_media(media.probe)
+
+        segments = plan_chunks(media.duration, settings.SEGMENT_DURATION)
+        logging.info(f"Segmented mode: {media.duration:.0f}s video split into {len(segments)} segments")
+        return {
+            'status': 'segmented',
+            'fingerprint': media.fingerprint,
+            'prompt_variant': prompt_variant,
+            'duration': media.duration,
+            'content_length': media.content_length,
+            'has_audio': media.probe['has_audio'],
+            'segments': segments
+        }
+
+    def _segment_variant(self, start: float, length: float) -> str:
+        """Stage cache variant of one segment summary"""
+        return (f"{start:.3f}:{length:.3f}:{settings.SEGMENT_FRAMES}:{settings.MAX_IMAGE_SIZE}:"
+                f"{settings.FRAME_FORMAT}:{settings.JPEG_QUALITY}:{settings.SEGMENT_SUMMARY_MAX_TOKENS}:"
+                f"{'exact' if settings.FRAME_ACCURATE_SEEK else 'key'}:{self._transcription_variant()}")
+
+    def process_segment(self, video_url: str, fingerprint: str, start: float, length: float,
+                        has_audio: bool = True) -> Dict:
+        """Frames, transcription and a short summary of one segment of a long video, read from the URL"""
+        try:
+            ffmpeg_path, _ = self._get_ffmpeg_path()
+
+            def transcribe() -> str:
+                audio_path = extract_audio(video_url, self._audio_path(), ffmpeg_path,
+                                           **{**self._audio_profile(), 'start': start, 'max_duration': length})
+                try:
+                    return self._get_transcription(audio_path, length)
+                except RejectedVideo:
+                    # A segment without speech is fine, the video as a whole was checked
+                    return ''
+
+            def summarize() -> Dict:
+                timestamps = self._seek_timestamps(video_url, [start + length * (i + 0.5) / settings.SEGMENT_FRAMES
+                                                               for i in range(settings.SEGMENT_FRAMES)],
+                                                   start, start + length)
+                with ThreadPoolExecutor(max_workers=2 if settings.PARALLEL_STAGES else 1) as executor:
+                    frames_future = executor.submit(
+                        extract_frames, video_url, timestamps, ffmpeg_path,
+                        max_size=settings.MAX_IMAGE_SIZE,
+                        quality=settings.JPEG_QUALITY,
+                        accurate_seek=settings.FRAME_ACCURATE_SEEK,
+                        image_format=settings.FRAME_FORMAT
+                    )
+                    transcription_future = executor.submit(transcribe) if has_audio else None
+                    with self.metrics.stage('frames'):
+                        frames = unique_frames(frames_future.result(), timestamps)[0]
+                    transcription = transcription_future.result() if transcription_future else ''
+
+                prompt = SEGMENT_PROMPT.format(start=format_timestamp(start), end=format_timestamp(start + length))
+                return {
+                    'start': start,
+                    'length': length,
+                    'transcription': transcription,
+                    'summary': self._get_description(frames, transcription, prompt, sheets=False,
+                                                     max_tokens=settings.SEGMENT_SUMMARY_MAX_TOKENS)
                 }
-                return result
-            
-            # Get description
-            description = self._get_description(frames, transcription, system_prompt)
-            
+
+            segment = self._run_stage('segment', fingerprint, summarize, variant=self._segment_variant(start, length))
+            return {'status': 'success', **segment}
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': f"Segment {format_timestamp(start)}: {str(e)}"
+            }
+        finally:
+            self._finish()
+
+    def reduce_segments(self, plan: Dict, segments: Sequence[Dict], system_prompt: Optional[str] = None) -> Dict:
+        """Merge the segment summaries of a segmented job into the final result and share it with duplicate jobs"""
+        result = None
+        try:
+            result = self._merge_segments(plan, segments, system_prompt)
+        except Exception as e:
             result = {
+                'status': 'error',
+                'message': str(e)
+            }
+        finally:
+            self._release_flight(plan.get('flight'), result)
+            self._finish()
+        return result
+
+    def _merge_segments(self, plan: Dict, segments: Sequence[Dict], system_prompt: Optional[str] = None) -> Dict:
+        """Final result from the segment summaries"""
+        failed = next((segment for segment in segments if segment.get('status') != 'success'), None)
+        if failed:
+            return failed
+        segments = sorted(segments, key=lambda segment: segment['start'])
+        transcription = " ".join(segment['transcription'].strip() for segment in segments
+                                 if segment['transcription'].strip())
+        word_count = len(transcription.split())
+        if word_count < settings.MIN_WORDS:
+            return {
+                'status': 'error',
+                'message': f'Transcription word count ({word_count}) is less than minimum required words ({settings.MIN_WORDS})'
+            }
+        self._progress('transcribed', word_count=word_count)
+
+        def describe() -> Dict:
+            return {
                 'status': 'success',
                 'transcription': transcription,
-                'description': description,
+                'description': self._chat(*self._summaries_request(segments, system_prompt)),
                 'word_count': word_count
             }
 
-            # Cache successful results
-            if settings.CACHE_ENABLED and result['status'] == 'success':
-                cache_key = self._get_cache_key(video_url, system_prompt)
-                self.cache.set(cache_key, result, settings.CACHE_EXPIRE_TIME)
-            
-            return result
+        result = self._run_stage('description', plan['fingerprint'], describe, variant=plan['prompt_variant'])
+        self._progress('described')
+        return result
+
+    def _summaries_request(self, segments: Sequence[Dict], system_prompt: Optional[str] = None) -> tuple[List[Dict], int, int]:
+        """Chat messages merging the summaries of time-ordered segments, with request bytes and estimated tokens"""
+        # Only the short summaries go into the final request, the
+        # frames and the full transcription were seen per segment
+        summaries = "\n\n".join(
+            f"[{format_timestamp(segment['start'])} - {format_timestamp(segment['start'] + segment['length'])}] "
+            f"{segment['summary']}"
+            for segment in segments
+        )
+        prompt = system_prompt if system_prompt is not None else DEFAULT_SYSTEM_PROMPT
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": "The video is too long to show at once, so here are summaries "
+                                        "of its consecutive segments, with their time ranges:\n\n" + summaries}
+        ]
+        return messages, len(prompt) + len(summaries), estimate_tokens(prompt + summaries, 0, 2048)
+
+    def _describe(self, fingerprint: str, frames: Sequence[bytes], transcription: str,
+                  system_prompt: Optional[str], prompt_variant: str) -> Dict:
+        """Check the transcription and get the description, cached per prompt together with the final result"""
+        word_count = len(transcription.split())
+        
+        if word_count < settings.MIN_WORDS:
+            return {
+                'status': 'error',
+                'message': f'Transcription word count ({word_count}) is less than minimum required words ({settings.MIN_WORDS})'
+            }
+        self._progress('transcribed', word_count=word_count)
+        
+        result = self._run_stage('description', fingerprint, lambda: {
+            'status': 'success',
+            'transcription': transcription,
+            'description': self._get_description(frames, transcription, system_prompt),
+            'word_count': word_count
+        }, variant=prompt_variant)
+        self._progress('described')
+        return result
+
+    def _finish(self):
+        """Log stage timings and remove temporary files"""
+        logging.info(f"Stage timings: {self.metrics.summary()}")
+        self._cleanup()
+
+    def _open_media(self, media: MediaContext, prompt_variant: str, download_lock: threading.Lock) -> Optional[Dict]:
+        """Fingerprint and probe a validated video, or return the job's result when it is already known
+        (cached result, segment plan, rejected video)"""
+        self._resolve_fingerprint(media)
+
+        cached_result = self._get_cached_result(media.fingerprint, prompt_variant)
+        if cached_result:
+            return cached_result
+
+        plan = self._plan_segments(media, prompt_variant)
+        if plan:
+            return plan
+
+        error = self._probe(media, download_lock)
+        if error:
+            return error
+        self._progress('downloaded')
+        return None
+
+    def _audio_file(self, media: MediaContext, download_lock: threading.Lock, ffmpeg_path: str) -> str:
+        """Path of the job's extracted audio, from the stage cache when possible"""
+        return self._run_audio_stage(
+            media.fingerprint, lambda: self._extract_audio(self._ensure_video(media, download_lock), ffmpeg_path)
+        )
+
+    def _extract_stages(self, media: MediaContext, download_lock: threading.Lock, ffmpeg_path: str,
+                        audio_stage: Optional[Callable[[], T]]) -> tuple[Sequence[bytes], Optional[T]]:
+        """Frames, and the result of audio_stage if given, joined before the description"""
+        # Frames do not depend on audio, so frame extraction runs alongside
+        # the audio stage (extraction, and Whisper in the single pipeline)
+        with ThreadPoolExecutor(max_workers=2 if settings.PARALLEL_STAGES else 1) as executor:
+            frames_future = executor.submit(
+                self._run_frames_stage, media.fingerprint,
+                lambda: self._extract_frames(self._ensure_video(media, download_lock), media.duration,
+                                             settings.MAX_FRAMES, ffmpeg_path)
+            )
+            audio_future = executor.submit(audio_stage) if audio_stage else None
+            frames = frames_future.result()
+            self._progress('frames', count=len(frames))
+            return frames, audio_future.result() if audio_future else None
+
+    def _process_validated_video(self, media: MediaContext, system_prompt: Optional[str] = None) -> Dict:
+        """Run the processing pipeline for a video that passed validation"""
+        download_lock = threading.Lock()
+        
+        try:
+            # Get FFmpeg paths
+            ffmpeg_path, _ = self._get_ffmpeg_path()
+
+            prompt_variant = hashlib.md5((system_prompt or '').encode()).hexdigest()
+            known_result = self._open_media(media, prompt_variant, download_lock)
+            if known_result:
+                return known_result
+            fingerprint = media.fingerprint
+
+            # Extract audio and get transcription
+            def transcribe() -> str:
+                return self._get_transcription(self._audio_file(media, download_lock, ffmpeg_path), media.duration)
+
+            frames, transcription = self._extract_stages(
+                media, download_lock, ffmpeg_path,
+                lambda: self._run_stage('transcription', fingerprint, transcribe, variant=self._transcription_variant())
+            )
+            return self._describe(fingerprint, frames, transcription, system_prompt, prompt_variant)
             
         except Exception as e:
             return {
@@ -347,13 +906,97 @@ Also describe what exactly is happening in the video: The place depicted, the ac
                 'message': str(e)
             }
         finally:
-            # Cleanup temporary files if they exist
-            try:
-                if video_path:
-                    self._cleanup(video_path)
-                if audio_path:
-                    self._cleanup(audio_path)
-                if os.path.exists(self.temp_dir):
-                    os.rmdir(self.temp_dir)
-            except Exception as cleanup_error:
-                print(f"Error during cleanup: {cleanup_error}")
+            self._finish()
+
+    def prepare_video(self, video_url: str, system_prompt: Optional[str] = None) -> Dict:
+        """First half of the split pipeline: fetch the video, extract frames and audio.
+
+        Returns either a final result (error, cache hit or the result of a
+        duplicate in-flight job) or a state with status 'prepared' whose
+        artifacts wait in ArtifactStore for describe_video.
+        """
+        return self._run_job(video_url, system_prompt, self._prepare_validated_video)
+
+    def _prepare_validated_video(self, media: MediaContext, system_prompt: Optional[str] = None) -> Dict:
+        """prepare_video for a video that passed validation"""
+        download_lock = threading.Lock()
+        job_id = uuid.uuid4().hex
+        try:
+            ffmpeg_path, _ = self._get_ffmpeg_path()
+            prompt_variant = hashlib.md5((system_prompt or '').encode()).hexdigest()
+            known_result = self._open_media(media, prompt_variant, download_lock)
+            if known_result:
+                return known_result
+            fingerprint = media.fingerprint
+
+            # A cached transcription makes the audio unnecessary
+            transcription = (self.stage_cache.get('transcription', fingerprint, self._transcription_variant())
+                             if settings.CACHE_ENABLED else None)
+
+            def audio() -> None:
+                with open(self._audio_file(media, download_lock, ffmpeg_path), 'rb') as f:
+                    if not self.artifacts.set(job_id, 'audio', f.read(), settings.ARTIFACT_TTL):
+                        raise Exception("Failed to store audio artifact")
+
+            frames, _ = self._extract_stages(media, download_lock, ffmpeg_path,
+                                             audio if transcription is None else None)
+            if not self.artifacts.set(job_id, 'frames', pack_frames(frames), settings.ARTIFACT_TTL):
+                raise Exception("Failed to store frame artifacts")
+
+            return {
+                'status': 'prepared',
+                'job_id': job_id,
+                'fingerprint': fingerprint,
+                'prompt_variant': prompt_variant,
+                'duration': media.duration,
+                'transcription': transcription
+            }
+        except Exception as e:
+            self.artifacts.delete(job_id)
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+        finally:
+            self._finish()
+
+    def describe_video(self, prepared: Dict, system_prompt: Optional[str] = None) -> Dict:
+        """Second half of the split pipeline: Whisper and GPT on the prepared artifacts"""
+        if prepared.get('status') != 'prepared':
+            # Error, cache hit or shared result from prepare_video
+            return prepared
+
+        job_id = prepared['job_id']
+        fingerprint = prepared['fingerprint']
+        result = None
+        try:
+            frames_blob = self.artifacts.get(job_id, 'frames')
+            if frames_blob is None:
+                raise Exception("Frame artifacts expired")
+            frames = unpack_frames(frames_blob)
+
+            def transcribe() -> str:
+                audio_bytes = self.artifacts.get(job_id, 'audio')
+                if audio_bytes is None:
+                    raise Exception("Audio artifact expired")
+                audio_path = self._audio_path()
+                with open(audio_path, 'wb') as f:
+                    f.write(audio_bytes)
+                return self._get_transcription(audio_path, prepared['duration'])
+
+            transcription = prepared.get('transcription')
+            if transcription is None:
+                transcription = self._run_stage('transcription', fingerprint, transcribe,
+                                                variant=self._transcription_variant())
+
+            result = self._describe(fingerprint, frames, transcription, system_prompt, prepared['prompt_variant'])
+        except Exception as e:
+            result = {
+                'status': 'error',
+                'message': str(e)
+            }
+        finally:
+            self._release_flight(prepared.get('flight'), result)
+            self.artifacts.delete(job_id)
+            self._finish()
+        return result
@@ -0,0 +1,51 @@
+import json
+import random
+
+import httpx
+
+from ..core.config import get_settings
+from ..core.http_clients import get_async_webhook_client, get_webhook_client
+
+settings = get_settings()
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json"
+}
+
+
+def preview(value, limit: int | None = None) -> str:
+    """Compact one-line representation for logs, cut to `limit` characters"""
+    limit = limit or settings.WEBHOOK_LOG_MAX_CHARS
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
+
+
+def post_webhook(payload) -> httpx.Response:
+    """POST payload to the configured webhook, raises on network errors and non-2xx responses"""
+    response = get_webhook_client().post(settings.WEBHOOK_URL, json=payload, headers=HEADERS)
+    response.raise_for_status()
+    return response
+
+
+async def post_webhook_async(payload) -> httpx.Response:
+    """post_webhook on the event loop's pooled client"""
+    response = await get_async_webhook_client().post(settings.WEBHOOK_URL, json=payload, headers=HEADERS)
+    response.raise_for_status()
+    return response
+
+
+def is_retryable(error: Exception) -> bool:
+    """Network errors, timeouts, 5xx, 408 and 429 are worth retrying; other 4xx are not"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in (408, 429)
+    return True
+
+
+def retry_delay(retries: int) -> float:
+    """Exponential backoff with jitter for the given number of previous attempts"""
+    delay = min(settings.WEBHOOK_RETRY_BACKOFF * (2 ** retries), settings.WEBHOOK_RETRY_BACKOFF_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,96 @@
+"""Bytes stored and encode/decode time of cached values and Celery results.
+
+Payloads are shaped like the real ones: a job result with a long
+transcription and description (what Cache and the result backend keep), the
+Celery result metadata wrapped around it, a stage-cache probe entry and a
+1000-video batch manifest. "legacy" is the previous plain json.dumps text.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codec
+"""
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from app.core import codec
+from benchmarks.common import print_table
+
+WORDS = ("the video shows a person walking through a busy market while talking about local food "
+         "prices and the atmosphere of the city in the early morning light with music playing").split()
+
+
+def text(words: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def payloads() -> dict:
+    result = {
+        'status': 'success',
+        'transcription': text(3000, 1),
+        'description': text(400, 2),
+        'word_count': 3000,
+        'metadata': {'video_id': 'abc123', 'user': 42, 'source': 'upload'},
+    }
+    return {
+        'job result': result,
+        'celery result': {
+            'status': 'SUCCESS', 'result': result, 'traceback': None, 'children': [],
+            'date_done': datetime.now(timezone.utc).isoformat(), 'task_id': str(uuid.uuid4()),
+        },
+        'probe entry': {
+            'duration': 61.3, 'format': 'mov,mp4,m4a,3gp,3g2,mj2', 'bit_rate': 2500000,
+            'width': 1920, 'height': 1080, 'video_codec': 'h264', 'audio_codec': 'aac', 'has_audio': True,
+        },
+        'batch manifest': {
+            'tasks': [{'task_id': str(uuid.uuid4()), 'video_url': f'https://cdn.example.com/v/{i}.mp4'}
+                      for i in range(1000)],
+            'items': [{'task': i, 'metadata': {'id': i}} for i in range(1000)],
+        },
+    }
+
+
+def timed(fn, *args, repeat: int = 50) -> float:
+    """Best time of `repeat` calls in microseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main():
+    variants = [("json", "none"), ("json", "gzip")]
+    if codec.MSGPACK_AVAILABLE:
+        variants += [("msgpack", "none"), ("msgpack", "gzip")]
+        if codec.ZSTD_AVAILABLE:
+            variants.append(("msgpack", "zstd"))
+    if codec.ZSTD_AVAILABLE:
+        variants.append(("json", "zstd"))
+
+    rows = []
+    for name, value in payloads().items():
+        legacy = json.dumps(value).encode()
+        rows.append([name, "legacy json", len(legacy), "1.00",
+                     f"{timed(json.dumps, value):.0f}", f"{timed(json.loads, legacy):.0f}"])
+        for serializer_name, compression_name in variants:
+            blob = codec.dumps(value, serializer_name, compression_name)
+            assert codec.loads(blob) == json.loads(legacy)
+            rows.append([
+                name,
+                f"{serializer_name}+{compression_name}",
+                len(blob),
+                f"{len(legacy) / len(blob):.2f}",
+                f"{timed(codec.dumps, value, serializer_name, compression_name):.0f}",
+                f"{timed(codec.loads, blob):.0f}",
+            ])
+
+    print_table(["payload", "codec", "bytes", "ratio", "encode us", "decode us"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare download strategies and download-then-decode with streaming decode.
+
+Serves synthetic clips from a local HTTP server (optionally throttled to
+simulate a CDN) and measures:
+
+- legacy: iter_content with 8 KB chunks
+- buffered: download_to_file with a reused 1 MB buffer
+- download+decode: download, then frames and audio from the local file
+- stream: ffmpeg reads frames and audio straight from the URL
+
+Run from the repository root:
+
+    python -m benchmarks.bench_download [rate_mb_per_s]
+"""
+import hashlib
+import os
+import subprocess
+import sys
+
+import requests
+
+from app.services.downloader import download_to_file
+from app.services.frame_extractor import extract_frames, frame_timestamps
+from benchmarks.common import clip_dir, file_size_mb, find_tool, make_clip, measure, print_table, serve_directory
+
+CLIPS = [
+    (30, 1280, 720),
+    (90, 1920, 1080),
+]
+MAX_SIZE = 500 * 1024 * 1024
+
+
+def legacy_download(url: str, path: str) -> str:
+    """Previous implementation: 8 KB iter_content chunks"""
+    digest = hashlib.sha256()
+    with requests.get(url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    digest.update(chunk)
+                    f.write(chunk)
+    return digest.hexdigest()
+
+
+def extract_audio(source: str, path: str, ffmpeg_path: str):
+    subprocess.run([ffmpeg_path, "-y", "-loglevel", "error", "-i", source, "-q:a", "0", "-map", "a", path],
+                   check=True)
+
+
+def download_and_decode(url: str, tmp: str, ffmpeg_path: str, duration: float):
+    video_path = os.path.join(tmp, "download.mp4")
+    download_to_file(url, video_path, MAX_SIZE)
+    frames = extract_frames(video_path, frame_timestamps(duration), ffmpeg_path)
+    extract_audio(video_path, os.path.join(tmp, "download.mp3"), ffmpeg_path)
+    return frames
+
+
+def stream_decode(url: str, tmp: str, ffmpeg_path: str, duration: float):
+    frames = extract_frames(url, frame_timestamps(duration), ffmpeg_path)
+    extract_audio(url, os.path.join(tmp, "stream.mp3"), ffmpeg_path)
+    return frames
+
+
+def main():
+    rate = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 0
+    ffmpeg_path = find_tool("ffmpeg")
+    rows = []
+    with clip_dir() as media, clip_dir() as tmp:
+        for duration, width, height in CLIPS:
+            name = f"clip_{duration}s_{height}p.mp4"
+            make_clip(os.path.join(media, name), duration, width, height)
+            with serve_directory(media, rate) as base_url:
+                url = f"{base_url}/{name}"
+                out = os.path.join(tmp, "out.mp4")
+                legacy = measure(legacy_download, url, out)
+                buffered = measure(download_to_file, url, out, MAX_SIZE)
+                sequential = measure(download_and_decode, url, tmp, ffmpeg_path, duration, repeat=1)
+                streamed = measure(stream_decode, url, tmp, ffmpeg_path, duration, repeat=1)
+
+            size = file_size_mb(os.path.join(media, name))
+            rows.append([
+                f"{duration}s {height}p",
+                f"{size:.1f}",
+                f"{size / legacy['wall']:.0f}",
+                f"{size / buffered['wall']:.0f}",
+                f"{sequential['wall'] * 1000:.0f}",
+                f"{streamed['wall'] * 1000:.0f}",
+            ])
+
+    print(f"server rate: {'unlimited' if not rate else f'{rate / 1024 / 1024:.1f} MB/s'}")
+    print_table(
+        ["clip", "MB", "legacy MB/s", "buffered MB/s", "download+decode ms", "stream ms"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
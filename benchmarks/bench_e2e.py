@@ -0,0 +1,266 @@
+"""End-to-end latency, throughput and peak memory of the whole pipeline.
+
+Generates synthetic clips, serves them from a local HTTP server and points
+the OpenAI client and the webhook at a local fake with configurable latency
+(benchmarks.common.FakeServiceHandler), then drives one of:
+
+- direct: VideoProcessor.process_video in N threads of this process
+- celery: POST /process -> Celery worker started with -c N -> webhook; needs
+  a Redis server at REDIS_URL, the worker is started and stopped by the script
+- async: POST /process -> EXECUTION_BACKEND=async running N jobs at once on
+  the event loop of the app in this process -> webhook; needs Redis as well
+
+For every clip and concurrency it prints jobs per second, end-to-end latency
+(p50/p95; submit to webhook in celery mode), the mean of every stage from the
+per-job metrics and the peak RSS of the process tree doing the work (ffmpeg
+included). Caching, single-flight and the shared OpenAI rate limit are off so
+every job does the full work; --env sets any other setting, which is how an
+optimization is compared against a baseline:
+
+    python -m benchmarks.bench_e2e direct --concurrency 1 2 4 --jobs 8
+    python -m benchmarks.bench_e2e direct --env FRAME_PACKING=contact_sheet
+    python -m benchmarks.bench_e2e celery --concurrency 1 2 --chat-latency 2
+    python -m benchmarks.bench_e2e celery --env PIPELINE_MODE=split
+    python -m benchmarks.bench_e2e async --concurrency 1 2 4
+
+Run from the repository root.
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import RssSampler, clip_dir, make_clip, print_table, serve_directory, serve_fake_services
+
+# Settings every run starts from, --env overrides them
+BASE_ENV = {
+    "OPENAI_API_KEY": "bench",
+    "CACHE_ENABLED": "false",
+    "SINGLE_FLIGHT_ENABLED": "false",
+    "OPENAI_RATE_LIMIT_ENABLED": "false",
+}
+
+
+def parse_clip(spec: str) -> tuple:
+    """"30x1280x720" -> (30.0, 1280, 720)"""
+    duration, width, height = spec.split("x")
+    return float(duration), int(width), int(height)
+
+
+def percentile(values: list, q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def stage_means(metrics: list) -> dict:
+    """Mean seconds per stage over jobs, in the order they were recorded; queue_<name> stages are summed into "queue" """
+    totals = {}
+    for job in metrics:
+        for stage, entry in job.items():
+            name = "queue" if stage.startswith("queue_") else stage
+            if name == "total":
+                continue
+            totals[name] = totals.get(name, 0.0) + entry["seconds"]
+    return {stage: seconds / len(metrics) for stage, seconds in totals.items()} if metrics else {}
+
+
+def report_row(concurrency: int, jobs: list, wall: float, peak_mb: float) -> tuple:
+    """Table row and stage means from [(latency, status, metrics)] of one concurrency level"""
+    latencies = [latency for latency, _, _ in jobs]
+    failed = sum(1 for _, status, _ in jobs if status != "success")
+    row = [
+        concurrency,
+        f"{len(jobs) / wall:.2f}",
+        f"{percentile(latencies, 50):.2f}",
+        f"{percentile(latencies, 95):.2f}",
+        failed,
+        f"{peak_mb:.0f}",
+    ]
+    return row, stage_means([metrics for _, _, metrics in jobs if metrics])
+
+
+def run_direct(url: str, concurrency: int, jobs: int) -> tuple:
+    """process_video in `concurrency` threads, returns ([(latency, status, metrics)], wall, peak MB)"""
+    from app.services.video_service import VideoProcessor
+
+    def job(_):
+        start = time.perf_counter()
+        with VideoProcessor() as processor:
+            result = processor.process_video(url)
+        return time.perf_counter() - start, result["status"], processor.metrics.as_dict()
+
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(job, range(jobs)))
+        wall = time.perf_counter() - start
+    return results, wall, sampler.peak_mb
+
+
+def start_worker(concurrency: int, env: dict) -> subprocess.Popen:
+    """Celery worker consuming every queue, returns once it answers a ping"""
+    from app.core.celery_app import celery_app
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    queues = ",".join([settings.VIDEO_QUEUE_INTERACTIVE, settings.VIDEO_QUEUE_BULK, settings.VIDEO_QUEUE_IO,
+                       settings.WEBHOOK_QUEUE])
+    hostname = f"bench-{uuid.uuid4().hex[:8]}@%h"
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "celery", "-A", "celery_worker.celery_app", "worker", "-c", str(concurrency),
+         "-Q", queues, "-n", hostname, "--loglevel", "warning"],
+        # configure_worker treats -c equal to CELERY_WORKER_CONCURRENCY as not given
+        # and sizes the pool per queue, 0 keeps -c as it is
+        env={**os.environ, **env, "CELERY_WORKER_CONCURRENCY": "0"},
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if worker.poll() is not None:
+            raise SystemExit("Celery worker exited during start-up")
+        replies = celery_app.control.ping(timeout=1)
+        if any(hostname.split("@")[0] in name for reply in replies for name in reply):
+            return worker
+    worker.kill()
+    raise SystemExit("Celery worker did not start within 60s")
+
+
+def stop_worker(worker: subprocess.Popen):
+    worker.send_signal(signal.SIGTERM)
+    try:
+        worker.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        worker.kill()
+        worker.wait()
+
+
+def submit_jobs(client, url: str, jobs: int, webhooks: list, timeout: float) -> tuple:
+    """POST /process `jobs` times and wait for their webhooks, returns ([(latency, status, metrics)], wall)"""
+    from app.core.celery_app import celery_app
+
+    submitted = {}
+    start = time.time()
+    for _ in range(jobs):
+        bench_job = uuid.uuid4().hex
+        response = client.post("/process", json={"video_url": url, "metadata": {"bench_job": bench_job}})
+        response.raise_for_status()
+        submitted[bench_job] = (time.time(), response.json()["task_id"])
+
+    # Webhook arrival is the end of a job as its client sees it
+    arrived = {}
+    deadline = start + timeout
+    while len(arrived) < jobs and time.time() < deadline:
+        for arrival, payload in list(webhooks):
+            if payload.get("bench_job") in submitted:
+                arrived.setdefault(payload["bench_job"], (arrival, payload.get("status")))
+        time.sleep(0.05)
+    wall = (max(arrival for arrival, _ in arrived.values()) if arrived else time.time()) - start
+
+    results = []
+    for bench_job, (submitted_at, task_id) in submitted.items():
+        if bench_job not in arrived:
+            results.append((timeout, "timeout", None))
+            continue
+        arrival, status = arrived[bench_job]
+        result = celery_app.AsyncResult(task_id).get(timeout=10)
+        results.append((arrival - submitted_at, status, result.get("metrics")))
+    return results, wall
+
+
+def run_celery(url: str, concurrency: int, jobs: int, env: dict, webhooks: list, timeout: float) -> tuple:
+    """POST /process jobs against a fresh worker, returns ([(latency, status, metrics)], wall, peak MB)"""
+    from fastapi.testclient import TestClient
+
+    from app.core.celery_app import celery_app
+    from app.main import app
+
+    celery_app.control.purge()
+    worker = start_worker(concurrency, env)
+    try:
+        client = TestClient(app)
+        with RssSampler(worker.pid) as sampler:
+            results, wall = submit_jobs(client, url, jobs, webhooks, timeout)
+        return results, wall, sampler.peak_mb
+    finally:
+        stop_worker(worker)
+
+
+def run_async(url: str, concurrency: int, jobs: int, webhooks: list, timeout: float) -> tuple:
+    """POST /process jobs to the async backend of the app in this process, returns ([(latency, status, metrics)], wall, peak MB)"""
+    from fastapi.testclient import TestClient
+
+    from app.main import app, job_queue
+
+    # The queue takes its size from the setting when the app starts
+    job_queue.concurrency = concurrency
+    with TestClient(app) as client, RssSampler() as sampler:
+        results, wall = submit_jobs(client, url, jobs, webhooks, timeout)
+    return results, wall, sampler.peak_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("mode", choices=("direct", "celery", "async"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=8, help="jobs per concurrency level")
+    parser.add_argument("--clips", nargs="+", default=["15x640x360", "30x1280x720"],
+                        help="DURATIONxWIDTHxHEIGHT of each synthetic clip")
+    parser.add_argument("--whisper-latency", type=float, default=0.5)
+    parser.add_argument("--chat-latency", type=float, default=1.0, help="seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds per generated token")
+    parser.add_argument("--webhook-latency", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=0, help="video server bandwidth in MB/s, 0 = unlimited")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for the webhooks of a level")
+    parser.add_argument("--env", action="append", default=[], metavar="SETTING=VALUE")
+    args = parser.parse_args()
+
+    with clip_dir() as directory, \
+            serve_directory(directory, int(args.rate * 1024 * 1024)) as video_base, \
+            serve_fake_services(args.whisper_latency, args.chat_latency, args.token_latency,
+                                args.webhook_latency) as (fake_base, webhooks):
+        env = {
+            **BASE_ENV,
+            "OPENAI_BASE_URL": f"{fake_base}/v1",
+            "WEBHOOK_URL": f"{fake_base}/webhook",
+            **({"EXECUTION_BACKEND": "async", "ASYNC_QUEUE_SIZE": str(args.jobs)} if args.mode == "async" else {}),
+            **dict(item.split("=", 1) for item in args.env),
+        }
+        # Settings are read once on import, so the app is imported only after this
+        os.environ.update(env)
+
+        for spec in args.clips:
+            duration, width, height = parse_clip(spec)
+            name = f"clip-{spec}.mp4"
+            make_clip(os.path.join(directory, name), duration, width, height)
+            url = f"{video_base}/{name}"
+
+            rows = []
+            means = []
+            for concurrency in args.concurrency:
+                if args.mode == "direct":
+                    jobs, wall, peak_mb = run_direct(url, concurrency, args.jobs)
+                elif args.mode == "async":
+                    jobs, wall, peak_mb = run_async(url, concurrency, args.jobs, webhooks, args.timeout)
+                else:
+                    jobs, wall, peak_mb = run_celery(url, concurrency, args.jobs, env, webhooks, args.timeout)
+                row, stage_seconds = report_row(concurrency, jobs, wall, peak_mb)
+                rows.append(row)
+                means.append(stage_seconds)
+
+            # Stage columns in the order the first level saw them
+            stages = list(dict.fromkeys(stage for stage_seconds in means for stage in stage_seconds))
+            for row, stage_seconds in zip(rows, means):
+                row.extend(f"{stage_seconds[stage]:.2f}" if stage in stage_seconds else "-" for stage in stages)
+
+            print(f"\n{args.mode}: {spec}, {args.jobs} jobs per level, "
+                  f"OpenAI latency whisper={args.whisper_latency}s chat={args.chat_latency}s")
+            print_table(["conc", "jobs/s", "p50 s", "p95 s", "failed", "peak MB", *stages], rows)
+
+
+if __name__ == "__main__":
+    main()
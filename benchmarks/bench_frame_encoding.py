@@ -0,0 +1,89 @@
+"""Per-frame cost of the frame path, from decoded pixels to the OpenAI request.
+
+"legacy" is the previous path: ffmpeg scales to 800px, PIL re-encodes with
+optimize=True and every frame is kept as a base64 string. The other rows
+scale to MAX_IMAGE_SIZE in ffmpeg, encode once and keep raw bytes, which
+are only base64-encoded when the request is built (included in the timing).
+
+Peak memory is the tracemalloc peak of Python allocations per frame.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_frame_encoding
+"""
+import base64
+import io
+import os
+import time
+import tracemalloc
+
+from PIL import Image
+
+from app.core.config import get_settings
+from app.services.frame_extractor import extract_frames, frame_timestamps, webp_available
+from benchmarks.common import clip_dir, find_tool, make_clip, print_table
+
+settings = get_settings()
+
+FRAMES = 8
+
+
+def legacy_frames(clip: str, timestamps, ffmpeg_path: str) -> list:
+    """Previous encoding: 800px frames, optimized JPEG, stored as base64 strings"""
+    frames = []
+    for frame in extract_frames(clip, timestamps, ffmpeg_path, max_size=800, quality=100):
+        with Image.open(io.BytesIO(frame)) as img:
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=settings.JPEG_QUALITY, optimize=True)
+        frames.append(base64.b64encode(buffer.getvalue()).decode())
+    return [f"data:image/jpeg;base64,{frame}" for frame in frames]
+
+
+def current_frames(clip: str, timestamps, ffmpeg_path: str, image_format: str) -> list:
+    """Frames scaled by ffmpeg, encoded once, base64 only at request build time"""
+    frames = extract_frames(clip, timestamps, ffmpeg_path, max_size=settings.MAX_IMAGE_SIZE,
+                            quality=settings.JPEG_QUALITY, image_format=image_format)
+    return [f"data:image/{image_format};base64,{base64.b64encode(frame).decode()}" for frame in frames]
+
+
+def run(fn, *args) -> dict:
+    """Wall time and Python allocation peak of one call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    urls = fn(*args)
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'wall': wall, 'peak': peak, 'payload': sum(len(url) for url in urls), 'frames': len(urls)}
+
+
+def main():
+    ffmpeg_path = find_tool("ffmpeg")
+    variants = [("legacy 800px", legacy_frames, ()), ("jpeg", current_frames, ("jpeg",))]
+    if webp_available():
+        variants.append(("webp", current_frames, ("webp",)))
+
+    rows = []
+    with clip_dir() as tmp:
+        for duration, width, height in [(30, 1280, 720), (60, 1920, 1080)]:
+            clip = make_clip(os.path.join(tmp, f"clip_{duration}s_{height}p.mp4"), duration, width, height)
+            timestamps = frame_timestamps(duration, FRAMES)
+            for name, fn, args in variants:
+                # Best of three runs, the first one warms the page cache
+                result = min((run(fn, clip, timestamps, ffmpeg_path, *args) for _ in range(3)),
+                             key=lambda r: r['wall'])
+                count = result['frames'] or 1
+                rows.append([
+                    f"{duration}s {height}p",
+                    name,
+                    result['frames'],
+                    f"{result['wall'] * 1000 / count:.1f}",
+                    f"{result['peak'] / 1024 / count:.0f}",
+                    f"{result['payload'] / 1024 / count:.1f}",
+                ])
+
+    print_table(["clip", "path", "frames", "ms/frame", "peak KiB/frame", "payload KiB/frame"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare per-frame ffmpeg spawning with single-process frame extraction.
+
+"new" decodes up to each timestamp like the old path did (the default), so
+both return the same frames. "new keyframe" is FRAME_ACCURATE_SEEK=false:
+timestamps are snapped to the nearest distinct keyframes found by ffprobe
+and only those are decoded, so it can return fewer frames; the distinct
+frame count of every column is printed next to the timings.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_frames
+"""
+import base64
+import io
+import os
+import subprocess
+
+from PIL import Image
+
+from app.services.frame_extractor import extract_frames, frame_timestamps, snap_to_keyframes, unique_frames
+from app.services.media import probe_keyframes
+from benchmarks.common import clip_dir, find_tool, make_clip, measure, print_table
+
+CLIPS = [
+    (10, 1280, 720),
+    (30, 1280, 720),
+    (60, 1920, 1080),
+    (180, 1920, 1080),
+]
+
+
+def legacy_extract_frames(video_path: str, timestamps, ffmpeg_path: str, temp_dir: str) -> list:
+    """Previous implementation: one ffmpeg process and one temp JPEG per frame"""
+    frames = []
+    for i, timestamp in enumerate(timestamps):
+        frame_path = os.path.join(temp_dir, f"frame_{i}.jpg")
+        subprocess.run(
+            [ffmpeg_path, "-ss", str(timestamp), "-i", video_path, "-vframes", "1", "-q:v", "2", frame_path],
+            capture_output=True, text=True, check=True,
+        )
+        with Image.open(frame_path) as img:
+            if img.size[0] > 800 or img.size[1] > 800:
+                img.thumbnail((800, 800))
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=70, optimize=True)
+            frames.append(base64.b64encode(buffer.getvalue()).decode())
+        os.remove(frame_path)
+    return frames
+
+
+def keyframe_extract_frames(video_path: str, timestamps, ffmpeg_path: str, ffprobe_path: str) -> list:
+    """Keyframe seek path: snap to distinct keyframes, extract, drop repeated images"""
+    snapped = snap_to_keyframes(timestamps, probe_keyframes(video_path, ffprobe_path))
+    frames = extract_frames(video_path, snapped, ffmpeg_path, accurate_seek=False)
+    return unique_frames(frames, snapped)[0]
+
+
+def main():
+    ffmpeg_path = find_tool("ffmpeg")
+    ffprobe_path = find_tool("ffprobe")
+    rows = []
+    with clip_dir() as tmp:
+        for duration, width, height in CLIPS:
+            clip = make_clip(os.path.join(tmp, f"clip_{duration}s_{height}p.mp4"), duration, width, height)
+            timestamps = frame_timestamps(duration, 8)
+
+            old = measure(legacy_extract_frames, clip, timestamps, ffmpeg_path, tmp)
+            new = measure(extract_frames, clip, timestamps, ffmpeg_path)
+            key = measure(keyframe_extract_frames, clip, timestamps, ffmpeg_path, ffprobe_path)
+
+            rows.append([
+                f"{duration}s {height}p",
+                len(timestamps),
+                f"{old['wall'] * 1000:.0f}",
+                f"{new['wall'] * 1000:.0f}",
+                f"{key['wall'] * 1000:.0f}",
+                f"{old['child_cpu'] * 1000:.0f}",
+                f"{new['child_cpu'] * 1000:.0f}",
+                f"{old['wall'] / new['wall']:.2f}x",
+                f"{len(set(old['result']))}/{len(set(new['result']))}/{len(set(key['result']))}",
+            ])
+
+    print_table(
+        ["clip", "frames", "old ms", "new ms", "new keyframe ms", "old cpu ms", "new cpu ms",
+         "speedup", "distinct old/new/keyframe"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import resource
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def find_tool(name: str) -> str:
+    """Return absolute path of an executable or raise"""
+    path = shutil.which(name)
+    if not path:
+        raise SystemExit(f"{name} not found in PATH, install FFmpeg to run benchmarks")
+    return path
+
+
+def make_clip(path: str, duration: float, width: int = 1280, height: int = 720, fps: int = 30,
+              gop: int = 250) -> str:
+    """Generate a synthetic H.264/AAC clip with moving test pattern and a tone"""
+    cmd = [
+        find_tool("ffmpeg"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-g", str(gop),
+        "-c:a", "aac", "-b:a", "96k", "-shortest", "-movflags", "+faststart",
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+@contextmanager
+def clip_dir():
+    """Temporary directory for generated clips"""
+    path = tempfile.mkdtemp(prefix="videoframer-bench-")
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def measure(fn, *args, repeat: int = 3, **kwargs) -> dict:
+    """Run fn several times and return best wall time and mean child CPU time"""
+    walls = []
+    cpus = []
+    result = None
+    for _ in range(repeat):
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        walls.append(time.perf_counter() - start)
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpus.append((after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime))
+    return {
+        "wall": min(walls),
+        "child_cpu": sum(cpus) / len(cpus),
+        "result": result,
+    }
+
+
+def print_table(headers: list, rows: list):
+    """Print rows as a fixed-width table"""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    line = "  ".join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def file_size_mb(path: str) -> float:
+    return os.path.getsize(path) / 1024 / 1024
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Static file handler with HEAD, Range, ETag and optional bandwidth throttling"""
+    directory = "."
+    rate = 0  # bytes per second, 0 = unlimited
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_headers(self):
+        path = os.path.join(self.directory, os.path.basename(self.path.split("?")[0]))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        size = os.path.getsize(path)
+        stat = os.stat(path)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            if match.group(1):
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            end = min(end, size - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{int(stat.st_mtime)}-{size}"')
+        self.send_header("Last-Modified", formatdate(stat.st_mtime, usegmt=True))
+        self.end_headers()
+        return path, start, end
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        sent = self._send_headers()
+        if not sent:
+            return
+        path, start, end = sent
+        remaining = end - start + 1
+        chunk = 64 * 1024
+        began = time.perf_counter()
+        written = 0
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                while remaining > 0:
+                    data = f.read(min(chunk, remaining))
+                    if not data:
+                        break
+                    self.wfile.write(data)
+                    remaining -= len(data)
+                    written += len(data)
+                    if self.rate:
+                        delay = written / self.rate - (time.perf_counter() - began)
+                        if delay > 0:
+                            time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@contextmanager
+def serve_directory(directory: str, rate: int = 0):
+    """Serve directory over HTTP on a free local port, yields base URL"""
+    handler = type("Handler", (RangeRequestHandler,), {"directory": directory, "rate": rate})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the OpenAI API and the webhook receiver, with configurable latency.
+
+    Answers /v1/audio/transcriptions, /v1/chat/completions (plain or streamed as
+    server-sent events) and /webhook; webhook payloads are appended to
+    `webhooks` as (arrival time, payload).
+    """
+    protocol_version = "HTTP/1.1"
+    whisper_latency = 0.0  # seconds per request
+    chat_latency = 0.0  # seconds to the first token
+    token_latency = 0.0  # seconds between streamed tokens
+    webhook_latency = 0.0
+    webhooks: list = []
+    transcript = ("this synthetic clip shows a colourful moving test pattern while a steady tone "
+                  "plays in the background for the whole duration of the video")
+    description = ("The video shows a colourful test pattern with a moving gradient and a counter, "
+                   "accompanied by a steady tone. The style is technical and minimal.")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send_json(self, value, status: int = 200):
+        body = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chat_chunk(self, delta: dict, finish_reason=None) -> bytes:
+        chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": "gpt-4o-mini", "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split("?")[0]
+        if path.endswith("/audio/transcriptions"):
+            time.sleep(self.whisper_latency)
+            response = {"text": self.transcript}
+            if b"verbose_json" in body:
+                response["segments"] = [{"id": 0, "start": 0.0, "end": 1e6, "text": self.transcript}]
+            self._send_json(response)
+        elif path.endswith("/chat/completions"):
+            time.sleep(self.chat_latency)
+            words = self.description.split(" ")
+            if json.loads(body).get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                self.wfile.write(self._chat_chunk({"role": "assistant", "content": ""}))
+                for i, word in enumerate(words):
+                    time.sleep(self.token_latency)
+                    self.wfile.write(self._chat_chunk({"content": word if i == 0 else " " + word}))
+                    self.wfile.flush()
+                self.wfile.write(self._chat_chunk({}, "stop") + b"data: [DONE]\n\n")
+                return
+            time.sleep(self.token_latency * len(words))
+            self._send_json({
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+                "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.description},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(words),
+                          "total_tokens": len(body) // 4 + len(words)},
+            })
+        elif path.endswith("/webhook"):
+            time.sleep(self.webhook_latency)
+            self.webhooks.append((time.time(), json.loads(body)))
+            self._send_json({"ok": True})
+        else:
+            self.send_error(404)
+
+
+@contextmanager
+def serve_fake_services(whisper_latency: float = 0.0, chat_latency: float = 0.0, token_latency: float = 0.0,
+                        webhook_latency: float = 0.0):
+    """Run FakeServiceHandler on a free local port, yields (base URL, received webhooks list)"""
+    webhooks = []
+    handler = type("Handler", (FakeServiceHandler,), {
+        "whisper_latency": whisper_latency, "chat_latency": chat_latency, "token_latency": token_latency,
+        "webhook_latency": webhook_latency, "webhooks": webhooks,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", webhooks
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def process_tree_rss(pid: int) -> int:
+    """Resident bytes of a process and all its descendants (Linux /proc), 0 if unavailable"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, fields after it are fixed
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    pending = [pid]
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+        pending.extend(children.get(current, []))
+    return total
+
+
+class RssSampler:
+    """Samples process_tree_rss of pid in a background thread and keeps the peak"""
+
+    def __init__(self, pid: int | None = None, interval: float = 0.05):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return False
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / 1024 / 1024